@@ -5,7 +5,6 @@
 #SBATCH -t 02:00:00
 #SBATCH -J batch_gridstat
 #SBATCH --export=ALL
-#SBATCH --array=0-11
 ##################################################################################
 # Description
 ##################################################################################
@@ -123,76 +122,130 @@ export CMP_ACC=TRUE
 # optionally define a gridstat output prefix, use a blank string for no prefix
 export PRFX=""
 
+# write the grid_stat_*.txt files of each line type along with the combined
+# grid_stat_*.stat file, FALSE when read by proc_gridstat.py with IN_FMT='stat'
+export TXT_OUT=TRUE
+
+# maximum number of forecast leads run in parallel by each array task, set
+# with the cores / memory requested for the task, 1 for serial processing
+export MAX_PAR=1
+
+# skip forecast leads completed with unchanged inputs by a previous run, e.g.,
+# when resubmitting the array after a failure, FALSE recomputes all leads
+export RESUME=FALSE
+
 # root directory for cycle time (YYYYMMDDHH) directories of cf-compliant files
 export IN_ROOT=/cw3e/mead/projects/cwp106/scratch/cgrudzien/${CSE}
 
 # root directory for cycle time (YYYYMMDDHH) directories of gridstat outputs
 export OUT_ROOT=/cw3e/mead/projects/cwp106/scratch/cgrudzien/${CSE}
 
-##################################################################################
-# Contruct job array and environment for submission
-##################################################################################
-# create array of arrays to store the hyper-parameter grid settings, configs
-# run based on SLURM job array index
-cfgs=()
-
-num_grds=${#GRDS[@]}
-num_flws=${#CTR_FLWS[@]}
-for (( i = 0; i < ${num_grds}; i++ )); do
-  for (( j = 0; j < ${num_flws}; j++ )); do
-    CTR_FLW=${CTR_FLWS[$j]}
-    GRD=${GRDS[$i]}
-    INT_MTHD=${INT_MTHDS[$i]}
-    INT_WDTH=${INT_WDTHS[$i]}
-
-    cfg_indx="cfg_${i}${j}"
-    cmd="${cfg_indx}=()"
-    echo ${cmd}; eval ${cmd}
+# cache of landmasks regridded to the verification grid, shared by all configs
+export MSK_CACHE=${OUT_ROOT}/vx_mask_cache
 
-    cmd="${cfg_indx}+=(\"CTR_FLW=${CTR_FLW}\")"
-    echo ${cmd}; eval ${cmd}
+# number of configurations run in sequence by each job array element, packing
+# short configurations into one element to reduce scheduler overhead, the
+# wall time requested above should allow for all configurations of an element
+export TSK_PER_JOB=1
 
-    cmd="${cfg_indx}+=(\"GRD=${GRD}\")"
-    echo ${cmd}; eval ${cmd}
+# run the configurations as a SLURM job array or on a local worker pool,
+# SLURM or LOCAL
+export BACKEND=SLURM
 
-    cmd="${cfg_indx}+=(\"INT_MTHD=${INT_MTHD}\")"
-    echo ${cmd} ; eval ${cmd}
-
-    cmd="${cfg_indx}+=(\"INT_WDTH=${INT_WDTH}\")"
-    echo ${cmd}; eval ${cmd}
+# number of configurations run at once by the LOCAL backend, with the CPUs
+# each worker is bound to and its virtual memory limit in MB, 0 for no limit
+export N_WORKERS=4
+export WKR_CPUS=0
+export WKR_MEM=0
 
-    cmd="${cfg_indx}+=(\"IN_CYC_DIR=${IN_ROOT}/${CTR_FLW}\")"
-    echo ${cmd}; eval ${cmd}
+# optional directory of stub executables, e.g., singularity, prepended to the
+# PATH of LOCAL runs for testing without MET, empty string if not used
+export STUB_PATH=""
 
-    cmd="${cfg_indx}+=(\"OUT_CYC_DIR=${OUT_ROOT}/${CTR_FLW}\")"
-    echo ${cmd}; eval ${cmd}
+##################################################################################
+# Contruct job array and environment for submission
+##################################################################################
+# run with bash to write the manifest of configurations and submit the job
+# array sized to the manifest, array elements run their configurations below
+if [ -z ${SLURM_ARRAY_TASK_ID} ]; then
+  log_dir=${OUT_ROOT}/batch_logs
+  cmd="mkdir -p ${log_dir}"
+  echo ${cmd}; eval ${cmd}
+
+  # JSON-lines manifest with one configuration of the hyper-parameter grid
+  # per line, as the string definitions passed to run_gridstat.sh
+  export MANIFEST=${log_dir}/gridstat_manifest_`date +%Y%m%d%H%M%S`.jsonl
+  rm -f ${MANIFEST}
+
+  num_grds=${#GRDS[@]}
+  num_flws=${#CTR_FLWS[@]}
+  for (( i = 0; i < ${num_grds}; i++ )); do
+    for (( j = 0; j < ${num_flws}; j++ )); do
+      CTR_FLW=${CTR_FLWS[$j]}
+      GRD=${GRDS[$i]}
+      INT_MTHD=${INT_MTHDS[$i]}
+      INT_WDTH=${INT_WDTHS[$i]}
+
+      cfg=()
+      cfg+=("CTR_FLW=${CTR_FLW}")
+      cfg+=("GRD=${GRD}")
+      cfg+=("INT_MTHD=${INT_MTHD}")
+      cfg+=("INT_WDTH=${INT_WDTH}")
+      cfg+=("IN_CYC_DIR=${IN_ROOT}/${CTR_FLW}")
+      cfg+=("OUT_CYC_DIR=${OUT_ROOT}/${CTR_FLW}")
+
+      # subdirectory of cycle-named directory containing data to be analyzed,
+      # includes leading '/', left as blank string if not needed
+      cfg+=("IN_DT_SUBDIR=")
+
+      # subdirectory of cycle-named directory where output is to be saved
+      cfg+=("OUT_DT_SUBDIR=")
+
+      echo "Adding configuration ${cfg[@]}"
+      python ${USR_HME}/Grid-Stat/batch_manifest.py task "${cfg[@]}" \
+        >> ${MANIFEST}
+
+      if [ $? -ne 0 ]; then
+        echo "ERROR: configuration could not be written to ${MANIFEST}."
+        exit 1
+      fi
+    done
+  done
 
-    # subdirectory of cycle-named directory containing data to be analyzed,
-    # includes leading '/', left as blank string if not needed
-    cmd="${cfg_indx}+=(\"IN_DT_SUBDIR=\"\"\")"
+  # size the job array to the manifest
+  num_jobs=`python ${USR_HME}/Grid-Stat/batch_manifest.py jobs ${MANIFEST} \
+    ${TSK_PER_JOB}`
+  if [[ ! ${num_jobs} =~ ^[0-9]+$ || ${num_jobs} -lt 1 ]]; then
+    echo "ERROR: no configurations to run in ${MANIFEST}, ${num_jobs}"
+    exit 1
+  fi
+
+  if [[ ${BACKEND} = "LOCAL" ]]; then
+    # run all configurations on the local worker pool
+    cmd="python ${USR_HME}/Grid-Stat/batch_local.py MANIFEST=${MANIFEST}"
+    cmd+=" SCRIPT=run_gridstat.sh LOG_DIR=${log_dir} LOG_NME=gridstat"
+    cmd+=" N_WORKERS=${N_WORKERS} WKR_CPUS=${WKR_CPUS} WKR_MEM=${WKR_MEM}"
+    cmd+=" STUB_PATH=${STUB_PATH}"
     echo ${cmd}; eval ${cmd}
-    
-    # subdirectory of cycle-named directory where output is to be saved
-    cmd="${cfg_indx}+=(\"OUT_DT_SUBDIR=\"\"\")"
+    exit $?
+  elif [[ ${BACKEND} = "SLURM" ]]; then
+    cmd="sbatch --array=0-$(( num_jobs - 1 )) -o ${log_dir}/slurm-%A_%a.out"
+    cmd+=" ${USR_HME}/Grid-Stat/batch_gridstat.sh"
     echo ${cmd}; eval ${cmd}
+  else
+    echo "ERROR: \${BACKEND} must be set to 'SLURM' or 'LOCAL', got ${BACKEND}."
+    exit 1
+  fi
 
-    cmd="cfgs+=( \"${cfg_indx}\" )"
-    echo ${cmd}; eval ${cmd}
-
-  done
-done
+  exit 0
+fi
 
 ##################################################################################
-# run the processing script looping parameter arrays
+# run the processing script looping the configurations of the array element
 jbid=${SLURM_ARRAY_JOB_ID}
 indx=${SLURM_ARRAY_TASK_ID}
 
-echo "Processing data for job index ${indx}."
-echo "Loading configuration parameters ${cfgs[$indx]}:"
-
-# extract the confiugration key name corresponding to the slurm index
-cfg=${cfgs[$indx]}
-job="${cfg}[@]"
+echo "Processing data for job index ${indx} of manifest ${MANIFEST}."
 
 cmd="cd ${USR_HME}/Grid-Stat"
 echo ${cmd}; eval ${cmd}
@@ -201,8 +254,36 @@ log_dir=${OUT_ROOT}/batch_logs
 cmd="mkdir -p ${log_dir}"
 echo ${cmd}; eval ${cmd}
 
-cmd="./run_gridstat.sh ${!job} > ${log_dir}/gridstat_${jbid}_${indx}.log 2>&1"
-echo ${cmd}; eval ${cmd}
+# configurations of the element with their manifest line numbers
+tsks=`python batch_manifest.py args ${MANIFEST} ${indx} ${TSK_PER_JOB}`
+if [ $? -ne 0 ]; then
+  echo "${tsks}"
+  echo "ERROR: configurations could not be read from ${MANIFEST}."
+  exit 1
+fi
+
+# run the configurations in sequence, summarizing their exit status
+n_tsks=0
+n_fail=0
+while read -r -u 3 tsk args; do
+  log_f=${log_dir}/gridstat_${jbid}_${tsk}.log
+  cmd="./run_gridstat.sh ${args} > ${log_f} 2>&1"
+  echo ${cmd}; eval ${cmd}
+  sts=$?
+
+  (( n_tsks += 1 ))
+  if [ ${sts} -eq 0 ]; then
+    echo "Completed: configuration ${tsk} exit status ${sts}, log ${log_f}"
+  else
+    (( n_fail += 1 ))
+    echo "Failed: configuration ${tsk} exit status ${sts}, log ${log_f}"
+  fi
+done 3<<< "${tsks}"
+
+echo "Completed $(( n_tsks - n_fail )) of ${n_tsks} configurations."
+if [ ${n_fail} -gt 0 ]; then
+  exit 1
+fi
 
 ##################################################################################
 # end
@@ -0,0 +1,218 @@
+##################################################################################
+# Description
+##################################################################################
+# This script runs the configurations of a batch_*.sh task manifest, as
+# written by batch_manifest.py, on a pool of local worker processes rather
+# than as a SLURM job array, for runs that fit on a single workstation. Each
+# configuration is run by a worker with the run_*.sh script, e.g.,
+#
+#     python batch_local.py MANIFEST=/path/to/manifest.jsonl \
+#         SCRIPT=run_gridstat.sh LOG_DIR=/path/to/batch_logs LOG_NME=gridstat \
+#         N_WORKERS=4 WKR_CPUS=2 WKR_MEM=16000 STUB_PATH=
+#
+# where the parameters are
+#
+#     MANIFEST  - the JSON-lines manifest of the configurations to run
+#     SCRIPT    - the run_*.sh script in this directory run for each one
+#     LOG_DIR   - the directory of the logs of the configurations
+#     LOG_NME   - the name of the logs, written as
+#                 ${LOG_DIR}/${LOG_NME}_local_${PID}_${line}.log
+#                 for the PID of this script and the manifest line number
+#     N_WORKERS - the number of configurations run at once
+#     WKR_CPUS  - the number of CPUs each worker is bound to, 0 for no limit
+#     WKR_MEM   - the limit of the virtual memory of each configuration run in
+#                 MB, 0 for no limit
+#     STUB_PATH - optional directory prepended to the PATH of the runs, e.g.,
+#                 with stub singularity / ncl executables for testing the
+#                 workflow without MET, empty if not used
+#
+# The batch_*.sh scripts call this script when run with BACKEND=LOCAL. A
+# summary of the exit status of each configuration is printed on completion,
+# and the script exits with status 1 if any configuration failed.
+#
+##################################################################################
+# License Statement
+##################################################################################
+#
+# Copyright 2023 Colin Grudzien, cgrudzien@ucsd.edu
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+#
+##################################################################################
+# Imports
+##################################################################################
+import sys
+import os
+import time
+import resource
+import subprocess
+import multiprocessing
+from multiprocessing import Pool
+from batch_manifest import read_tasks, task_defs
+
+##################################################################################
+# SET GLOBAL PARAMETERS
+##################################################################################
+# parameters of the executor with their defaults, None if required
+CNFG_KEYS = {
+             'MANIFEST': None,
+             'SCRIPT': None,
+             'LOG_DIR': None,
+             'LOG_NME': None,
+             'N_WORKERS': '1',
+             'WKR_CPUS': '0',
+             'WKR_MEM': '0',
+             'STUB_PATH': '',
+            }
+
+# settings of this worker process, set by the pool initializer
+WKR = {}
+
+##################################################################################
+# Executor routines
+##################################################################################
+# parse the string definitions KEY=VALUE of the command line to a dictionary
+# of the executor parameters, returning None with an error message printed
+# if a parameter is missing or malformed
+def read_cnfg(args):
+    cnfg = dict(CNFG_KEYS)
+    for arg in args:
+        key, sep, val = arg.partition('=')
+        if len(sep) == 0 or key not in CNFG_KEYS.keys():
+            print('ERROR: argument ' + arg + ' is not a definition KEY=VALUE' +\
+                    ' of ' + ', '.join(CNFG_KEYS.keys()) + '.')
+            return None
+
+        cnfg[key] = val
+
+    for key, val in cnfg.items():
+        if val is None:
+            print('ERROR: ' + key + ' is not defined.')
+            return None
+
+    for key in ['N_WORKERS', 'WKR_CPUS', 'WKR_MEM']:
+        try:
+            cnfg[key] = int(cnfg[key])
+            if cnfg[key] < 0 or (key == 'N_WORKERS' and cnfg[key] < 1):
+                raise ValueError
+
+        except ValueError:
+            print('ERROR: ' + key + ', ' + str(cnfg[key]) +\
+                    ', is not a valid non-negative integer.')
+            return None
+
+    return cnfg
+
+# pool initializer, numbering the workers with a shared counter and binding
+# each to its own set of wkr_cpus CPUs
+def init_worker(counter, wkr_cpus, wkr_mem, stub_path):
+    with counter.get_lock():
+        WKR['id'] = counter.value
+        counter.value += 1
+
+    WKR['mem'] = wkr_mem
+    WKR['env'] = dict(os.environ)
+    if len(stub_path) > 0:
+        WKR['env']['PATH'] = stub_path + ':' + WKR['env']['PATH']
+
+    if wkr_cpus > 0:
+        cpus = sorted(os.sched_getaffinity(0))
+        wkr_set = [cpus[(WKR['id'] * wkr_cpus + i_c) % len(cpus)]
+                   for i_c in range(wkr_cpus)]
+        os.sched_setaffinity(0, set(wkr_set))
+        for key in ['OMP_NUM_THREADS', 'OMPI_MCA_num_procs']:
+            WKR['env'][key] = str(wkr_cpus)
+
+# limit the virtual memory of a configuration run, run in the child process
+def limit_mem():
+    if WKR['mem'] > 0:
+        n_bytes = WKR['mem'] * 1024 ** 2
+        resource.setrlimit(resource.RLIMIT_AS, (n_bytes, n_bytes))
+
+# run a single configuration, returning its manifest line number, exit
+# status, wall time in seconds, worker number and log path
+def run_task(task):
+    i_t, defs, script, log_path = task
+    strt = time.time()
+    with open(log_path, 'w') as log_f:
+        try:
+            proc = subprocess.run(['bash', script] + defs, stdout=log_f,
+                                  stderr=subprocess.STDOUT,
+                                  stdin=subprocess.DEVNULL, env=WKR['env'],
+                                  cwd=os.path.dirname(script),
+                                  preexec_fn=limit_mem)
+            status = proc.returncode
+
+        except OSError as err:
+            print('ERROR: ' + script + ' could not be run, ' + repr(err),
+                  file=log_f)
+            status = -1
+
+    return [i_t, status, time.time() - strt, WKR['id'], log_path]
+
+# run all configurations of the manifest on the worker pool, returning the
+# results of run_task in manifest order
+def run_local(cnfg):
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    script = script_dir + '/' + cnfg['SCRIPT']
+    os.makedirs(cnfg['LOG_DIR'], exist_ok=True)
+
+    tasks = []
+    for i_t, task in enumerate(read_tasks(cnfg['MANIFEST'])):
+        log_path = cnfg['LOG_DIR'] + '/' + cnfg['LOG_NME'] + '_local_' +\
+                   str(os.getpid()) + '_' + str(i_t) + '.log'
+        tasks.append([i_t, task_defs(task), script, log_path])
+
+    counter = multiprocessing.Value('i', 0)
+    with Pool(min(cnfg['N_WORKERS'], max(len(tasks), 1)),
+              initializer=init_worker,
+              initargs=(counter, cnfg['WKR_CPUS'], cnfg['WKR_MEM'],
+                        cnfg['STUB_PATH'])) as pool:
+        return pool.map(run_task, tasks, chunksize=1)
+
+# summary of the exit status of each configuration in manifest order
+def run_summary(results):
+    failed = [result for result in results if result[1] != 0]
+    summary = ''
+    for i_t, status, wall, wkr, log_path in results:
+        if status == 0:
+            summary += 'Completed: '
+
+        else:
+            summary += 'Failed: '
+
+        summary += 'configuration ' + str(i_t) + ' exit status ' +\
+                   str(status) + ' in ' + '%.1f'%wall + ' s on worker ' +\
+                   str(wkr) + ', log ' + log_path + '\n'
+
+    summary += 'Completed ' + str(len(results) - len(failed)) + ' of ' +\
+               str(len(results)) + ' configurations.\n'
+
+    return summary
+
+##################################################################################
+# Run the manifest
+##################################################################################
+if __name__ == '__main__':
+    cnfg = read_cnfg(sys.argv[1:])
+    if cnfg is None:
+        sys.exit(1)
+
+    results = run_local(cnfg)
+    print(run_summary(results), end='')
+
+    if len([result for result in results if result[1] != 0]) > 0:
+        sys.exit(1)
+
+##################################################################################
+# end
@@ -0,0 +1,141 @@
+##################################################################################
+# Description
+##################################################################################
+# This script defines the task manifests of the batch_*.sh job arrays. A
+# manifest is a JSON-lines file with one task per line, each task a JSON
+# object of the configuration parameters passed to the run_*.sh script as
+# string definitions, e.g.,
+#
+#     {"CTR_FLW": "NRT_gfs", "GRD": "d01", "IN_CYC_DIR": "/.../NRT_gfs"}
+#
+# Manifests are written by the batch_*.sh scripts when run for submission,
+# with one call per task of
+#
+#     python batch_manifest.py task KEY=VALUE KEY=VALUE ... >> manifest.jsonl
+#
+# and the number of job array elements needed to run the manifest, with up to
+# TSK_PER_JOB tasks packed into each element, is given by
+#
+#     python batch_manifest.py jobs manifest.jsonl TSK_PER_JOB
+#
+# Each job array element lists its tasks with
+#
+#     python batch_manifest.py args manifest.jsonl INDX TSK_PER_JOB
+#
+# printing one line per task of the manifest line number of the task followed
+# by its arguments, quoted to be evaluated by the shell as the arguments of
+# the run_*.sh script.
+#
+##################################################################################
+# License Statement
+##################################################################################
+#
+# Copyright 2023 Colin Grudzien, cgrudzien@ucsd.edu
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+#
+##################################################################################
+# Imports
+##################################################################################
+import sys
+import json
+import shlex
+
+##################################################################################
+# Manifest routines
+##################################################################################
+# the JSON line of a task given its string definitions KEY=VALUE, or None
+# with an error message printed if an argument is malformed
+def task_line(defs):
+    task = {}
+    for arg in defs:
+        key, sep, val = arg.partition('=')
+        if len(sep) == 0 or len(key) == 0:
+            print('ERROR: argument ' + arg + ' is not of the form KEY=VALUE.')
+            return None
+
+        task[key] = val
+
+    return json.dumps(task)
+
+# read the tasks of a manifest as a list of dictionaries in line order
+def read_tasks(path):
+    tasks = []
+    with open(path) as f:
+        for line in f:
+            if len(line.strip()) > 0:
+                tasks.append(json.loads(line))
+
+    return tasks
+
+# number of job array elements to run n_tasks with up to tsk_per_job tasks
+# per element
+def n_jobs(n_tasks, tsk_per_job):
+    return -(-n_tasks // tsk_per_job)
+
+# manifest line numbers, from zero, of the tasks of job array element indx
+def job_tasks(n_tasks, indx, tsk_per_job):
+    return list(range(indx * tsk_per_job,
+                      min((indx + 1) * tsk_per_job, n_tasks)))
+
+# string definitions of a task for the run_*.sh scripts, with values quoted
+# for the evaluation of the definitions by the run_*.sh script
+def task_defs(task):
+    return [key + '=' + shlex.quote(val) for key, val in task.items()]
+
+# arguments of a task for the run_*.sh scripts, each string definition quoted
+# for the evaluation of the batch script
+def task_args(task):
+    return ' '.join([shlex.quote(arg) for arg in task_defs(task)])
+
+##################################################################################
+# Command line interface
+##################################################################################
+if __name__ == '__main__':
+    cmds = ['task', 'jobs', 'args']
+    if len(sys.argv) < 2 or sys.argv[1] not in cmds:
+        print('ERROR: command must be one of ' + ', '.join(cmds) + '.')
+        sys.exit(1)
+
+    cmd = sys.argv[1]
+    if cmd == 'task':
+        line = task_line(sys.argv[2:])
+        if line is None:
+            sys.exit(1)
+
+        print(line)
+
+    else:
+        try:
+            tasks = read_tasks(sys.argv[2])
+            tsk_per_job = int(sys.argv[-1])
+            if cmd == 'args':
+                indx = int(sys.argv[3])
+
+            if tsk_per_job < 1:
+                raise ValueError
+
+        except (IndexError, ValueError, OSError) as err:
+            print('ERROR: manifest or TSK_PER_JOB could not be read, ' +\
+                    repr(err) + '.')
+            sys.exit(1)
+
+        if cmd == 'jobs':
+            print(n_jobs(len(tasks), tsk_per_job))
+
+        else:
+            for i_t in job_tasks(len(tasks), indx, tsk_per_job):
+                print(str(i_t) + ' ' + task_args(tasks[i_t]))
+
+##################################################################################
+# end
@@ -5,7 +5,6 @@
 #SBATCH -t 01:00:00
 #SBATCH -J batch_wrfout_cf
 #SBATCH --export=ALL
-#SBATCH --array=0-11
 ##################################################################################
 # Description
 ##################################################################################
@@ -99,68 +98,127 @@ export OUT_ROOT=/cw3e/mead/projects/cwp106/scratch/cgrudzien/CC-NAM_v_RAP
 # must be equal to TRUE or FALSE
 export RGRD=FALSE
 
-##################################################################################
-# Contruct job array and environment for submission
-##################################################################################
-# Create array of arrays to store the hyper-parameter grid settings, configs
-# run based on SLURM job array index.  NOTE: directory paths dependent on control
-# flow and grid settings are defined dynamically in the below and shold be set
-# in the loops.
-cfgs=()
-
-num_grds=${#GRDS[@]}
-num_flws=${#CTR_FLWS[@]}
-
-# NOTE: SLURM JOB ARRAY SHOULD HAVE INDICES CORRESPONDING TO EACH OF THE
-# CONFIGURATIONS DEFINED BELOW
-for (( i = 0; i < ${num_grds}; i++ )); do
-  for (( j = 0; j < ${num_flws}; j++ )); do
-    CTR_FLW=${CTR_FLWS[$j]}
-    GRD=${GRDS[$i]}
-
-    cfg_indx="cfg_${i}${j}"
-    cmd="${cfg_indx}=()"
-    echo ${cmd}; eval ${cmd}
+# set to convert only the precipitation fields with wrfout_to_cf_precip.py,
+# skipping the full NCL conversion, must be equal to TRUE or FALSE
+export PRCP_ONLY=FALSE
 
-    cmd="${cfg_indx}+=(\"CTR_FLW=${CTR_FLW}\")"
-    echo ${cmd}; eval ${cmd}
+# maximum number of conversion tasks run in parallel by each array task, set
+# with the cores / memory requested for the task, 1 for serial processing
+export MAX_PAR=1
 
-    cmd="${cfg_indx}+=(\"GRD=${GRD}\")"
-    echo ${cmd}; eval ${cmd}
+# set to convert all leads of a cycle in one run, reading each wrfout file once,
+# must be equal to TRUE or FALSE, TRUE requires PRCP_ONLY=TRUE
+export MLT_LEAD=FALSE
 
-    # This path defines the location of each cycle directory relative to IN_ROOT
-    cmd="${cfg_indx}+=(\"IN_CYC_DIR=${IN_ROOT}/${CTR_FLW}\")"
-    echo ${cmd}; eval ${cmd}
+# comma separated list of the fields computed by wrfout_to_cf.ncl, skipping
+# the derivation of all other fields, an empty value writes all fields
+export OUT_VARS=""
 
-    # subdirectory of cycle-named directory containing data to be analyzed,
-    # includes leading '/', left as blank string if not needed
-    cmd="${cfg_indx}+=(\"IN_DT_SUBDIR=/wrfprd/ens_00\")"
-    echo ${cmd}; eval ${cmd}
-    
-    # This path defines the location of each cycle directory relative to OUT_ROOT
-    cmd="${cfg_indx}+=(\"OUT_CYC_DIR=${OUT_ROOT}/${CTR_FLW}\")"
-    echo ${cmd}; eval ${cmd}
+# number of configurations run in sequence by each job array element, packing
+# short configurations into one element to reduce scheduler overhead, the
+# wall time requested above should allow for all configurations of an element
+export TSK_PER_JOB=1
 
-    # subdirectory of cycle-named directory where output is to be saved
-    cmd="${cfg_indx}+=(\"OUT_DT_SUBDIR=\"\"\")"
-    echo ${cmd}; eval ${cmd}
+# run the configurations as a SLURM job array or on a local worker pool,
+# SLURM or LOCAL
+export BACKEND=SLURM
 
-    cmd="cfgs+=( \"${cfg_indx}\" )"
-    echo ${cmd}; eval ${cmd}
+# number of configurations run at once by the LOCAL backend, with the CPUs
+# each worker is bound to and its virtual memory limit in MB, 0 for no limit
+export N_WORKERS=4
+export WKR_CPUS=0
+export WKR_MEM=0
+
+# optional directory of stub executables, e.g., singularity, prepended to the
+# PATH of LOCAL runs for testing without MET, empty string if not used
+export STUB_PATH=""
+
+##################################################################################
+# Contruct job array and environment for submission
+##################################################################################
+# run with bash to write the manifest of configurations and submit the job
+# array sized to the manifest, array elements run their configurations below.
+# NOTE: directory paths dependent on control flow and grid settings are defined
+# dynamically in the below and shold be set in the loops.
+if [ -z ${SLURM_ARRAY_TASK_ID} ]; then
+  log_dir=${OUT_ROOT}/batch_logs
+  cmd="mkdir -p ${log_dir}"
+  echo ${cmd}; eval ${cmd}
+
+  # JSON-lines manifest with one configuration of the hyper-parameter grid
+  # per line, as the string definitions passed to run_wrfout_cf.sh
+  export MANIFEST=${log_dir}/wrfout_cf_manifest_`date +%Y%m%d%H%M%S`.jsonl
+  rm -f ${MANIFEST}
+
+  num_grds=${#GRDS[@]}
+  num_flws=${#CTR_FLWS[@]}
+  for (( i = 0; i < ${num_grds}; i++ )); do
+    for (( j = 0; j < ${num_flws}; j++ )); do
+      CTR_FLW=${CTR_FLWS[$j]}
+      GRD=${GRDS[$i]}
+
+      cfg=()
+      cfg+=("CTR_FLW=${CTR_FLW}")
+      cfg+=("GRD=${GRD}")
+
+      # This path defines the location of each cycle directory relative to IN_ROOT
+      cfg+=("IN_CYC_DIR=${IN_ROOT}/${CTR_FLW}")
+
+      # subdirectory of cycle-named directory containing data to be analyzed,
+      # includes leading '/', left as blank string if not needed
+      cfg+=("IN_DT_SUBDIR=/wrfprd/ens_00")
+
+      # This path defines the location of each cycle directory relative to OUT_ROOT
+      cfg+=("OUT_CYC_DIR=${OUT_ROOT}/${CTR_FLW}")
+
+      # subdirectory of cycle-named directory where output is to be saved
+      cfg+=("OUT_DT_SUBDIR=")
+
+      echo "Adding configuration ${cfg[@]}"
+      python ${USR_HME}/Grid-Stat/batch_manifest.py task "${cfg[@]}" \
+        >> ${MANIFEST}
+
+      if [ $? -ne 0 ]; then
+        echo "ERROR: configuration could not be written to ${MANIFEST}."
+        exit 1
+      fi
+    done
   done
-done
+
+  # size the job array to the manifest
+  num_jobs=`python ${USR_HME}/Grid-Stat/batch_manifest.py jobs ${MANIFEST} \
+    ${TSK_PER_JOB}`
+  if [[ ! ${num_jobs} =~ ^[0-9]+$ || ${num_jobs} -lt 1 ]]; then
+    echo "ERROR: no configurations to run in ${MANIFEST}, ${num_jobs}"
+    exit 1
+  fi
+
+  if [[ ${BACKEND} = "LOCAL" ]]; then
+    # run all configurations on the local worker pool
+    cmd="python ${USR_HME}/Grid-Stat/batch_local.py MANIFEST=${MANIFEST}"
+    cmd+=" SCRIPT=run_wrfout_cf.sh LOG_DIR=${log_dir} LOG_NME=wrfout_cf"
+    cmd+=" N_WORKERS=${N_WORKERS} WKR_CPUS=${WKR_CPUS} WKR_MEM=${WKR_MEM}"
+    cmd+=" STUB_PATH=${STUB_PATH}"
+    echo ${cmd}; eval ${cmd}
+    exit $?
+  elif [[ ${BACKEND} = "SLURM" ]]; then
+    cmd="sbatch --array=0-$(( num_jobs - 1 )) -o ${log_dir}/slurm-%A_%a.out"
+    cmd+=" ${USR_HME}/Grid-Stat/batch_wrfout_cf.sh"
+    echo ${cmd}; eval ${cmd}
+  else
+    echo "ERROR: \${BACKEND} must be set to 'SLURM' or 'LOCAL', got ${BACKEND}."
+    exit 1
+  fi
+
+  exit 0
+fi
 
 ##################################################################################
-# run the processing script looping parameter arrays
+# run the processing script looping the configurations of the array element
 jbid=${SLURM_ARRAY_JOB_ID}
 indx=${SLURM_ARRAY_TASK_ID}
 
-echo "Processing data for job index ${indx}."
-echo "Loading configuration parameters ${cfgs[$indx]}:"
-
-# extract the confiugration key name corresponding to the slurm index
-cfg=${cfgs[$indx]}
-job="${cfg}[@]"
+echo "Processing data for job index ${indx} of manifest ${MANIFEST}."
 
 cmd="cd ${USR_HME}/Grid-Stat"
 echo ${cmd}; eval ${cmd}
@@ -169,8 +227,36 @@ log_dir=${OUT_ROOT}/batch_logs
 cmd="mkdir -p ${log_dir}"
 echo ${cmd}; eval ${cmd}
 
-cmd="./run_wrfout_cf.sh ${!job} > ${log_dir}/wrfout_cf_${jbid}_${indx}.log 2>&1"
-echo ${cmd}; eval ${cmd}
+# configurations of the element with their manifest line numbers
+tsks=`python batch_manifest.py args ${MANIFEST} ${indx} ${TSK_PER_JOB}`
+if [ $? -ne 0 ]; then
+  echo "${tsks}"
+  echo "ERROR: configurations could not be read from ${MANIFEST}."
+  exit 1
+fi
+
+# run the configurations in sequence, summarizing their exit status
+n_tsks=0
+n_fail=0
+while read -r -u 3 tsk args; do
+  log_f=${log_dir}/wrfout_cf_${jbid}_${tsk}.log
+  cmd="./run_wrfout_cf.sh ${args} > ${log_f} 2>&1"
+  echo ${cmd}; eval ${cmd}
+  sts=$?
+
+  (( n_tsks += 1 ))
+  if [ ${sts} -eq 0 ]; then
+    echo "Completed: configuration ${tsk} exit status ${sts}, log ${log_f}"
+  else
+    (( n_fail += 1 ))
+    echo "Failed: configuration ${tsk} exit status ${sts}, log ${log_f}"
+  fi
+done 3<<< "${tsks}"
+
+echo "Completed $(( n_tsks - n_fail )) of ${n_tsks} configurations."
+if [ ${n_fail} -gt 0 ]; then
+  exit 1
+fi
 
 ##################################################################################
 # end
@@ -0,0 +1,428 @@
+##################################################################################
+# Description
+##################################################################################
+# This script benchmarks the processing of grid_stat_* outputs and the lookups
+# of the plotting scripts on synthetic data written by gen_gridstat.py, so
+# that regressions of throughput and memory show up before production runs.
+# For each number of forecast cycles in N_CYCS a synthetic tree is generated
+# under ${BENCH_ROOT}/n${N_CYCS}/in and processed to the Parquet store under
+# ${BENCH_ROOT}/n${N_CYCS}/out, timing the stages
+#
+#     gen     - writing the synthetic grid_stat_* files
+#     plan    - globbing and fingerprinting the files, as plan_gridstat
+#     ingest  - parsing the files and casting to the schema in proc_cycle
+#     write   - buffering and writing the cycle partitions to the store and
+#               recording the cycles, as proc_cycle and finish_gridstat
+#     load    - loading the statistics of each line type with load_stats
+#     lvl_ld  - extracting (threshold x lead) matrices with stat_matrix, for
+#               each mask and valid date, as plt_gridstat_multilevel_heatplot
+#     ld_dt   - extracting (lead x date) matrices with stat_matrix, for each
+#               mask and threshold, as plt_gridstat_multidate_heatplot_level
+#
+# with each scale run in a fresh worker process so that the peak resident set
+# size of each stage is measured from the start of the scale. The benchmark
+# is run with string definitions as
+#
+#     python bench_gridstat.py BENCH_ROOT=/path/to/bench N_CYCS=8,32,128 \
+#         LEADS=24,48,72,96,120 MSKS=FULL,CA_Sierra BTSTRP=TRUE
+#
+# where the parameters of BENCH_KEYS below are used by the benchmark and all
+# other definitions are passed to gen_gridstat.py, with OUT_FMT set from
+# IN_FMT. Throughput in rows / s of each stage, or matrix cells / s for the
+# extraction stages, and the peak RSS are printed as a table and appended as
+# one JSON line per scale to OUT_PATH, and with PLOT=TRUE the scaling curves
+# are saved to ${BENCH_ROOT}/bench_gridstat.png. If BASELINE is the JSON
+# lines output of an earlier run, the throughput of each stage is compared
+# with that of the same scale and the script exits with status 1 if any
+# stage is slower than the baseline by more than the fraction TOL.
+#
+##################################################################################
+# License Statement
+##################################################################################
+#
+# Copyright 2023 Colin Grudzien, cgrudzien@ucsd.edu
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+#
+##################################################################################
+# Imports
+##################################################################################
+import sys
+import os
+import json
+import time
+import shutil
+import resource
+from datetime import timedelta
+from multiprocessing import Pool
+import gen_gridstat
+import proc_gridstat
+import gridstat_loader
+from gridstat_query import select_rows, level_values, stat_matrix
+
+##################################################################################
+# SET GLOBAL PARAMETERS
+##################################################################################
+# parameters of the benchmark with their defaults, None if required
+BENCH_KEYS = {
+              'BENCH_ROOT': None,
+              'N_CYCS': '4,16,64',
+              'STRT_DT': '2021010100',
+              'IN_FMT': 'txt',
+              'MEM_BUDGET': str(proc_gridstat.MEM_BUDGET),
+              'OUT_PATH': '',
+              'PLOT': 'FALSE',
+              'KEEP': 'FALSE',
+              'BASELINE': '',
+              'TOL': '0.2',
+             }
+
+# control flow, grid and prefix of the synthetic store
+CTR_FLW = 'BENCH'
+GRD = 'd01'
+PRFX = ''
+
+# statistics loaded and extracted for each line type
+LOAD_STATS = {
+              'cts': ['CSI', 'GSS'],
+              'nbrcts': ['CSI', 'GSS'],
+              'nbrcnt': ['FSS'],
+              'cnt': ['RMSE'],
+              'ctc': ['FY_OY'],
+              'nbrctc': ['FY_OY'],
+              'sl1l2': ['FBAR'],
+             }
+
+# benchmark stages in run order
+STAGES = ['gen', 'plan', 'ingest', 'write', 'load', 'lvl_ld', 'ld_dt']
+
+##################################################################################
+# Benchmark routines
+##################################################################################
+# parse the string definitions KEY=VALUE of the command line to a dictionary
+# of the benchmark parameters and a list of the definitions passed to
+# gen_gridstat.py, returning None with an error message printed if a
+# parameter is missing or malformed
+def read_cnfg(args):
+    cnfg = dict(BENCH_KEYS)
+    gen_args = []
+    for arg in args:
+        key, sep, val = arg.partition('=')
+        if len(sep) == 0:
+            print('ERROR: argument ' + arg + ' is not of the form KEY=VALUE.')
+            return None
+
+        elif key in BENCH_KEYS.keys():
+            cnfg[key] = val
+
+        elif key in ['IN_ROOT', 'CTR_FLW', 'END_DT', 'OUT_FMT']:
+            print('ERROR: ' + key + ' is set by the benchmark.')
+            return None
+
+        else:
+            gen_args.append(arg)
+
+    for key, val in cnfg.items():
+        if val is None:
+            print('ERROR: ' + key + ' is not defined.')
+            return None
+
+    try:
+        cnfg['N_CYCS'] = [int(val) for val in cnfg['N_CYCS'].split(',')]
+        cnfg['MEM_BUDGET'] = int(cnfg['MEM_BUDGET'])
+        cnfg['TOL'] = float(cnfg['TOL'])
+        if min(cnfg['N_CYCS']) < 1 or cnfg['MEM_BUDGET'] < 0:
+            raise ValueError
+
+    except ValueError:
+        print('ERROR: N_CYCS, MEM_BUDGET or TOL is not a valid positive' +\
+                ' number.')
+        return None
+
+    for key in ['PLOT', 'KEEP']:
+        if cnfg[key] not in ['TRUE', 'FALSE']:
+            print('ERROR: ' + key + ' must be set to TRUE or FALSE, got ' +\
+                    cnfg[key] + '.')
+            return None
+
+    if cnfg['IN_FMT'] not in ['txt', 'stat']:
+        print('ERROR: IN_FMT must be set to txt or stat, got ' +\
+                cnfg['IN_FMT'] + '.')
+        return None
+
+    if len(cnfg['OUT_PATH']) == 0:
+        cnfg['OUT_PATH'] = cnfg['BENCH_ROOT'] + '/bench_gridstat.jsonl'
+
+    # check the generator definitions once, at the smallest scale
+    gen_cnfg = scale_cnfg(cnfg, gen_args, min(cnfg['N_CYCS']))
+    if gen_cnfg is None:
+        return None
+
+    cnfg['GEN_ARGS'] = gen_args
+
+    return cnfg
+
+# generator configuration of a scale of n_cycs cycles, or None with an error
+# message printed if the definitions of the generator are malformed
+def scale_cnfg(cnfg, gen_args, n_cycs):
+    args = ['IN_ROOT=' + cnfg['BENCH_ROOT'] + '/n' + str(n_cycs) + '/in',
+            'CTR_FLW=' + CTR_FLW, 'STRT_DT=' + cnfg['STRT_DT'],
+            'END_DT=' + cnfg['STRT_DT'], 'OUT_FMT=' + cnfg['IN_FMT']]
+    gen_cnfg = gen_gridstat.read_cnfg(args + gen_args)
+    if gen_cnfg is None:
+        return None
+
+    if gen_cnfg['CYC_INT'] > 99:
+        print('ERROR: CYC_INT must be at most 99 hours for proc_gridstat.')
+        return None
+
+    gen_cnfg['END_DT'] = gen_cnfg['STRT_DT'] +\
+            timedelta(hours=gen_cnfg['CYC_INT'] * (n_cycs - 1))
+
+    return gen_cnfg
+
+# peak resident set size of this process in MB
+def peak_rss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+# run the stages of the benchmark for a single scale of n_cycs cycles,
+# returning the dictionary of its JSON line
+def bench_scale(task):
+    cnfg, n_cycs = task
+    gen_cnfg = scale_cnfg(cnfg, cnfg['GEN_ARGS'], n_cycs)
+    scl_root = cnfg['BENCH_ROOT'] + '/n' + str(n_cycs)
+    shutil.rmtree(scl_root, ignore_errors=True)
+    strt_dt = gen_cnfg['STRT_DT'].strftime('%Y%m%d%H')
+    end_dt = gen_cnfg['END_DT'].strftime('%Y%m%d%H')
+
+    # set the module parameters of the processing and loading of the store
+    proc_gridstat.IN_ROOT = scl_root + '/in'
+    proc_gridstat.OUT_ROOT = scl_root + '/out'
+    proc_gridstat.STRT_DT = strt_dt
+    proc_gridstat.END_DT = end_dt
+    proc_gridstat.CYC_INT = '%02d'%gen_cnfg['CYC_INT']
+    proc_gridstat.IN_FMT = cnfg['IN_FMT']
+    proc_gridstat.INCREMENTAL = False
+    proc_gridstat.BIN_EXPORT = False
+    gridstat_loader.OUT_ROOT = scl_root + '/out'
+    gridstat_loader.clear_cache()
+
+    result = {
+              'n_cycs': n_cycs,
+              'in_fmt': cnfg['IN_FMT'],
+              'mem_budget': cnfg['MEM_BUDGET'],
+              'stages': {},
+             }
+
+    # record a stage of sec seconds over n units of work
+    def stage(name, sec, n):
+        result['stages'][name] = {
+                                  'sec': sec,
+                                  'n': n,
+                                  'rate': n / sec if sec > 0 else None,
+                                  'peak_rss_mb': peak_rss(),
+                                 }
+
+    strt = time.perf_counter()
+    n_files, n_rows, n_bytes = gen_gridstat.gen_gridstat(gen_cnfg)
+    stage('gen', time.perf_counter() - strt, n_rows)
+    result.update({'n_files': n_files, 'n_rows': n_rows, 'n_bytes': n_bytes})
+
+    cnfg_gs = [CTR_FLW, PRFX, GRD, '/' + CTR_FLW, '', '/' + CTR_FLW]
+    strt = time.perf_counter()
+    tasks = proc_gridstat.plan_gridstat(cnfg_gs)
+    stage('plan', time.perf_counter() - strt, n_files)
+
+    # process each cycle with proc_cycle, taking the time of each stage from
+    # the metrics of the cycles, and record the cycles with finish_gridstat
+    proc_gridstat.MEM_BUDGET = cnfg['MEM_BUDGET']
+    results = [proc_gridstat.proc_cycle(task) for task in tasks]
+    cycs = [record for result in results for record in result[3]
+            if record['kind'] == 'cycle']
+    stage('ingest', sum([cyc['parse_s'] + cyc['schema_s'] for cyc in cycs]),
+          n_rows)
+
+    strt = time.perf_counter()
+    proc_gridstat.finish_gridstat(cnfg_gs, results)
+    stage('write', sum([cyc['concat_s'] + cyc['write_s'] for cyc in cycs]) +\
+          time.perf_counter() - strt, n_rows)
+
+    # load each line type cold, as the first plot of a session
+    strt = time.perf_counter()
+    data = {}
+    n_load = 0
+    for line_type in gen_cnfg['LINE_TYPES']:
+        data[line_type] = gridstat_loader.load_stats(CTR_FLW, GRD, PRFX,
+                                                     strt_dt, end_dt,
+                                                     line_type,
+                                                     LOAD_STATS[line_type])
+        if data[line_type] is not None:
+            n_load += len(data[line_type])
+
+    stage('load', time.perf_counter() - strt, n_load)
+
+    # extract the matrices of the heat plots from the thresholded line types
+    thr_types = [line_type for line_type in gen_cnfg['LINE_TYPES']
+                 if line_type not in ['cnt', 'sl1l2'] and
+                 data[line_type] is not None]
+
+    strt = time.perf_counter()
+    n_cells = 0
+    for line_type in thr_types:
+        stat = LOAD_STATS[line_type][0]
+        stat_data = data[line_type]
+        leads = level_values(stat_data, 'FCST_LEAD')
+        for msk in level_values(stat_data, 'VX_MASK'):
+            for vld_dt in level_values(stat_data, 'FCST_VALID_END'):
+                sub = select_rows(stat_data, VX_MASK=msk,
+                                  FCST_VALID_END=vld_dt)
+                if sub is None:
+                    continue
+
+                lvls = level_values(sub, 'FCST_THRESH')
+                n_cells += stat_matrix(sub, stat, 'FCST_THRESH', lvls,
+                                       'FCST_LEAD', leads).size
+
+    stage('lvl_ld', time.perf_counter() - strt, n_cells)
+
+    strt = time.perf_counter()
+    n_cells = 0
+    for line_type in thr_types:
+        stat = LOAD_STATS[line_type][0]
+        stat_data = data[line_type]
+        leads = level_values(stat_data, 'FCST_LEAD')
+        dates = sorted(level_values(stat_data, 'FCST_VALID_END'))
+        for msk in level_values(stat_data, 'VX_MASK'):
+            sub = select_rows(stat_data, VX_MASK=msk)
+            for thr in level_values(sub, 'FCST_THRESH'):
+                n_cells += stat_matrix(sub, stat, 'FCST_LEAD', leads,
+                                       'FCST_VALID_END', dates,
+                                       FCST_THRESH=thr).size
+
+    stage('ld_dt', time.perf_counter() - strt, n_cells)
+    result['peak_rss_mb'] = peak_rss()
+
+    if cnfg['KEEP'] == 'FALSE':
+        shutil.rmtree(scl_root, ignore_errors=True)
+
+    return result
+
+# table of the throughput of each stage over the scales, with the seconds,
+# rate and peak RSS of each stage
+def bench_table(results):
+    table = '%8s %10s %8s'%('n_cycs', 'rows', 'stage') +\
+            '%10s %14s %12s\n'%('sec', 'rate / s', 'rss MB')
+    for result in results:
+        for name in STAGES:
+            stg = result['stages'][name]
+            rate = '%14.1f'%stg['rate'] if stg['rate'] is not None else\
+                   '%14s'%'NA'
+            table += '%8d %10d %8s'%(result['n_cycs'], result['n_rows'],
+                                     name) +\
+                     '%10.3f '%stg['sec'] + rate +\
+                     ' %12.1f\n'%stg['peak_rss_mb']
+
+    return table
+
+# compare the throughput of each stage with a baseline of the same scale,
+# returning the messages of the stages slower than the baseline by tol
+def compare_baseline(results, base_path, tol):
+    base = {}
+    with open(base_path) as f:
+        for line in f:
+            if len(line.strip()) > 0:
+                result = json.loads(line)
+                base[(result['n_cycs'], result['in_fmt'])] = result
+
+    msgs = []
+    for result in results:
+        key = (result['n_cycs'], result['in_fmt'])
+        if key not in base.keys():
+            continue
+
+        for name in STAGES:
+            rate = result['stages'][name]['rate']
+            base_rate = base[key]['stages'][name]['rate']
+            if rate is not None and base_rate is not None and\
+                    rate < (1.0 - tol) * base_rate:
+                msgs.append('WARNING: stage ' + name + ' at ' +\
+                        str(key[0]) + ' cycles ran at ' + '%.1f'%rate +\
+                        ' / s versus ' + '%.1f'%base_rate + ' / s in ' +\
+                        base_path + '.')
+
+    return msgs
+
+# save the scaling curves of throughput and peak RSS versus rows processed
+def plot_scaling(results, out_path):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    fig, (ax0, ax1) = plt.subplots(1, 2, figsize=(12, 4.8))
+    rows = [result['n_rows'] for result in results]
+    for name in STAGES:
+        rates = [result['stages'][name]['rate'] for result in results]
+        ax0.plot(rows, rates, marker='o', label=name)
+
+    ax1.plot(rows, [result['peak_rss_mb'] for result in results],
+             marker='o', color='k')
+    ax0.set_xscale('log')
+    ax0.set_yscale('log')
+    ax0.set_xlabel('rows')
+    ax0.set_ylabel('rows / s, cells / s for extraction')
+    ax0.legend()
+    ax1.set_xscale('log')
+    ax1.set_xlabel('rows')
+    ax1.set_ylabel('peak RSS (MB)')
+    fig.tight_layout()
+    fig.savefig(out_path)
+    plt.close(fig)
+
+##################################################################################
+# Run the benchmark
+##################################################################################
+if __name__ == '__main__':
+    cnfg = read_cnfg(sys.argv[1:])
+    if cnfg is None:
+        sys.exit(1)
+
+    os.makedirs(cnfg['BENCH_ROOT'], exist_ok=True)
+
+    # a fresh worker for each scale isolates its peak RSS
+    results = []
+    for n_cycs in sorted(cnfg['N_CYCS']):
+        with Pool(1, maxtasksperchild=1) as pool:
+            results.append(pool.apply(bench_scale, ((cnfg, n_cycs),)))
+
+    print(bench_table(results), end='')
+    with open(cnfg['OUT_PATH'], 'a') as f:
+        for result in results:
+            print(json.dumps(result), file=f)
+
+    print('Wrote results to ' + cnfg['OUT_PATH'])
+
+    if cnfg['PLOT'] == 'TRUE':
+        plot_path = cnfg['BENCH_ROOT'] + '/bench_gridstat.png'
+        plot_scaling(results, plot_path)
+        print('Wrote scaling curves to ' + plot_path)
+
+    if len(cnfg['BASELINE']) > 0:
+        msgs = compare_baseline(results, cnfg['BASELINE'], cnfg['TOL'])
+        for msg in msgs:
+            print(msg)
+
+        if len(msgs) > 0:
+            sys.exit(1)
+
+##################################################################################
+# end
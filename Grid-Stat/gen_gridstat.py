@@ -0,0 +1,480 @@
+##################################################################################
+# Description
+##################################################################################
+# This script writes synthetic grid_stat_* outputs in the layout of the
+# companion script run_gridstat.sh, for measuring proc_gridstat.py and the
+# plotting lookups without MET or scratch data. Files are written for each
+# forecast cycle and lead as
+#
+#     ${IN_ROOT}/${CTR_FLW}/${YYYYMMDDHH}/grid_stat_${PRFX}_${HH}0000L_${VALID}V_${TYPE}.txt
+#
+# with PRFX and its underscore omitted if empty, in the column layouts of
+# gridstat_schema.py with one row per verification mask and threshold, and
+# neighborhood line types repeated for each neighborhood width. Workflow
+# parameters are supplied as command line arguments of string definitions,
+# e.g.,
+#
+#     python gen_gridstat.py IN_ROOT=/path/to/synthetic CTR_FLW=NRT_gfs \
+#         STRT_DT=2021012400 END_DT=2021012800 CYC_INT=24 LEADS=24,48,72 \
+#         MSKS=FULL,CA_Sierra THRS='>0.0,>=10.0,>=25.4' BTSTRP=TRUE
+#
+# where the parameters and their defaults are listed in CNFG_KEYS below,
+# comma separated lists being given for LEADS, MSKS, THRS, NBRHD_WDTHS and
+# LINE_TYPES. Contingency table counts are drawn per row and the cts / nbrcts
+# statistics are derived from these as in gridstat_aggregate.py, while the
+# cnt / sl1l2 statistics are derived from drawn moments of the forecast and
+# observed fields, so that the line types of a row are consistent with each
+# other as in MET outputs.
+# Normal confidence limits are written about each statistic and bootstrap
+# limits only with BTSTRP=TRUE, as with the boot settings of the config.
+# With OUT_FMT=stat the line types of each lead are written to the combined
+# grid_stat_*.stat file instead, as with run_gridstat.sh TXT_OUT=FALSE.
+#
+##################################################################################
+# License Statement
+##################################################################################
+#
+# Copyright 2023 Colin Grudzien, cgrudzien@ucsd.edu
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+#
+##################################################################################
+# Imports
+##################################################################################
+import sys
+import os
+import numpy as np
+from datetime import datetime as dt
+from datetime import timedelta
+from gridstat_schema import HDR_COLS, LINE_TYPE_COLS, DT_FMT, line_type_cols
+from gridstat_aggregate import cts_scores
+
+##################################################################################
+# SET GLOBAL PARAMETERS
+##################################################################################
+# parameters of the generator with their defaults, None if required
+CNFG_KEYS = {
+             'IN_ROOT': None,
+             'CTR_FLW': None,
+             'STRT_DT': None,
+             'END_DT': None,
+             'CYC_INT': '24',
+             'PRFX': '',
+             'LEADS': '24,48,72,96,120',
+             'ACC_INT': '24',
+             'MSKS': 'FULL,CALatLonPoints,CA_Sierra,CA_SouthCoast',
+             'THRS': '>0.0,>=10.0,>=25.4,>=50.8,>=101.6',
+             'NBRHD_WDTHS': '9',
+             'LINE_TYPES': 'cnt,cts,nbrcnt,nbrcts',
+             'BTSTRP': 'FALSE',
+             'OUT_FMT': 'txt',
+             'SEED': '0',
+            }
+
+# line types written by the generator
+GEN_TYPES = ['ctc', 'cts', 'cnt', 'sl1l2', 'nbrctc', 'nbrcts', 'nbrcnt']
+
+# MET version string of the headers
+VERSION = 'V10.0.1'
+
+# number of grid points of the verification masks are drawn in this range
+MSK_PNTS = [5000, 200000]
+
+# z-score of the normal confidence limits at ALPHA
+ALPHA = '0.05'
+Z_ALPHA = 1.96
+
+# neighborhood coverage threshold of the config nbrhd settings
+COV_THRESH = '>=0.5'
+
+##################################################################################
+# Generator routines
+##################################################################################
+# parse the string definitions KEY=VALUE of the command line to a dictionary
+# of the generator parameters, returning None with an error message printed
+# if a parameter is missing or malformed
+def read_cnfg(args):
+    cnfg = dict(CNFG_KEYS)
+    for arg in args:
+        key, sep, val = arg.partition('=')
+        if len(sep) == 0 or key not in CNFG_KEYS.keys():
+            print('ERROR: argument ' + arg + ' is not a definition KEY=VALUE' +\
+                    ' of ' + ', '.join(CNFG_KEYS.keys()) + '.')
+            return None
+
+        cnfg[key] = val
+
+    for key, val in cnfg.items():
+        if val is None:
+            print('ERROR: ' + key + ' is not defined.')
+            return None
+
+    for key in ['STRT_DT', 'END_DT']:
+        try:
+            if len(cnfg[key]) != 10:
+                raise ValueError
+
+            cnfg[key] = dt.strptime(cnfg[key], '%Y%m%d%H')
+
+        except ValueError:
+            print('ERROR: ' + key + ', ' + cnfg[key] +\
+                    ', is not in YYYYMMDDHH format.')
+            return None
+
+    for key in ['CYC_INT', 'ACC_INT', 'SEED', 'LEADS', 'NBRHD_WDTHS']:
+        try:
+            vals = [int(val) for val in cnfg[key].split(',')]
+            if min(vals) < 0 or (key == 'CYC_INT' and vals[0] == 0):
+                raise ValueError
+
+        except ValueError:
+            print('ERROR: ' + key + ', ' + cnfg[key] +\
+                    ', is not a valid non-negative integer or list.')
+            return None
+
+        if key in ['LEADS', 'NBRHD_WDTHS']:
+            cnfg[key] = vals
+
+        else:
+            cnfg[key] = vals[0]
+
+    for key in ['MSKS', 'THRS', 'LINE_TYPES']:
+        cnfg[key] = [val for val in cnfg[key].split(',') if len(val) > 0]
+
+    for thr in cnfg['THRS']:
+        try:
+            thresh_val(thr)
+
+        except ValueError:
+            print('ERROR: threshold ' + thr + ' is not of the form >=10.0.')
+            return None
+
+    for line_type in cnfg['LINE_TYPES']:
+        if line_type not in GEN_TYPES:
+            print('ERROR: line type ' + line_type + ' is not one of ' +\
+                    ', '.join(GEN_TYPES) + '.')
+            return None
+
+    if cnfg['BTSTRP'] not in ['TRUE', 'FALSE']:
+        print('ERROR: BTSTRP must be set to TRUE or FALSE, got ' +\
+                cnfg['BTSTRP'] + '.')
+        return None
+
+    if cnfg['OUT_FMT'] not in ['txt', 'stat']:
+        print('ERROR: OUT_FMT must be set to txt or stat, got ' +\
+                cnfg['OUT_FMT'] + '.')
+        return None
+
+    return cnfg
+
+# numeric value of a MET threshold string, e.g., 25.4 for >=25.4
+def thresh_val(thr):
+    return float(thr.lstrip('<>=!'))
+
+# draw contingency table counts for n_pnts grid points per row at base rates
+# baser, returned as the arrays FY_OY, FY_ON, FN_OY, FN_ON
+def draw_ctc(rng, n_pnts, baser):
+    oy = rng.binomial(n_pnts, baser)
+    fy_oy = rng.binomial(oy, rng.uniform(0.3, 0.9, len(oy)))
+    fy = np.rint(oy * rng.lognormal(0.0, 0.3, len(oy))).astype(int)
+    fy_on = np.clip(fy - fy_oy, 0, n_pnts - oy)
+    fn_oy = oy - fy_oy
+    fn_on = n_pnts - oy - fy_on
+
+    return fy_oy, fy_on, fn_oy, fn_on
+
+# draw the moments of the forecast and observed fields for n_rows rows,
+# returned as a dictionary of arrays by the CNT column names
+def draw_moments(rng, n_rows):
+    obar = rng.gamma(2.0, 4.0, n_rows)
+    ostdev = obar * rng.uniform(0.8, 1.6, n_rows)
+    return {
+            'OBAR': obar,
+            'OSTDEV': ostdev,
+            'FBAR': obar * rng.lognormal(0.0, 0.25, n_rows),
+            'FSTDEV': ostdev * rng.lognormal(0.0, 0.2, n_rows),
+            'PR_CORR': rng.uniform(0.2, 0.9, n_rows),
+           }
+
+# continuous statistics of the moments over n_pnts grid points per row, as a
+# dictionary of arrays by the CNT column names
+def cnt_stats(mom, n_pnts):
+    stats = dict(mom)
+    me = mom['FBAR'] - mom['OBAR']
+    estdev = np.sqrt(mom['FSTDEV'] ** 2 + mom['OSTDEV'] ** 2 -\
+                     2 * mom['PR_CORR'] * mom['FSTDEV'] * mom['OSTDEV'])
+    mse = me ** 2 + estdev ** 2
+    stats.update({
+                  'TOTAL': n_pnts,
+                  'SP_CORR': mom['PR_CORR'] * 0.95,
+                  'KT_CORR': mom['PR_CORR'] * 0.75,
+                  'RANKS': np.zeros(len(n_pnts)),
+                  'FRANK_TIES': np.zeros(len(n_pnts)),
+                  'ORANK_TIES': np.zeros(len(n_pnts)),
+                  'ME': me,
+                  'ESTDEV': estdev,
+                  'MBIAS': mom['FBAR'] / mom['OBAR'],
+                  'MAE': np.sqrt(mse) * 0.8,
+                  'MSE': mse,
+                  'BCMSE': estdev ** 2,
+                  'RMSE': np.sqrt(mse),
+                  'EIQR': 2 * 0.6745 * estdev,
+                  'MAD': 0.6745 * estdev,
+                  'ME2': me ** 2,
+                  'MSESS': 1 - mse / mom['OSTDEV'] ** 2,
+                  'RMSFA': np.sqrt(mom['FSTDEV'] ** 2 + mom['FBAR'] ** 2),
+                  'RMSOA': np.sqrt(mom['OSTDEV'] ** 2 + mom['OBAR'] ** 2),
+                  'SI': np.sqrt(mse) / mom['OBAR'],
+                 })
+
+    for pct, z_val in [[10, -1.2816], [25, -0.6745], [50, 0.0], [75, 0.6745],
+                       [90, 1.2816]]:
+        stats['E' + str(pct)] = me + z_val * estdev
+
+    return stats
+
+# scalar partial sums of the moments, as a dictionary of arrays by the SL1L2
+# column names
+def sl1l2_stats(mom, n_pnts):
+    stats = cnt_stats(mom, n_pnts)
+    return {
+            'TOTAL': n_pnts,
+            'FBAR': mom['FBAR'],
+            'OBAR': mom['OBAR'],
+            'FOBAR': mom['PR_CORR'] * mom['FSTDEV'] * mom['OSTDEV'] +\
+                     mom['FBAR'] * mom['OBAR'],
+            'FFBAR': mom['FSTDEV'] ** 2 + mom['FBAR'] ** 2,
+            'OOBAR': mom['OSTDEV'] ** 2 + mom['OBAR'] ** 2,
+            'MAE': stats['MAE'],
+           }
+
+# neighborhood continuous statistics at the event rates of the contingency
+# table counts, as a dictionary of arrays by the NBRCNT column names
+def nbrcnt_stats(rng, fy_oy, fy_on, fn_oy, fn_on):
+    n_pnts = fy_oy + fy_on + fn_oy + fn_on
+    f_rate = (fy_oy + fy_on) / n_pnts
+    o_rate = (fy_oy + fn_oy) / n_pnts
+    with np.errstate(divide='ignore', invalid='ignore'):
+        afss = 2 * f_rate * o_rate / (f_rate ** 2 + o_rate ** 2)
+        fss = afss * rng.uniform(0.4, 1.0, len(n_pnts))
+        fbs = (1 - fss) * (f_rate ** 2 + o_rate ** 2)
+
+    return {
+            'TOTAL': n_pnts,
+            'FBS': fbs,
+            'FSS': fss,
+            'AFSS': afss,
+            'UFSS': 0.5 + o_rate / 2,
+            'F_RATE': f_rate,
+            'O_RATE': o_rate,
+           }
+
+# values of the columns of a line type from the statistics of its rows,
+# adding normal confidence limits about each statistic of width shrinking
+# with the number of grid points and, if btstrp, bootstrap limits; columns
+# without a value are NaN
+def fill_cols(rng, line_type, stats, n_pnts, btstrp):
+    n_rows = len(n_pnts)
+    vals = []
+    for col in LINE_TYPE_COLS[line_type]:
+        stat, sep, bnd = col.rpartition('_')
+        if col in stats.keys():
+            vals.append(np.asarray(stats[col], dtype=float))
+
+        elif stat in stats.keys() and bnd in ['NCL', 'NCU', 'BCL', 'BCU']:
+            wdth = Z_ALPHA * np.abs(stats[stat]) / np.sqrt(n_pnts / 100.0)
+            if bnd[:2] == 'BC':
+                if not btstrp:
+                    vals.append(np.full(n_rows, np.nan))
+                    continue
+
+                wdth = wdth * rng.uniform(0.9, 1.1, n_rows)
+
+            if bnd[-1] == 'L':
+                vals.append(stats[stat] - wdth)
+
+            else:
+                vals.append(stats[stat] + wdth)
+
+        else:
+            vals.append(np.full(n_rows, np.nan))
+
+    return np.stack(vals, axis=1)
+
+# format the rows of a line type as MET text lines, from the header fields
+# of each row and the matrix of column values
+def fmt_rows(line_type, hdrs, vals):
+    lines = []
+    for hdr, row in zip(hdrs, vals):
+        fields = []
+        for col, val in zip(LINE_TYPE_COLS[line_type], row):
+            if np.isnan(val):
+                fields.append('NA')
+
+            elif col in ['TOTAL', 'RANKS', 'FRANK_TIES', 'ORANK_TIES'] or\
+                    line_type in ['ctc', 'nbrctc']:
+                fields.append('%d'%val)
+
+            else:
+                fields.append('%.5f'%val)
+
+        lines.append(' '.join(hdr + [line_type.upper()] + fields) + '\n')
+
+    return lines
+
+# generate the rows of every line type for a single cycle and lead, returned
+# as a dictionary of MET text lines by line type
+def gen_lead(cnfg, rng, msk_pnts, cyc_dt, lead):
+    vld_dt = cyc_dt + timedelta(hours=lead)
+    vld_beg = (vld_dt - timedelta(hours=cnfg['ACC_INT'])).strftime(DT_FMT)
+    vld_end = vld_dt.strftime(DT_FMT)
+    fld = 'QPF_' + str(cnfg['ACC_INT']) + 'hr'
+    btstrp = cnfg['BTSTRP'] == 'TRUE'
+
+    # header fields by line type up to, but not including, LINE_TYPE
+    def hdr(msk, mthd, pnts, thr, cov, alpha):
+        return [VERSION, cnfg['CTR_FLW'], 'NA', '%02d0000'%lead, vld_beg,
+                vld_end, '000000', vld_beg, vld_end, fld, 'mm', 'L0',
+                'precip', 'mm', 'L0', 'ANALYS', msk, mthd, str(pnts), thr,
+                thr, cov, alpha]
+
+    # rows of the categorical line types by mask x threshold and of the
+    # neighborhood line types by mask x threshold x width
+    cat_rows = [[msk, thr, 'NEAREST', 1] for msk in cnfg['MSKS']
+                for thr in cnfg['THRS']]
+    nbr_rows = [[msk, thr, 'NBRHD_SQUARE', wdth ** 2]
+                for msk in cnfg['MSKS'] for thr in cnfg['THRS']
+                for wdth in cnfg['NBRHD_WDTHS']]
+
+    lines = {}
+    for rows, types in [[cat_rows, ['ctc', 'cts']],
+                        [nbr_rows, ['nbrctc', 'nbrcts', 'nbrcnt']]]:
+        types = [line_type for line_type in types
+                 if line_type in cnfg['LINE_TYPES']]
+        if len(types) == 0 or len(rows) == 0:
+            continue
+
+        n_pnts = np.array([msk_pnts[row[0]] for row in rows])
+        baser = np.array([0.4 * np.exp(-thresh_val(row[1]) / 20.0)
+                          for row in rows])
+        counts = draw_ctc(rng, n_pnts, baser)
+        for line_type in types:
+            if line_type in ['ctc', 'nbrctc']:
+                stats = dict(zip(LINE_TYPE_COLS[line_type],
+                                 (n_pnts,) + counts))
+                cov, alpha = 'NA', 'NA'
+
+            elif line_type == 'nbrcnt':
+                stats = nbrcnt_stats(rng, *counts)
+                cov, alpha = 'NA', ALPHA
+
+            else:
+                stats = cts_scores(*counts)
+                stats['TOTAL'] = n_pnts
+                cov = COV_THRESH if line_type == 'nbrcts' else 'NA'
+                alpha = ALPHA
+
+            hdrs = [hdr(row[0], row[2], row[3], row[1], cov, alpha)
+                    for row in rows]
+            vals = fill_cols(rng, line_type, stats, n_pnts, btstrp)
+            lines[line_type] = fmt_rows(line_type, hdrs, vals)
+
+    # rows of the continuous line types by mask, with cnt_thresh NA
+    types = [line_type for line_type in ['cnt', 'sl1l2']
+             if line_type in cnfg['LINE_TYPES']]
+    if len(types) > 0:
+        n_pnts = np.array([msk_pnts[msk] for msk in cnfg['MSKS']])
+        mom = draw_moments(rng, len(n_pnts))
+        for line_type in types:
+            if line_type == 'cnt':
+                stats = cnt_stats(mom, n_pnts)
+                alpha = ALPHA
+
+            else:
+                stats = sl1l2_stats(mom, n_pnts)
+                alpha = 'NA'
+
+            hdrs = [hdr(msk, 'NEAREST', 1, 'NA', 'NA', alpha)
+                    for msk in cnfg['MSKS']]
+            vals = fill_cols(rng, line_type, stats, n_pnts, btstrp)
+            lines[line_type] = fmt_rows(line_type, hdrs, vals)
+
+    return lines
+
+# write the grid_stat_* files of every cycle of the configuration, returning
+# the number of files, rows and bytes written
+def gen_gridstat(cnfg):
+    rng = np.random.default_rng(cnfg['SEED'])
+    msk_pnts = dict(zip(cnfg['MSKS'],
+                        rng.integers(MSK_PNTS[0], MSK_PNTS[1],
+                                     len(cnfg['MSKS']))))
+
+    # include underscore if prefix is of nonzero length
+    if len(cnfg['PRFX']) > 0:
+        pfx = cnfg['PRFX'] + '_'
+
+    else:
+        pfx = ''
+
+    n_files, n_rows, n_bytes = 0, 0, 0
+    cyc_dt = cnfg['STRT_DT']
+    while cyc_dt <= cnfg['END_DT']:
+        cyc_dir = cnfg['IN_ROOT'] + '/' + cnfg['CTR_FLW'] + '/' +\
+                  cyc_dt.strftime('%Y%m%d%H')
+        os.makedirs(cyc_dir, exist_ok=True)
+
+        for lead in cnfg['LEADS']:
+            vld_dt = cyc_dt + timedelta(hours=lead)
+            base = cyc_dir + '/grid_stat_' + pfx + '%02d0000L_'%lead +\
+                   vld_dt.strftime(DT_FMT) + 'V'
+
+            lines = gen_lead(cnfg, rng, msk_pnts, cyc_dt, lead)
+            if cnfg['OUT_FMT'] == 'stat':
+                outs = {base + '.stat': [' '.join(HDR_COLS) + '\n'] +\
+                        sum([lines[line_type] for line_type in lines.keys()],
+                            [])}
+
+            else:
+                outs = {}
+                for line_type in lines.keys():
+                    outs[base + '_' + line_type + '.txt'] =\
+                            [' '.join(line_type_cols(line_type)) + '\n'] +\
+                            lines[line_type]
+
+            for out_path, out_lines in outs.items():
+                with open(out_path, 'w') as f:
+                    f.writelines(out_lines)
+
+                n_files += 1
+                n_rows += len(out_lines) - 1
+                n_bytes += os.path.getsize(out_path)
+
+        cyc_dt += timedelta(hours=cnfg['CYC_INT'])
+
+    return n_files, n_rows, n_bytes
+
+##################################################################################
+# Write the synthetic outputs
+##################################################################################
+if __name__ == '__main__':
+    cnfg = read_cnfg(sys.argv[1:])
+    if cnfg is None:
+        sys.exit(1)
+
+    n_files, n_rows, n_bytes = gen_gridstat(cnfg)
+    print('Wrote ' + str(n_rows) + ' rows in ' + str(n_files) + ' files, ' +\
+            '%.1f'%(n_bytes / 1024 ** 2) + ' MB, to ' + cnfg['IN_ROOT'] +\
+            '/' + cnfg['CTR_FLW'])
+
+##################################################################################
+# end
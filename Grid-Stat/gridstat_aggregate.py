@@ -0,0 +1,339 @@
+##################################################################################
+# Description
+##################################################################################
+# This module aggregates the partial sums of MET Grid-Stat outputs in the
+# store of the companion script proc_gridstat.py over arbitrary groupings,
+# e.g., control flow, verification mask, lead, threshold and windows of valid
+# dates, and derives the verification scores of each group, as the MET tool
+# stat_analysis does with -job aggregate_stat. The partial sum line types
+#
+#     ctc / nbrctc  - contingency table counts, summed over the group
+#     sl1l2         - scalar partial sums, averaged weighted by TOTAL
+#     nbrcnt        - fractions skill score sums, averaged weighted by TOTAL
+#
+# are read from the store with only the grouping and sum columns, and the rows
+# of all groups are summed in a single pass of np.bincount over the group
+# numbers of the rows, after which the scores of all groups are derived as
+# NumPy array operations. The cost is thus linear in the number of rows read,
+# independently of the number of groups. For example,
+#
+#     agg_stats(['NRT_gfs', 'NRT_ecmwf'], 'd01', '', '2022121400',
+#               '2023031500', 'ctc', ['CTR_FLW', 'FCST_LEAD', 'FCST_THRESH'],
+#               window='Q-NOV', VX_MASK='CALatLonPoints')
+#
+# returns a dataframe of the summed counts and CSI, GSS, FBIAS, etc., of each
+# control flow, lead and threshold by meteorological season of valid date.
+#
+##################################################################################
+# License Statement
+##################################################################################
+#
+# Copyright 2023 Colin Grudzien, cgrudzien@ucsd.edu
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+#
+##################################################################################
+# Imports
+##################################################################################
+import numpy as np
+import pandas as pd
+from gridstat_schema import CTC_COLS
+from gridstat_store import store_path, store_columns, read_store
+from proc_gridstat import OUT_ROOT
+
+##################################################################################
+# SET GLOBAL PARAMETERS
+##################################################################################
+# columns of the partial sums of each line type, summed for the counts of
+# ctc / nbrctc and averaged weighted by TOTAL for the others; FSS is summed as
+# the reference forecast Brier score FBS / (1 - FSS) of each row
+SUM_COLS = {
+            'ctc': CTC_COLS,
+            'nbrctc': CTC_COLS,
+            'sl1l2': ['TOTAL', 'FBAR', 'OBAR', 'FOBAR', 'FFBAR', 'OOBAR',
+                      'MAE'],
+            'nbrcnt': ['TOTAL', 'FBS', 'FSS', 'F_RATE', 'O_RATE'],
+           }
+
+# label of the window of valid dates of each row, grouped on as a column
+WINDOW = 'WINDOW'
+
+##################################################################################
+# Scores of the partial sums
+##################################################################################
+# contingency table statistics of the counts, as a dictionary of arrays by
+# the CTS column names, undefined values are NaN
+def cts_scores(fy_oy, fy_on, fn_oy, fn_on):
+    a, b, c, d = [np.asarray(x, dtype=float) for x in
+                  [fy_oy, fy_on, fn_oy, fn_on]]
+    n = a + b + c + d
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pody = a / (a + c)
+        pofd = b / (b + d)
+        a_r = (a + b) * (a + c) / n
+        odds = a * d / (b * c)
+        scores = {
+                  'BASER': (a + c) / n,
+                  'FMEAN': (a + b) / n,
+                  'ACC': (a + d) / n,
+                  'FBIAS': (a + b) / (a + c),
+                  'PODY': pody,
+                  'PODN': d / (b + d),
+                  'POFD': pofd,
+                  'FAR': b / (a + b),
+                  'CSI': a / (a + b + c),
+                  'GSS': (a - a_r) / (a + b + c - a_r),
+                  'HK': pody - pofd,
+                  'HSS': 2 * (a * d - b * c) /\
+                          ((a + c) * (c + d) + (a + b) * (b + d)),
+                  'ODDS': odds,
+                  'LODDS': np.log(odds),
+                  'ORSS': (a * d - b * c) / (a * d + b * c),
+                  'EDS': 2 * np.log((a + c) / n) / np.log(a / n) - 1,
+                  'SEDS': (np.log((a + b) / n) + np.log((a + c) / n)) /\
+                          np.log(a / n) - 1,
+                  'EDI': (np.log(pofd) - np.log(pody)) /\
+                          (np.log(pofd) + np.log(pody)),
+                  'SEDI': (np.log(pofd) - np.log(pody) - np.log(1 - pofd) +\
+                           np.log(1 - pody)) /\
+                          (np.log(pofd) + np.log(pody) + np.log(1 - pofd) +\
+                           np.log(1 - pody)),
+                 }
+
+    for key, val in scores.items():
+        scores[key] = np.where(np.isfinite(val), val, np.nan)
+
+    return scores
+
+# continuous statistics of the scalar partial sums over n points, as a
+# dictionary of arrays by the CNT column names
+def cnt_scores(n, fbar, obar, fobar, ffbar, oobar, mae):
+    n = np.asarray(n, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        f_var = ffbar - fbar ** 2
+        o_var = oobar - obar ** 2
+        me = fbar - obar
+        mse = ffbar + oobar - 2 * fobar
+        bcmse = mse - me ** 2
+        scores = {
+                  'FBAR': fbar,
+                  'FSTDEV': np.sqrt(f_var * n / (n - 1)),
+                  'OBAR': obar,
+                  'OSTDEV': np.sqrt(o_var * n / (n - 1)),
+                  'PR_CORR': (fobar - fbar * obar) / np.sqrt(f_var * o_var),
+                  'ME': me,
+                  'ESTDEV': np.sqrt(bcmse * n / (n - 1)),
+                  'MBIAS': fbar / obar,
+                  'MAE': mae,
+                  'MSE': mse,
+                  'BCMSE': bcmse,
+                  'RMSE': np.sqrt(mse),
+                  'ME2': me ** 2,
+                  'MSESS': 1 - mse / o_var,
+                  'RMSFA': np.sqrt(ffbar),
+                  'RMSOA': np.sqrt(oobar),
+                  'SI': np.sqrt(bcmse) / obar,
+                 }
+
+    for key, val in scores.items():
+        scores[key] = np.where(np.isfinite(val), val, np.nan)
+
+    return scores
+
+# neighborhood continuous statistics of the averaged Brier scores and rates,
+# as a dictionary of arrays by the NBRCNT column names
+def nbrcnt_scores(fbs, fbs_ref, f_rate, o_rate):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scores = {
+                  'FBS': fbs,
+                  'FSS': 1 - fbs / fbs_ref,
+                  'AFSS': 2 * f_rate * o_rate / (f_rate ** 2 + o_rate ** 2),
+                  'UFSS': 0.5 + o_rate / 2,
+                  'F_RATE': f_rate,
+                  'O_RATE': o_rate,
+                 }
+
+    for key, val in scores.items():
+        scores[key] = np.where(np.isfinite(val), val, np.nan)
+
+    return scores
+
+##################################################################################
+# Aggregation
+##################################################################################
+# label each row of a dataframe with the start of its window of valid dates,
+# for a pandas period frequency, e.g., 'W', 'M' or 'Q-NOV' for the seasons
+# DJF, MAM, JJA and SON, modifying and returning the dataframe
+def label_window(df, window):
+    valid = pd.Series(df['FCST_VALID_END'])
+    df[WINDOW] = valid.dt.to_period(window).dt.start_time.to_numpy()
+
+    return df
+
+# read the grouping and partial sum columns of a line type for control flows
+# ctr_flws, a grid and prefix, given without trailing underscore, for cycles
+# between strt_dt and end_dt (strings YYYYMMDDHH), with rows at the fixed
+# values of columns given as keyword arguments, e.g., VX_MASK='All_CA'; the
+# control flow of each row is given by the CTR_FLW column and None is
+# returned if no data exists
+def load_sums(ctr_flws, grd, prfx, strt_dt, end_dt, line_type, keys,
+              **fixed):
+    filters = [(key, '==', val) for key, val in fixed.items()]
+    if len(filters) == 0:
+        filters = None
+
+    frames = []
+    for ctr_flw in ctr_flws:
+        store = store_path(OUT_ROOT + '/' + ctr_flw, grd, prfx)
+        cols = store_columns(store, line_type)
+        vals = [col for col in keys + SUM_COLS[line_type] if col in cols]
+        if len(vals) == 0:
+            continue
+
+        df = read_store(store, line_type, columns=vals, filters=filters,
+                        strt_dt=strt_dt, end_dt=end_dt)
+        if df is not None:
+            df['CTR_FLW'] = ctr_flw
+            frames.append(df)
+
+    if len(frames) == 0:
+        return None
+
+    # categoricals are made strings so that control flows align on values
+    df = pd.concat(frames, axis=0, ignore_index=True)
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(object)
+
+    return df
+
+# sum the partial sums of a line type over the groups of the dataframe rows
+# by the columns keys, returning a dataframe indexed by the sorted groups with
+# the summed / weighted mean partial sums and the number of rows N_ROWS of
+# each group; rows with missing values in the keys form groups of their own
+def agg_sums(df, line_type, keys):
+    # number the groups of the rows by the codes of each key
+    codes = []
+    levels = []
+    for key in keys:
+        code, uniq = pd.factorize(df[key], sort=True, use_na_sentinel=False)
+        codes.append(code)
+        levels.append(uniq)
+
+    shape = tuple([len(uniq) for uniq in levels])
+    if len(keys) > 0:
+        flat = np.ravel_multi_index(codes, shape)
+
+    else:
+        flat = np.zeros(len(df), dtype=int)
+
+    groups, grp = np.unique(flat, return_inverse=True)
+    n_grps = len(groups)
+
+    # weights of the rows, TOTAL for averaged partial sums
+    sums = {'N_ROWS': np.bincount(grp, minlength=n_grps)}
+    total = df['TOTAL'].to_numpy(dtype=float)
+    sums['TOTAL'] = np.bincount(grp, weights=total, minlength=n_grps)
+    for col in SUM_COLS[line_type][1:]:
+        vals = df[col].to_numpy(dtype=float)
+        if line_type in ['ctc', 'nbrctc']:
+            sums[col] = np.bincount(grp, weights=vals, minlength=n_grps)
+            continue
+
+        if col == 'FSS':
+            # reference Brier score of the row, from FBS and FSS, which is
+            # zero for rows without events where FSS is undefined
+            with np.errstate(divide='ignore', invalid='ignore'):
+                vals = df['FBS'].to_numpy(dtype=float) / (1 - vals)
+
+            vals = np.where(np.isfinite(vals), vals, 0.0)
+
+            col = 'FBS_REF'
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sums[col] = np.bincount(grp, weights=vals * total,
+                                    minlength=n_grps) / sums['TOTAL']
+
+    if len(keys) > 0:
+        grp_codes = np.unravel_index(groups, shape)
+        index = pd.MultiIndex.from_arrays([levels[i_k].take(grp_codes[i_k])
+                                           for i_k in range(len(keys))],
+                                          names=keys)
+
+    else:
+        index = pd.RangeIndex(n_grps)
+
+    return pd.DataFrame(sums, index=index)
+
+# derive the scores of the aggregated partial sums of a line type, adding
+# these as columns to the dataframe of agg_sums and returning it
+def agg_scores(sums, line_type):
+    if line_type in ['ctc', 'nbrctc']:
+        scores = cts_scores(*[sums[col].to_numpy() for col in CTC_COLS[1:]])
+
+    elif line_type == 'sl1l2':
+        scores = cnt_scores(*[sums[col].to_numpy() for col in
+                              SUM_COLS['sl1l2']])
+
+    else:
+        scores = nbrcnt_scores(*[sums[col].to_numpy() for col in
+                                 ['FBS', 'FBS_REF', 'F_RATE', 'O_RATE']])
+
+    for key, val in scores.items():
+        sums[key] = val
+
+    return sums
+
+# aggregate the partial sums of a line type, ctc, nbrctc, sl1l2 or nbrcnt, for
+# control flows ctr_flws, a grid and prefix, given without trailing
+# underscore, and cycles between strt_dt and end_dt (strings YYYYMMDDHH), over
+# the groups of rows by the columns keys, e.g., ['CTR_FLW', 'FCST_LEAD'], and
+# if window is given by the WINDOW column of windows of valid dates, at the
+# fixed values of columns given as keyword arguments; returns the dataframe of
+# agg_sums with the scores of each group, or None if no data exists
+def agg_stats(ctr_flws, grd, prfx, strt_dt, end_dt, line_type, keys,
+              window=None, **fixed):
+    if line_type not in SUM_COLS.keys():
+        print('ERROR: line type ' + line_type + ' is not one of ' +\
+                ', '.join(SUM_COLS.keys()) + '.')
+        return None
+
+    keys = list(keys)
+    cols = [key for key in keys if key != WINDOW]
+    if window is not None:
+        if WINDOW not in keys:
+            keys.append(WINDOW)
+
+        cols.append('FCST_VALID_END')
+
+    elif WINDOW in keys:
+        print('ERROR: ' + WINDOW + ' is grouped on without a window.')
+        return None
+
+    df = load_sums(ctr_flws, grd, prfx, strt_dt, end_dt, line_type, cols,
+                   **fixed)
+    if df is None:
+        return None
+
+    for key in cols:
+        if key not in df:
+            print('ERROR: ' + key + ' is not a column of ' + line_type + '.')
+            return None
+
+    if window is not None:
+        df = label_window(df, window)
+
+    return agg_scores(agg_sums(df, line_type, keys), line_type)
+
+##################################################################################
+# end
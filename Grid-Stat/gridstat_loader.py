@@ -0,0 +1,156 @@
+##################################################################################
+# Description
+##################################################################################
+# This module defines the common data access for the plt_gridstat_*.py
+# plotting scripts. Statistics are read from the store written by the
+# companion script proc_gridstat.py for a control flow, grid, prefix, range of
+# forecast cycles and line type, loading the columns of the index defined in
+# gridstat_query.py along with the requested statistics, and optionally their
+# confidence intervals. The loaded data is returned indexed for extraction with
+# the utilities of gridstat_query.py.
+#
+# Loaded data is kept in an in-process least-recently-used cache bounded by
+# the total memory of the cached dataframes, keyed on
+#
+#     (control flow, grid, prefix, start date, end date, line type, columns)
+#
+# so that each dataset is read and decoded at most once per process when
+# drawing multiple figures. Counts of cache hits and misses are available from
+# cache_info(). Cached dataframes are shared between callers and should not be
+# modified in place.
+#
+##################################################################################
+# License Statement
+##################################################################################
+#
+# Copyright 2023 Colin Grudzien, cgrudzien@ucsd.edu
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+#
+##################################################################################
+# Imports
+##################################################################################
+from collections import OrderedDict
+from proc_gridstat import OUT_ROOT
+from gridstat_store import store_path, store_columns, read_store
+from gridstat_query import IDX_COLS, index_stats
+
+##################################################################################
+# SET GLOBAL PARAMETERS
+##################################################################################
+# maximum memory in bytes of dataframes held in the cache
+CACHE_BYTES = 2 * 1024 ** 3
+
+# cache of indexed dataframes and their sizes in bytes at load, ordered from
+# least to most recently used
+CACHE = OrderedDict()
+
+# cache hit / miss counters and current cached bytes
+CACHE_INFO = {
+              'hits': 0,
+              'misses': 0,
+              'bytes': 0,
+             }
+
+##################################################################################
+# Cache utilities
+##################################################################################
+# memory of a cached dataframe in bytes, missing data is cached at no cost
+def data_bytes(df):
+    if df is None:
+        return 0
+
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+# remove least recently used entries until the cache fits in CACHE_BYTES
+def evict():
+    while CACHE_INFO['bytes'] > CACHE_BYTES and len(CACHE) > 0:
+        key, (df, n_bytes) = CACHE.popitem(last=False)
+        CACHE_INFO['bytes'] -= n_bytes
+
+# set the memory bound of the cache in bytes, evicting entries as needed
+def set_cache_bytes(n_bytes):
+    global CACHE_BYTES
+    CACHE_BYTES = n_bytes
+    evict()
+
+# empty the cache and reset the counters
+def clear_cache():
+    CACHE.clear()
+    CACHE_INFO['hits'] = 0
+    CACHE_INFO['misses'] = 0
+    CACHE_INFO['bytes'] = 0
+
+# return the cache counters along with the number of cached entries
+def cache_info():
+    info = dict(CACHE_INFO)
+    info['entries'] = len(CACHE)
+    return info
+
+##################################################################################
+# Loading statistics
+##################################################################################
+# columns to load for statistics of a line type in a store, including the
+# index columns and, if conf is True, any confidence interval columns
+def stat_columns(store, line_type, stats, conf=False):
+    cols = store_columns(store, line_type)
+    vals = [col for col in IDX_COLS if col in cols]
+    for stat in stats:
+        if stat in cols and stat not in vals:
+            vals.append(stat)
+
+        if conf:
+            for cnf_lv in ['_BC', '_NC']:
+                for bnd in ['L', 'U']:
+                    if stat + cnf_lv + bnd in cols:
+                        vals.append(stat + cnf_lv + bnd)
+
+    return vals
+
+# load statistics of a line type for a control flow, grid and prefix, given
+# without trailing underscore, for cycles between strt_dt and end_dt (strings
+# YYYYMMDDHH), returning the dataframe indexed by index_stats, or None if no
+# data exists; if conf is True confidence interval columns are also loaded
+def load_stats(ctr_flw, grd, prfx, strt_dt, end_dt, line_type, stats,
+               conf=False):
+    store = store_path(OUT_ROOT + '/' + ctr_flw, grd, prfx)
+    vals = stat_columns(store, line_type, stats, conf=conf)
+    key = (ctr_flw, grd, prfx, strt_dt, end_dt, line_type, tuple(sorted(vals)))
+
+    if key in CACHE.keys():
+        CACHE_INFO['hits'] += 1
+        CACHE.move_to_end(key)
+        return CACHE[key][0]
+
+    CACHE_INFO['misses'] += 1
+    if len(vals) == 0:
+        stat_data = None
+
+    else:
+        stat_data = read_store(store, line_type, columns=vals,
+                               strt_dt=strt_dt, end_dt=end_dt)
+
+    if stat_data is not None:
+        stat_data = index_stats(stat_data)
+
+    # data larger than the cache is returned without being cached
+    n_bytes = data_bytes(stat_data)
+    if n_bytes <= CACHE_BYTES:
+        CACHE[key] = (stat_data, n_bytes)
+        CACHE_INFO['bytes'] += n_bytes
+        evict()
+
+    return stat_data
+
+##################################################################################
+# end
@@ -0,0 +1,149 @@
+##################################################################################
+# Description
+##################################################################################
+# This module defines the lookups used by the plotting scripts to extract
+# dense arrays of statistics from the dataframes of MET Grid-Stat outputs,
+# as read from the store of the companion script proc_gridstat.py. A sorted
+# MultiIndex over
+#
+#     LINE_TYPE, VX_MASK, FCST_VALID_END, FCST_LEAD, FCST_THRESH
+#
+# is built once when a dataframe is loaded, after which a line of values over
+# leads, or a matrix over, e.g., thresholds x leads or leads x valid dates, is
+# extracted by index alignment. The cost of a figure is thus proportional to
+# the number of cells plotted, rather than a boolean scan of all rows for
+# each cell. Values for cells with no data are returned as NaN.
+#
+##################################################################################
+# License Statement
+##################################################################################
+#
+# Copyright 2023 Colin Grudzien, cgrudzien@ucsd.edu
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+#
+##################################################################################
+# Imports
+##################################################################################
+import numpy as np
+import pandas as pd
+
+##################################################################################
+# SET GLOBAL PARAMETERS
+##################################################################################
+# index levels in sort order
+IDX_COLS = [
+            'LINE_TYPE',
+            'VX_MASK',
+            'FCST_VALID_END',
+            'FCST_LEAD',
+            'FCST_THRESH',
+           ]
+
+##################################################################################
+# Index construction
+##################################################################################
+# set the sorted MultiIndex on the index columns present in a dataframe,
+# returning a new dataframe
+def index_stats(df):
+    keys = [col for col in IDX_COLS if col in df]
+    return df.set_index(keys).sort_index()
+
+# select the rows of an indexed dataframe at fixed values of index levels,
+# given as keyword arguments, keeping all index levels, or None if no rows match
+def select_rows(idx_df, **fixed):
+    keys = [key for key in fixed.keys() if key in idx_df.index.names]
+    if len(keys) == 0:
+        return idx_df
+
+    try:
+        sub = idx_df.xs(tuple([fixed[key] for key in keys]), level=keys,
+                        drop_level=False)
+
+    except KeyError:
+        return None
+
+    if len(sub) == 0:
+        return None
+
+    return sub
+
+# unique values of an index level of an indexed dataframe
+def level_values(idx_df, key):
+    return list(idx_df.index.unique(level=key))
+
+# select a statistic column of an indexed dataframe at fixed values of other
+# index levels, given as keyword arguments, e.g., VX_MASK='All_CA'; index
+# levels other than those in keep are dropped, keeping the first row of any
+# duplicates, and None is returned if no rows match
+def select_stat(idx_df, stat, keep, **fixed):
+    sub = idx_df[stat]
+    for key in keep:
+        if key not in sub.index.names:
+            return None
+
+    for key, val in fixed.items():
+        if key in sub.index.names:
+            try:
+                sub = sub.xs(val, level=key)
+
+            except KeyError:
+                return None
+
+    drop = [lvl for lvl in sub.index.names if lvl not in keep]
+    if len(drop) > 0:
+        sub = sub.droplevel(drop)
+
+    return sub[~sub.index.duplicated(keep='first')]
+
+# categorical index levels are made object dtype so that reindexing and
+# unstacking align on the observed values only
+def decategorize(index):
+    if isinstance(index, pd.MultiIndex):
+        return index.set_levels([decategorize(lvl) for lvl in index.levels])
+
+    elif isinstance(index, pd.CategoricalIndex):
+        return index.astype(object)
+
+    else:
+        return index
+
+##################################################################################
+# Dense array extraction
+##################################################################################
+# values of a statistic over the values vals of a single index level key,
+# e.g., over forecast leads, returned as a 1-D float array of len(vals)
+def stat_vector(idx_df, stat, key, vals, **fixed):
+    sub = select_stat(idx_df, stat, [key], **fixed)
+    if sub is None:
+        return np.full(len(vals), np.nan)
+
+    sub.index = decategorize(sub.index)
+    return sub.reindex(list(vals)).to_numpy(dtype=float)
+
+# values of a statistic over the values row_vals of index level row_key and
+# col_vals of index level col_key, e.g., over thresholds x leads, returned as
+# a 2-D float array of shape len(row_vals) x len(col_vals)
+def stat_matrix(idx_df, stat, row_key, row_vals, col_key, col_vals, **fixed):
+    sub = select_stat(idx_df, stat, [row_key, col_key], **fixed)
+    if sub is None:
+        return np.full([len(row_vals), len(col_vals)], np.nan)
+
+    sub.index = decategorize(sub.index)
+    sub = sub.reorder_levels([row_key, col_key]).unstack(col_key)
+
+    return sub.reindex(index=list(row_vals),
+                       columns=list(col_vals)).to_numpy(dtype=float)
+
+##################################################################################
+# end
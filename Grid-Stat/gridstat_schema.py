@@ -0,0 +1,313 @@
+##################################################################################
+# Description
+##################################################################################
+# This module defines the column layouts and data types of the MET Grid-Stat
+# ASCII output line types, used to type the dataframes built by the companion
+# script proc_gridstat.py at load time. Columns of the MET header are typed as
+# categoricals, date times or integers, while statistic columns are typed as
+# float64, or int32 for counts. Line types not defined in the registry below
+# are typed from the header column rules, with any fully numeric statistic
+# columns cast to float64.
+#
+# Column layouts follow the MET version 10.0.1 output formats, see
+#
+#     https://met.readthedocs.io/en/latest/Users_Guide/grid-stat.html
+#
+##################################################################################
+# License Statement
+##################################################################################
+#
+# Copyright 2023 Colin Grudzien, cgrudzien@ucsd.edu
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+#
+##################################################################################
+# Imports
+##################################################################################
+import numpy as np
+import pandas as pd
+
+##################################################################################
+# MET header columns
+##################################################################################
+# header columns common to all line types, in file order
+HDR_COLS = [
+            'VERSION',
+            'MODEL',
+            'DESC',
+            'FCST_LEAD',
+            'FCST_VALID_BEG',
+            'FCST_VALID_END',
+            'OBS_LEAD',
+            'OBS_VALID_BEG',
+            'OBS_VALID_END',
+            'FCST_VAR',
+            'FCST_UNITS',
+            'FCST_LEV',
+            'OBS_VAR',
+            'OBS_UNITS',
+            'OBS_LEV',
+            'OBTYPE',
+            'VX_MASK',
+            'INTERP_MTHD',
+            'INTERP_PNTS',
+            'FCST_THRESH',
+            'OBS_THRESH',
+            'COV_THRESH',
+            'ALPHA',
+            'LINE_TYPE',
+           ]
+
+# repeated header strings stored as categoricals
+CAT_COLS = [
+            'VERSION',
+            'MODEL',
+            'DESC',
+            'FCST_VAR',
+            'FCST_UNITS',
+            'FCST_LEV',
+            'OBS_VAR',
+            'OBS_UNITS',
+            'OBS_LEV',
+            'OBTYPE',
+            'VX_MASK',
+            'INTERP_MTHD',
+            'FCST_THRESH',
+            'OBS_THRESH',
+            'COV_THRESH',
+            'LINE_TYPE',
+           ]
+
+# header date times, FCST_INIT_BEG is included for stat_analysis outputs
+DT_COLS = [
+           'FCST_INIT_BEG',
+           'FCST_VALID_BEG',
+           'FCST_VALID_END',
+           'OBS_VALID_BEG',
+           'OBS_VALID_END',
+          ]
+
+# MET date time string format
+DT_FMT = '%Y%m%d_%H%M%S'
+
+# NOTE: FCST_LEAD / OBS_LEAD are kept as HHMMSS strings, which are not
+# left-padded, for compatibility with the lead sorting in the plotting scripts
+
+##################################################################################
+# MET line type column layouts
+##################################################################################
+# statistic with normal and bootstrap confidence limits
+def nc_bc_cols(stat):
+    return [stat, stat + '_NCL', stat + '_NCU', stat + '_BCL', stat + '_BCU']
+
+# statistic with bootstrap confidence limits
+def bc_cols(stat):
+    return [stat, stat + '_BCL', stat + '_BCU']
+
+# contingency table counts
+CTC_COLS = ['TOTAL', 'FY_OY', 'FY_ON', 'FN_OY', 'FN_ON']
+
+# contingency table statistics
+CTS_COLS = ['TOTAL']
+for stat in ['BASER', 'FMEAN', 'ACC']:
+    CTS_COLS += nc_bc_cols(stat)
+
+CTS_COLS += bc_cols('FBIAS')
+
+for stat in ['PODY', 'PODN', 'POFD', 'FAR', 'CSI']:
+    CTS_COLS += nc_bc_cols(stat)
+
+CTS_COLS += bc_cols('GSS')
+CTS_COLS += nc_bc_cols('HK')
+CTS_COLS += bc_cols('HSS')
+
+for stat in ['ODDS', 'LODDS', 'ORSS', 'EDS', 'SEDS', 'EDI', 'SEDI']:
+    CTS_COLS += nc_bc_cols(stat)
+
+CTS_COLS += bc_cols('BAGSS')
+
+# continuous statistics
+CNT_COLS = ['TOTAL']
+for stat in ['FBAR', 'FSTDEV', 'OBAR', 'OSTDEV', 'PR_CORR']:
+    CNT_COLS += nc_bc_cols(stat)
+
+CNT_COLS += ['SP_CORR', 'KT_CORR', 'RANKS', 'FRANK_TIES', 'ORANK_TIES']
+
+for stat in ['ME', 'ESTDEV']:
+    CNT_COLS += nc_bc_cols(stat)
+
+for stat in ['MBIAS', 'MAE', 'MSE', 'BCMSE', 'RMSE', 'E10', 'E25', 'E50', 'E75',
+             'E90', 'EIQR', 'MAD']:
+    CNT_COLS += bc_cols(stat)
+
+CNT_COLS += nc_bc_cols('ANOM_CORR')
+
+for stat in ['ME2', 'MSESS', 'RMSFA', 'RMSOA']:
+    CNT_COLS += bc_cols(stat)
+
+CNT_COLS += nc_bc_cols('ANOM_CORR_UNCNTR')
+CNT_COLS += bc_cols('SI')
+
+# neighborhood continuous statistics
+NBRCNT_COLS = ['TOTAL']
+for stat in ['FBS', 'FSS', 'AFSS', 'UFSS', 'F_RATE', 'O_RATE']:
+    NBRCNT_COLS += bc_cols(stat)
+
+# registry of statistic columns following the header, keyed by the file
+# postfix / lower case LINE_TYPE
+LINE_TYPE_COLS = {
+                  'fho': ['TOTAL', 'F_RATE', 'H_RATE', 'O_RATE'],
+                  'ctc': CTC_COLS,
+                  'cts': CTS_COLS,
+                  'cnt': CNT_COLS,
+                  'sl1l2': ['TOTAL', 'FBAR', 'OBAR', 'FOBAR', 'FFBAR',
+                            'OOBAR', 'MAE'],
+                  'sal1l2': ['TOTAL', 'FABAR', 'OABAR', 'FOABAR', 'FFABAR',
+                             'OOABAR', 'MAE'],
+                  'nbrctc': CTC_COLS,
+                  'nbrcts': CTS_COLS,
+                  'nbrcnt': NBRCNT_COLS,
+                 }
+
+# integer count columns, keyed by line type, all other statistics are float64
+INT_COLS = {
+            'fho': ['TOTAL'],
+            'ctc': CTC_COLS,
+            'cts': ['TOTAL'],
+            'cnt': ['TOTAL', 'RANKS', 'FRANK_TIES', 'ORANK_TIES'],
+            'sl1l2': ['TOTAL'],
+            'sal1l2': ['TOTAL'],
+            'nbrctc': CTC_COLS,
+            'nbrcts': ['TOTAL'],
+            'nbrcnt': ['TOTAL'],
+           }
+
+##################################################################################
+# Schema utilities
+##################################################################################
+# return the full ordered column layout of a registered line type, or None
+def line_type_cols(line_type):
+    line_type = line_type.lower()
+    if line_type in LINE_TYPE_COLS.keys():
+        return HDR_COLS + LINE_TYPE_COLS[line_type]
+
+    else:
+        return None
+
+# return the data type for column col of a line type as a numpy / pandas dtype
+# string, or None if the column is not defined by the registry
+def col_dtype(line_type, col):
+    line_type = line_type.lower()
+    if col in CAT_COLS:
+        return 'category'
+
+    elif col in DT_COLS:
+        return 'datetime64[ns]'
+
+    elif col == 'INTERP_PNTS':
+        return 'int32'
+
+    elif col == 'ALPHA':
+        return 'float64'
+
+    elif col in HDR_COLS:
+        return 'object'
+
+    elif line_type in INT_COLS.keys() and col in INT_COLS[line_type]:
+        return 'int32'
+
+    elif line_type in LINE_TYPE_COLS.keys() and\
+            col in LINE_TYPE_COLS[line_type]:
+        return 'float64'
+
+    else:
+        return None
+
+# cast the string columns of a dataframe parsed from a MET file of the given
+# line type to their schema types, returning the typed dataframe; the columns
+# are cast together in one astype, with the valid times parsed separately
+def apply_schema(df, line_type):
+    dtypes = {}
+    dt_cols = []
+    unreg = []
+    for col in df.columns:
+        dtype = col_dtype(line_type, col)
+        if dtype == 'datetime64[ns]':
+            dt_cols.append(col)
+
+        elif dtype == 'int32' and df[col].isnull().values.any():
+            # counts with missing values are kept as floats
+            dtypes[col] = 'float64'
+
+        elif dtype is None:
+            unreg.append(col)
+
+        elif dtype != 'object':
+            dtypes[col] = dtype
+
+    # unregistered statistic columns are cast if fully numeric, checking the
+    # columns one at a time only if these are not all numeric
+    if len(unreg) > 0:
+        try:
+            df[unreg].astype('float64')
+            dtypes.update({col: 'float64' for col in unreg})
+
+        except (ValueError, TypeError):
+            for col in unreg:
+                try:
+                    df[col].astype('float64')
+                    dtypes[col] = 'float64'
+
+                except (ValueError, TypeError):
+                    pass
+
+    # the numeric columns of each type are converted as one 2-D block, rather
+    # than by the column-wise casts of DataFrame.astype
+    blocks = [df[[col for col in df.columns if col not in dtypes.keys()]]]
+    for dtype in ['int32', 'float64']:
+        cols = [col for col, val in dtypes.items() if val == dtype]
+        if len(cols) > 0:
+            blocks.append(pd.DataFrame(df[cols].to_numpy().astype(dtype),
+                                       index=df.index, columns=cols))
+
+    cats = [col for col, val in dtypes.items() if val == 'category']
+    blocks.append(df[cats].astype('category'))
+    df = pd.concat(blocks, axis=1)[df.columns]
+
+    for col in dt_cols:
+        df[col] = pd.to_datetime(df[col], format=DT_FMT)
+
+    return df
+
+# concatenate typed dataframes, taking the union of categories in each
+# categorical column so that these are not degraded to object dtype, the
+# categoricals of the input frames are updated in place
+def concat_typed(frames):
+    for col in frames[0].columns:
+        if isinstance(frames[0][col].dtype, pd.CategoricalDtype):
+            cats = []
+            for df in frames:
+                if col in df and\
+                        isinstance(df[col].dtype, pd.CategoricalDtype):
+                    cats.append(np.asarray(df[col].cat.categories))
+
+            cats = pd.Index(np.unique(np.concatenate(cats)))
+            for df in frames:
+                if col in df and\
+                        isinstance(df[col].dtype, pd.CategoricalDtype):
+                    df[col] = df[col].cat.set_categories(cats)
+
+    return pd.concat(frames, axis=0)
+
+##################################################################################
+# end
@@ -0,0 +1,327 @@
+##################################################################################
+# Description
+##################################################################################
+# This module defines the partitioned columnar store for the dataframes of MET
+# Grid-Stat outputs built by the companion script proc_gridstat.py. Data are
+# written in Parquet format organized by control flow, grid, prefix and line
+# type, with one file per forecast cycle as
+#
+#     ${OUT_ROOT}/${out_cyc_dir}/grid_stats/${GRD}/${PRFX}/${TYPE}/YYYYMMDDHH.parquet
+#
+# where an empty prefix is written to the directory NO_PRFX. The partitions of
+# a cycle are written as the rows of each line type are parsed, buffered in
+# memory up to a budget in bytes and flushed to the partitions in chunks, so
+# that the memory of a writer is bounded independently of the size of the
+# cycle. Partitions are written to temporary files which replace those of
+# the cycle when it is complete. A manifest in the
+# root of the store records the path, size and modification time of the
+# grid_stat_* files ingested for each cycle, so that cycles whose inputs
+# are unchanged need not be parsed again. Readers select the cycles in a date
+# range by file name, project only the columns needed and push down row
+# filters on, e.g., VX_MASK, FCST_LEAD, FCST_VALID_END and FCST_THRESH to the
+# Parquet scan. Filters are given in the disjunctive normal form of
+# pyarrow / pandas.read_parquet, e.g.,
+#
+#     [('VX_MASK', '==', 'All_CA'), ('FCST_LEAD', 'in', ['240000', '480000'])]
+#
+# The pickled dictionary of dataframes grid_stats_*.bin used by earlier
+# versions of this workflow can be exported from the store for compatibility.
+#
+##################################################################################
+# License Statement
+##################################################################################
+#
+# Copyright 2023 Colin Grudzien, cgrudzien@ucsd.edu
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+#
+##################################################################################
+# Imports
+##################################################################################
+import os
+import glob
+import time
+import json
+import pickle
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from gridstat_schema import CAT_COLS, col_dtype, concat_typed
+
+##################################################################################
+# SET GLOBAL PARAMETERS
+##################################################################################
+# store sub-directory of the control flow output directory
+STORE_DIR = 'grid_stats'
+
+# directory name used for the empty prefix
+NO_PRFX = 'NO_PRFX'
+
+# file extension for cycle partitions
+EXT = '.parquet'
+
+# file name of the manifest of ingested inputs
+MANIFEST = 'manifest.json'
+
+# extension of partitions being written
+TMP_EXT = '.tmp'
+
+# default memory budget in bytes of the rows buffered by a cycle writer
+MEM_BYTES = 256 * 1024 ** 2
+
+##################################################################################
+# Store paths
+##################################################################################
+# root of the store for a control flow output directory, grid and prefix, where
+# the prefix is given without trailing underscore
+def store_path(out_dir, grd, prfx):
+    if len(prfx) == 0:
+        prfx = NO_PRFX
+
+    return out_dir + '/' + STORE_DIR + '/' + grd + '/' + prfx
+
+# line types available in the store
+def line_types(store):
+    if not os.path.isdir(store):
+        return []
+
+    return sorted([d for d in os.listdir(store)
+                   if os.path.isdir(store + '/' + d)])
+
+# cycle partition paths of a line type, sorted by cycle and optionally
+# restricted to cycles between strt_dt and end_dt (strings YYYYMMDDHH)
+def cycle_paths(store, line_type, strt_dt=None, end_dt=None):
+    paths = sorted(glob.glob(store + '/' + line_type + '/*' + EXT))
+    cycs = [os.path.basename(path)[:-len(EXT)] for path in paths]
+
+    return [paths[i] for i in range(len(paths))
+            if (strt_dt is None or cycs[i] >= strt_dt) and
+               (end_dt is None or cycs[i] <= end_dt)]
+
+# column names available for a line type in the store
+def store_columns(store, line_type):
+    paths = cycle_paths(store, line_type)
+    if len(paths) == 0:
+        return []
+
+    return pq.read_schema(paths[0]).names
+
+##################################################################################
+# Writing the store
+##################################################################################
+# convert a typed dataframe of a line type to an arrow table with a fixed
+# schema, so that partitions of all cycles share column types; categoricals
+# are stored as strings, dictionary encoded by Parquet, and restored on read
+def to_table(df, line_type):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    fields = []
+    for field in table.schema:
+        dtype = col_dtype(line_type, field.name)
+        if dtype == 'int32':
+            field = field.with_type(pa.int32())
+
+        elif dtype == 'float64':
+            field = field.with_type(pa.float64())
+
+        elif dtype == 'datetime64[ns]':
+            field = field.with_type(pa.timestamp('ns'))
+
+        elif pa.types.is_dictionary(field.type) or\
+                pa.types.is_null(field.type):
+            field = field.with_type(pa.string())
+
+        fields.append(field)
+
+    return table.cast(pa.schema(fields))
+
+# remove the partitions of a cycle from all line types in the store
+def clear_cycle(store, cyc):
+    for line_type in line_types(store):
+        path = store + '/' + line_type + '/' + cyc + EXT
+        if os.path.isfile(path):
+            os.remove(path)
+
+# open a writer of the partitions of a cycle, buffering the rows of each line
+# type up to mem_bytes in total before flushing to temporary partitions; the
+# writer is a dictionary of its buffers and open Parquet files, along with
+# counters of the flushes and of the seconds spent concatenating the buffers
+# and serializing them to the partitions
+def open_cycle(store, cyc, mem_bytes=MEM_BYTES):
+    # remove partitions left by an interrupted writer of the cycle
+    for path in glob.glob(store + '/*/' + cyc + EXT + TMP_EXT):
+        os.remove(path)
+
+    return {
+            'store': store,
+            'cyc': cyc,
+            'mem_bytes': mem_bytes,
+            'frames': {},
+            'bytes': {},
+            'files': {},
+            'n_flush': 0,
+            'concat_s': 0.0,
+            'write_s': 0.0,
+           }
+
+# write the buffered rows of a line type to its temporary partition as a
+# chunk of row groups, opening the partition on the first flush
+def flush_type(writer, line_type):
+    if len(writer['frames'][line_type]) == 0:
+        return
+
+    strt = time.perf_counter()
+    table = to_table(concat_typed(writer['frames'][line_type]), line_type)
+    writer['concat_s'] += time.perf_counter() - strt
+
+    strt = time.perf_counter()
+    if line_type not in writer['files'].keys():
+        os.makedirs(writer['store'] + '/' + line_type, exist_ok=True)
+        path = writer['store'] + '/' + line_type + '/' + writer['cyc'] + EXT +\
+               TMP_EXT
+        writer['files'][line_type] = pq.ParquetWriter(path, table.schema)
+
+    pq_file = writer['files'][line_type]
+    if not table.schema.equals(pq_file.schema):
+        table = table.cast(pq_file.schema)
+
+    pq_file.write_table(table)
+    writer['write_s'] += time.perf_counter() - strt
+    writer['frames'][line_type] = []
+    writer['bytes'][line_type] = 0
+    writer['n_flush'] += 1
+
+# add the typed dataframe of a line type to the cycle, flushing the largest
+# buffers while the rows held exceed the memory budget of the writer
+def append_cycle(writer, line_type, df):
+    if line_type not in writer['frames'].keys():
+        writer['frames'][line_type] = []
+        writer['bytes'][line_type] = 0
+
+    writer['frames'][line_type].append(df)
+    writer['bytes'][line_type] += int(df.memory_usage(index=True,
+                                                      deep=True).sum())
+
+    while sum(writer['bytes'].values()) > writer['mem_bytes']:
+        flush_type(writer, max(writer['bytes'], key=writer['bytes'].get))
+
+# flush the remaining rows of the cycle and replace any partitions previously
+# written for the cycle with those of the writer
+def close_cycle(writer):
+    for line_type in writer['frames'].keys():
+        flush_type(writer, line_type)
+
+    strt = time.perf_counter()
+    clear_cycle(writer['store'], writer['cyc'])
+    for line_type, pq_file in writer['files'].items():
+        pq_file.close()
+        path = writer['store'] + '/' + line_type + '/' + writer['cyc'] + EXT
+        os.replace(path + TMP_EXT, path)
+
+    writer['write_s'] += time.perf_counter() - strt
+
+# write the dataframes of a single cycle, keyed by line type, to the store,
+# replacing any partitions previously written for the cycle
+def write_cycle(store, cyc, data_dict):
+    writer = open_cycle(store, cyc)
+    for line_type in data_dict.keys():
+        append_cycle(writer, line_type, data_dict[line_type])
+
+    close_cycle(writer)
+
+##################################################################################
+# Manifest of ingested inputs
+##################################################################################
+# fingerprint of input files as a dictionary of path : [size, mtime in ns]
+def file_stats(paths):
+    stats = {}
+    for path in paths:
+        stat = os.stat(path)
+        stats[path] = [stat.st_size, stat.st_mtime_ns]
+
+    return stats
+
+# read the manifest of the store as a dictionary of cycle : file fingerprints,
+# an empty dictionary is returned if no manifest has been written
+def read_manifest(store):
+    path = store + '/' + MANIFEST
+    if not os.path.isfile(path):
+        return {}
+
+    with open(path) as f:
+        return json.load(f)
+
+# write the manifest of the store, replacing the previous manifest atomically
+def write_manifest(store, manifest):
+    os.makedirs(store, exist_ok=True)
+    path = store + '/' + MANIFEST
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+
+    os.replace(path + '.tmp', path)
+
+# check if the inputs of a cycle match those recorded in the manifest
+def cycle_current(manifest, cyc, stats):
+    return cyc in manifest.keys() and manifest[cyc] == stats
+
+##################################################################################
+# Reading the store
+##################################################################################
+# read a line type from the store for cycles between strt_dt and end_dt,
+# loading only the listed columns and rows matching the filters; rows are
+# returned in cycle order with the 'line' index starting at 1, or None is
+# returned if no data match
+def read_store(store, line_type, columns=None, filters=None, strt_dt=None,
+               end_dt=None):
+    paths = cycle_paths(store, line_type, strt_dt=strt_dt, end_dt=end_dt)
+    if len(paths) == 0:
+        return None
+
+    # categorical columns are read dictionary encoded
+    names = pq.read_schema(paths[0]).names
+    dict_cols = [col for col in CAT_COLS if col in names]
+    fmt = ds.ParquetFileFormat(read_options=ds.ParquetReadOptions(
+                               dictionary_columns=dict_cols))
+    dataset = ds.dataset(paths, format=fmt)
+
+    if filters is not None:
+        filters = pq.filters_to_expression(filters)
+
+    df = dataset.to_table(columns=columns, filter=filters).to_pandas()
+    if len(df) == 0:
+        return None
+
+    df.index = pd.RangeIndex(1, len(df) + 1, name='line')
+
+    return df
+
+# read all line types from the store into a dictionary of dataframes keyed
+# by line type, as organized in the grid_stats_*.bin files
+def read_store_dict(store, strt_dt=None, end_dt=None):
+    data_dict = {}
+    for line_type in line_types(store):
+        df = read_store(store, line_type, strt_dt=strt_dt, end_dt=end_dt)
+        if df is not None:
+            data_dict[line_type] = df
+
+    return data_dict
+
+# export the store for cycles between strt_dt and end_dt to a pickled
+# dictionary of dataframes at out_path, as written by earlier versions
+def export_bin(store, out_path, strt_dt=None, end_dt=None):
+    data_dict = read_store_dict(store, strt_dt=strt_dt, end_dt=end_dt)
+    with open(out_path, 'wb') as f:
+        pickle.dump(data_dict, f)
+
+##################################################################################
+# end
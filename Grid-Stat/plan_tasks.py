@@ -0,0 +1,202 @@
+##################################################################################
+# Description
+##################################################################################
+# This script computes the table of forecast cycle / lead tasks processed by
+# the companion scripts run_wrfout_cf.sh and run_gridstat.sh in a single pass,
+# so that the shell drivers need not compute the dates of each cycle and lead
+# with a date subprocess. Workflow parameters are supplied as command line
+# arguments of string definitions, as for the shell drivers, e.g.,
+#
+#     python plan_tasks.py STRT_DT=2021012400 END_DT=2021012800 CYC_INT=24 \
+#         ANL_MIN=24 ANL_MAX=120 ANL_INT=24 ACC_INT=24 \
+#         CTR_FLW=NAM_lag06_b0.00_v06_h0300 GRD=d02 VRF_FLD=QPF
+#
+# where CTR_FLW, GRD and VRF_FLD are only used to name the files of each task
+# and default to empty strings. The table is printed with one task per line
+# in cycle / lead order, with the whitespace separated fields
+#
+#     CYC CYC_HR LEAD_HR PDD_HR ANL_STRT ANL_END CF_F FOR_F OBS_F
+#
+# for the cycle directory string YYYYMMDDHH, the hours of the cycle from
+# STRT_DT, the lead hours, the lead hours zero-padded to three digits, the
+# start and end of the accumulation window as YYYY-MM-DD_HH_MM_SS, the
+# cf-compliant file written by run_wrfout_cf.sh, the accumulation file
+# verified by run_gridstat.sh and the StageIV file at the end of the window.
+# Lines beginning with '#' are comments, the first giving the field names
+# and the last the number of tasks and cycles. The same table can be used
+# to distribute the tasks to other schedulers or to report the work of a
+# configuration without running it.
+#
+##################################################################################
+# License Statement
+##################################################################################
+#
+# Copyright 2023 Colin Grudzien, cgrudzien@ucsd.edu
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+#
+##################################################################################
+# Imports
+##################################################################################
+import sys
+from datetime import datetime as dt
+from datetime import timedelta
+
+##################################################################################
+# SET GLOBAL PARAMETERS
+##################################################################################
+# parameters required to plan the tasks, integers of hours except dates
+REQ_KEYS = [
+            'STRT_DT',
+            'END_DT',
+            'CYC_INT',
+            'ANL_MIN',
+            'ANL_MAX',
+            'ANL_INT',
+            'ACC_INT',
+           ]
+
+# parameters naming the files of the tasks, empty strings if not supplied
+NME_KEYS = [
+            'CTR_FLW',
+            'GRD',
+            'VRF_FLD',
+           ]
+
+# fields of a task in the printed table
+TASK_KEYS = [
+             'CYC',
+             'CYC_HR',
+             'LEAD_HR',
+             'PDD_HR',
+             'ANL_STRT',
+             'ANL_END',
+             'CF_F',
+             'FOR_F',
+             'OBS_F',
+            ]
+
+# date format of the accumulation window in file names
+ANL_FMT = '%Y-%m-%d_%H_%M_%S'
+
+##################################################################################
+# Planning routine
+##################################################################################
+# parse the string definitions KEY=VALUE of the command line to a dictionary
+# of the planning parameters, returning None with an error message printed
+# if a parameter is missing or malformed
+def read_cnfg(args):
+    cnfg = {}
+    for arg in args:
+        key, sep, val = arg.partition('=')
+        if len(sep) == 0:
+            print('ERROR: argument ' + arg + ' is not of the form KEY=VALUE.')
+            return None
+
+        cnfg[key] = val
+
+    for key in REQ_KEYS:
+        if key not in cnfg.keys() or len(cnfg[key]) == 0:
+            print('ERROR: ' + key + ' is not defined.')
+            return None
+
+    for key in ['STRT_DT', 'END_DT']:
+        try:
+            if len(cnfg[key]) != 10:
+                raise ValueError
+
+            cnfg[key] = dt.strptime(cnfg[key], '%Y%m%d%H')
+
+        except ValueError:
+            print('ERROR: ' + key + ', ' + cnfg[key] +\
+                    ', is not in YYYYMMDDHH format.')
+            return None
+
+    # ACC_INT is kept as given, e.g. 06, to name the files of the tasks as in
+    # the shell scripts, and is converted only for the accumulation window
+    for key in REQ_KEYS[2:]:
+        try:
+            val = int(cnfg[key])
+
+        except ValueError:
+            print('ERROR: ' + key + ', ' + cnfg[key] +\
+                    ', is not an integer number of hours.')
+            return None
+
+        if key != 'ACC_INT':
+            cnfg[key] = val
+
+    for key in ['CYC_INT', 'ANL_INT']:
+        if cnfg[key] <= 0:
+            print('ERROR: ' + key + ' must be a positive number of hours.')
+            return None
+
+    for key in NME_KEYS:
+        if key not in cnfg.keys():
+            cnfg[key] = ''
+
+    return cnfg
+
+# list the tasks of a configuration in cycle / lead order, each task a list
+# of the fields of TASK_KEYS
+def plan_tasks(cnfg):
+    strt_dt = cnfg['STRT_DT']
+    fcst_hrs = int((cnfg['END_DT'] - strt_dt).total_seconds() // 3600)
+
+    tasks = []
+    for cyc_hr in range(0, fcst_hrs + 1, cnfg['CYC_INT']):
+        cyc = (strt_dt + timedelta(hours=cyc_hr)).strftime('%Y%m%d%H')
+        for lead_hr in range(cnfg['ANL_MIN'], cnfg['ANL_MAX'] + 1,
+                             cnfg['ANL_INT']):
+            # valid times of the accumulation window
+            anl_end = strt_dt + timedelta(hours=cyc_hr + lead_hr)
+            anl_strt = anl_end - timedelta(hours=int(cnfg['ACC_INT']))
+            anl_end_s = anl_end.strftime(ANL_FMT)
+            anl_strt_s = anl_strt.strftime(ANL_FMT)
+            pdd_hr = '%03d'%lead_hr
+
+            cf_f = 'wrfcf_' + cnfg['GRD'] + '_' + anl_strt_s + '_to_' +\
+                    anl_end_s + '.nc'
+            for_f = cnfg['CTR_FLW'] + '_' + cnfg['ACC_INT'] +\
+                    cnfg['VRF_FLD'] + '_' + cyc + '_F' + pdd_hr + '.nc'
+            obs_f = 'StageIV_QPE_' + anl_end.strftime('%Y%m%d%H') + '.nc'
+
+            tasks.append([cyc, str(cyc_hr), str(lead_hr), pdd_hr, anl_strt_s,
+                          anl_end_s, cf_f, for_f, obs_f])
+
+    return tasks
+
+# the table of tasks as printed, with the header and summary comments
+def task_table(tasks):
+    table = '# ' + ' '.join(TASK_KEYS) + '\n'
+    for task in tasks:
+        table += ' '.join(task) + '\n'
+
+    n_cyc = len(set([task[0] for task in tasks]))
+    table += '# ' + str(len(tasks)) + ' tasks over ' + str(n_cyc) +\
+             ' cycles\n'
+
+    return table
+
+##################################################################################
+# Print the task table
+##################################################################################
+if __name__ == '__main__':
+    cnfg = read_cnfg(sys.argv[1:])
+    if cnfg is None:
+        sys.exit(1)
+
+    print(task_table(plan_tasks(cnfg)), end='')
+
+##################################################################################
+# end
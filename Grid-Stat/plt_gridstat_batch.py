@@ -0,0 +1,211 @@
+##################################################################################
+# Description
+##################################################################################
+# This script renders batches of figures with the plot functions of the
+# plt_gridstat_*.py scripts, headless with the Agg backend, in a single
+# process or over a pool of worker processes. Each figure is defined by a
+# plot spec, a dictionary with the plot KIND, one of the keys of PLOTS below,
+# and any global parameters of the plotting script to override, e.g.,
+#
+#     {
+#      'KIND': 'multilead_lineplot',
+#      'CTR_FLWS': ['NAM_lag06_b0.00_v06_h0300', 'RAP_lag06_b0.00_v06_h0300'],
+#      'STATS': ['RMSE', 'PR_CORR'],
+#      'LND_MSK': ['All_CA', 'CALatLonPoints'],
+#      'VALID_DT': ['2021012900', '2021013000'],
+#     }
+#
+# A setting given as a list where the script expects a single value, e.g.,
+# LND_MSK or VALID_DT above, expands the spec to one figure for each value,
+# taking all combinations of such settings. Specs are read from the JSON file
+# given as the first command line argument, or otherwise from SPECS below.
+#
+# Data loaded by the plot functions is cached in each process by
+# gridstat_loader.py, and specs are ordered by the data they load so that
+# figures of the same data are drawn by the same worker, reusing the data.
+#
+##################################################################################
+# License Statement
+##################################################################################
+#
+# Copyright 2023 Colin Grudzien, cgrudzien@ucsd.edu
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+#
+##################################################################################
+# Imports
+##################################################################################
+import matplotlib
+# headless backend, set before the plotting scripts import pyplot
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import sys
+import os
+import json
+import itertools
+import multiprocessing
+from multiprocessing import Pool
+import plt_gridstat_multilead_lineplot
+import plt_gridstat_multilead_lineplot_level
+import plt_gridstat_multidate_heatplot
+import plt_gridstat_multidate_heatplot_level
+import plt_gridstat_multilevel_heatplot
+from gridstat_loader import cache_info
+
+##################################################################################
+# SET GLOBAL PARAMETERS
+##################################################################################
+# plotting scripts by plot kind
+PLOTS = {
+         'multilead_lineplot': plt_gridstat_multilead_lineplot,
+         'multilead_lineplot_level': plt_gridstat_multilead_lineplot_level,
+         'multidate_heatplot': plt_gridstat_multidate_heatplot,
+         'multidate_heatplot_level': plt_gridstat_multidate_heatplot_level,
+         'multilevel_heatplot': plt_gridstat_multilevel_heatplot,
+        }
+
+# plot specs to render when no JSON file of specs is given
+SPECS = [
+         {
+          'KIND': 'multilead_lineplot',
+          'STATS': ['RMSE', 'PR_CORR'],
+          'VALID_DT': ['2021012900', '2021013000'],
+         },
+         {
+          'KIND': 'multidate_heatplot_level',
+          'STAT': ['FSS', 'AFSS'],
+          'LEV': ['>=10.0', '>=25.4'],
+         },
+        ]
+
+# number of worker processes, 1 renders all figures in this process
+N_WORKERS = 1
+
+# settings defining the data loaded by a figure, used to order the specs
+DATA_KEYS = [
+             'CTR_FLWS',
+             'CTR_FLW',
+             'GRDS',
+             'GRD',
+             'PRFXS',
+             'PRFX',
+             'STRT_DT',
+             'END_DT',
+             'TYPE',
+            ]
+
+##################################################################################
+# Batch rendering
+##################################################################################
+# expand a spec to one spec per combination of the settings given as lists
+# where the plotting script expects a single value
+def expand_spec(spec):
+    defaults = PLOTS[spec['KIND']].DEFAULTS
+    keys = []
+    vals = []
+    for key in spec.keys():
+        if key in defaults.keys() and isinstance(spec[key], list) and\
+                not isinstance(defaults[key], list):
+            keys.append(key)
+            vals.append(spec[key])
+
+    specs = []
+    for combo in itertools.product(*vals):
+        exp_spec = dict(spec)
+        exp_spec.update(zip(keys, combo))
+        specs.append(exp_spec)
+
+    return specs
+
+# key of the data loaded for a spec, with defaults of the plotting script
+def data_key(spec):
+    cnfg = dict(PLOTS[spec['KIND']].DEFAULTS)
+    cnfg.update(spec)
+    return str([cnfg[key] for key in DATA_KEYS if key in cnfg.keys()])
+
+# draw and save the figure of a spec, returning the spec, the saved figure
+# path or None on error, and the process ID with its cache counters
+def render(spec):
+    settings = dict(spec)
+    kind = settings.pop('KIND')
+    try:
+        out_path = PLOTS[kind].plot(settings)
+
+    except Exception as err:
+        print('ERROR: plot spec ' + str(spec) + ' failed with ' + repr(err))
+        out_path = None
+
+    plt.close('all')
+
+    return [spec, out_path, os.getpid(), cache_info()]
+
+# render all specs over n_workers processes, returning the results of render
+# in the order of the expanded specs
+def render_batch(specs, n_workers=1):
+    exp_specs = []
+    for spec in specs:
+        if spec['KIND'] not in PLOTS.keys():
+            print('ERROR: plot kind ' + spec['KIND'] + ' is not defined.')
+            continue
+
+        exp_specs += expand_spec(spec)
+
+    # specs of the same data are drawn in sequence and by the same worker
+    exp_specs = sorted(exp_specs, key=data_key)
+    if n_workers <= 1 or len(exp_specs) <= 1:
+        return [render(spec) for spec in exp_specs]
+
+    chunksize = -(-len(exp_specs) // n_workers)
+    with Pool(n_workers) as pool:
+        return pool.map(render, exp_specs, chunksize=chunksize)
+
+# summary of the batch with the failed specs and cache counters per process
+def batch_summary(results):
+    failed = [str(result[0]) for result in results if result[1] is None]
+    caches = {}
+    for result in results:
+        caches[result[2]] = result[3]
+
+    summary = 'Rendered ' + str(len(results) - len(failed)) + ' of ' +\
+              str(len(results)) + ' figures.\n'
+
+    for spec in failed:
+        summary += 'Failed: ' + spec + '\n'
+
+    for pid in sorted(caches.keys()):
+        summary += 'Process ' + str(pid) + ' cache hits: ' +\
+                   str(caches[pid]['hits']) + ' misses: ' +\
+                   str(caches[pid]['misses']) + '\n'
+
+    return summary
+
+##################################################################################
+# Render the batch
+##################################################################################
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        with open(sys.argv[1]) as f:
+            specs = json.load(f)
+
+    else:
+        specs = SPECS
+
+    n_workers = min(N_WORKERS, max(multiprocessing.cpu_count() - 1, 1))
+    results = render_batch(specs, n_workers=n_workers)
+    print(batch_summary(results))
+
+    if len([result for result in results if result[1] is None]) > 0:
+        sys.exit(1)
+
+##################################################################################
+# end
@@ -10,6 +10,11 @@
 # Stats to compare can be reset in the global parameters with heat map color bar
 # changing scale dynamically.
 #
+# The global parameters are the default settings of the plot function, which
+# draws the figure when this script is run and which may be called with a
+# dictionary of settings to override, as in the batch renderer
+# plt_gridstat_batch.py.
+#
 ##################################################################################
 # License Statement
 ##################################################################################
@@ -32,8 +37,6 @@
 # Imports
 ##################################################################################
 import matplotlib
-# use this setting on COMET / Skyriver for x forwarding
-matplotlib.use('TkAgg')
 from datetime import datetime as dt
 import matplotlib.pyplot as plt
 from matplotlib.colors import Normalize as nrm
@@ -43,10 +46,11 @@ from matplotlib.colorbar import Colorbar as cb
 import pandas as pd
 import seaborn as sns
 import numpy as np
-import pickle
 import os
 import sys
 from proc_gridstat import OUT_ROOT
+from gridstat_loader import load_stats
+from gridstat_query import select_rows, level_values, stat_matrix
 
 ##################################################################################
 # SET GLOBAL PARAMETERS 
@@ -119,193 +123,233 @@ MAX_SCALE = 1.0
 # landmask for verification region -- needs to be set in gridstat options
 LND_MSK = 'CALatLonPoints'
 
-# define plot title
-TITLE = STAT + ' - '
-split_string = CTR_FLW.split('_')
-split_len = len(split_string)
-lab_len = min(LAB_LEN, split_len)
-if lab_len > 1:
-    for i_ll in range(lab_len, 1, -1):
-        TITLE += split_string[-i_ll] + '_'
-TITLE += split_string[-1] 
-
-if GRD_LAB:
-    TITLE += ' ' + GRD
-
-if PRFX:
-    TITLE += ' ' + PRFX
-
-TITLE += ' ' + LND_MSK + ' - Precip Thresh ' + LEV + ' mm'
-
-# fig saved automatically to OUT_PATH
-OUT_DIR = OUT_ROOT + '/figures' + FIG_CSE
-OUT_PATH = OUT_DIR + '/' + STRT_DT + '_' + END_DT + '_' + LND_MSK + '_' +\
-           STAT + '_' + CTR_FLW + '_' + GRD + '_' + LEV
-
-if PRFX:
-    OUT_PATH += '_' + PRFX
-
-OUT_PATH += FIG_LAB + '_heatplot.png'
+# global parameters above are the default settings of the figure, which may
+# be overridden by a plot spec, see plt_gridstat_batch.py
+DEFAULTS = {
+            'CTR_FLW': CTR_FLW,
+            'LAB_LEN': LAB_LEN,
+            'GRD_LAB': GRD_LAB,
+            'PRFX': PRFX,
+            'FIG_LAB': FIG_LAB,
+            'FIG_CSE': FIG_CSE,
+            'GRD': GRD,
+            'STRT_DT': STRT_DT,
+            'END_DT': END_DT,
+            'CYC_INT': CYC_INT,
+            'ANL_STRT': ANL_STRT,
+            'ANL_END': ANL_END,
+            'ANL_INT': ANL_INT,
+            'LEV': LEV,
+            'TYPE': TYPE,
+            'STAT': STAT,
+            'COLOR_MAP': COLOR_MAP,
+            'DYN_SCL': DYN_SCL,
+            'MIN_SCALE': MIN_SCALE,
+            'MAX_SCALE': MAX_SCALE,
+            'LND_MSK': LND_MSK,
+           }
 
 ##################################################################################
-# Begin plotting
+# Plotting
 ##################################################################################
-# convert to date times
-if len(STRT_DT) != 10:
-    print('ERROR: STRT_DT, ' + STRT_DT + ', is not in YYYYMMDDHH format.')
-    sys.exit(1)
-
-if len(END_DT) != 10:
-    print('ERROR: END_DT, ' + END_DT + ', is not in YYYYMMDDHH format.')
-    sys.exit(1)
-
-if len(CYC_INT) != 2:
-    print('ERROR: CYC_INT, ' + CYC_INT + ', is not in HH format.')
-    sys.exit(1)
-    
-if len(ANL_STRT) != 10:
-    print('ERROR: ANL_STRT, ' + ANL_STRT + ', is not in YYYYMMDDHH format.')
-    sys.exit(1)
-else:
-    s_iso = ANL_STRT[:4] + '-' + ANL_STRT[4:6] + '-' + ANL_STRT[6:8] +\
-            '_' + ANL_STRT[8:]
-    anl_strt = dt.fromisoformat(s_iso)
-
-if len(ANL_END) != 10:
-    print('ERROR: ANL_END, ' + ANL_END + ', is not in YYYYMMDDHH format.')
-    sys.exit(1)
-else:
-    e_iso = ANL_END[:4] + '-' + ANL_END[4:6] + '-' + ANL_END[6:8] +\
-            '_' + ANL_END[8:]
-    anl_end = dt.fromisoformat(e_iso)
-
-if len(ANL_INT) != 2:
-    print('ERROR: ANL_INT, ' + ANL_INT + ', is not in HH format.')
-    sys.exit(1)
-else:
-    anl_int = ANL_INT + 'H'
-    
-# generate the date range for the analyses
-anl_dates = pd.date_range(start=anl_strt, end=anl_end,
-                          freq=anl_int).to_pydatetime()
-
-# Create a figure
-fig = plt.figure(figsize=(12,9.6))
-
-# Set the axes
-ax0 = fig.add_axes([.92, .18, .03, .77])
-ax1 = fig.add_axes([.07, .18, .84, .77])
-
-# define derived data paths 
-if len(PRFX) > 0:
-    PRFX += '_'
-
-# define the output name
-in_path = OUT_ROOT + '/' + CTR_FLW + '/grid_stats_' + PRFX + GRD + '_' +\
-          STRT_DT + '_to_' + END_DT + '.bin'
-
-try:
-    with open(in_path, 'rb') as f:
-        data = pickle.load(f)
-except:
-    print('ERROR: input data ' + in_path + ' does not exist.')
-    sys.exit(1)
-
-# load the values to be plotted along with landmask, lead and threshold
-vals = [
-        'VX_MASK',
-        'FCST_LEAD',
-        'FCST_THRESH',
-        'FCST_VALID_END',
-       ]
-vals += [STAT]
-
-# cut down df to specified region and level of data 
-stat_data = data[TYPE][vals]
-stat_data = stat_data.loc[(stat_data['FCST_THRESH'] == LEV)]
-stat_data = stat_data.loc[(stat_data['VX_MASK'] == LND_MSK)]
-
-# NOTE: sorting below is designed to handle the issue of string sorting with
-# symbols and non-left-padded decimals
-# sorts first on length of integer expansion for hours, secondly on char
-data_leads = sorted(list(set(stat_data['FCST_LEAD'].values)),
-                    key=lambda x:(len(x), x), reverse=True)
-data_dates = []
-num_leads = len(data_leads)
-num_dates = len(anl_dates)
-
-# create array storage for probs
-tmp = np.empty([num_leads, num_dates])
-tmp[:] = np.nan
-
-for i_nd in range(num_dates):
-    for i_nl in range(num_leads):
-        if i_nl == 0:
-            # on the first loop pack the tick labels
-            if ( i_nd % 2 ) == 0 or num_dates < 10:
-              # if 10 or more leads, only use every other as a label
-              data_dates.append(anl_dates[i_nd].strftime('%Y%m%d'))
-            else:
-                data_dates.append('')
-
-        try:
-            val = stat_data.loc[(stat_data['FCST_LEAD'] == data_leads[i_nl]) &
-                                (stat_data['FCST_VALID_END'] == anl_dates[i_nd].strftime('%Y%m%d_%H%M%S'))]
-            
-            if not val.empty:
-                tmp[i_nl, i_nd] = val[STAT]
-
-        except:
-            continue
-
-if DYN_SCL:
-    # find the max / min value over the inner 100 - alpha range of the data
-    scale = tmp[~np.isnan(tmp)]
-    alpha = 1
-    max_scale, min_scale = np.percentile(scale, [100 - alpha / 2, alpha / 2])
-
-else:
-    # min scale and max scale are set in the above
-    min_scale = MIN_SCALE
-    max_scale = MAX_SCALE
-
-sns.heatmap(tmp[:,:], linewidth=0.5, ax=ax1, cbar_ax=ax0, vmin=min_scale,
-            vmax=max_scale, cmap=COLOR_MAP)
+# draw the figure for the settings in DEFAULTS updated by the spec
+# dictionary, the figure is saved to OUT_PATH and left open, returning
+# OUT_PATH or None on error
+def plot(spec=None):
+    cnfg = dict(DEFAULTS, **(spec or {}))
+    CTR_FLW = cnfg['CTR_FLW']
+    LAB_LEN = cnfg['LAB_LEN']
+    GRD_LAB = cnfg['GRD_LAB']
+    PRFX = cnfg['PRFX']
+    FIG_LAB = cnfg['FIG_LAB']
+    FIG_CSE = cnfg['FIG_CSE']
+    GRD = cnfg['GRD']
+    STRT_DT = cnfg['STRT_DT']
+    END_DT = cnfg['END_DT']
+    CYC_INT = cnfg['CYC_INT']
+    ANL_STRT = cnfg['ANL_STRT']
+    ANL_END = cnfg['ANL_END']
+    ANL_INT = cnfg['ANL_INT']
+    LEV = cnfg['LEV']
+    TYPE = cnfg['TYPE']
+    STAT = cnfg['STAT']
+    COLOR_MAP = cnfg['COLOR_MAP']
+    DYN_SCL = cnfg['DYN_SCL']
+    MIN_SCALE = cnfg['MIN_SCALE']
+    MAX_SCALE = cnfg['MAX_SCALE']
+    LND_MSK = cnfg['LND_MSK']
+
+    # define plot title
+    TITLE = STAT + ' - '
+    split_string = CTR_FLW.split('_')
+    split_len = len(split_string)
+    lab_len = min(LAB_LEN, split_len)
+    if lab_len > 1:
+        for i_ll in range(lab_len, 1, -1):
+            TITLE += split_string[-i_ll] + '_'
+    TITLE += split_string[-1] 
+
+    if GRD_LAB:
+        TITLE += ' ' + GRD
+
+    if PRFX:
+        TITLE += ' ' + PRFX
+
+    TITLE += ' ' + LND_MSK + ' - Precip Thresh ' + LEV + ' mm'
+
+    # fig saved automatically to OUT_PATH
+    OUT_DIR = OUT_ROOT + '/figures' + FIG_CSE
+    OUT_PATH = OUT_DIR + '/' + STRT_DT + '_' + END_DT + '_' + LND_MSK + '_' +\
+               STAT + '_' + CTR_FLW + '_' + GRD + '_' + LEV
+
+    if PRFX:
+        OUT_PATH += '_' + PRFX
+
+    OUT_PATH += FIG_LAB + '_heatplot.png'
+
+    # convert to date times
+    if len(STRT_DT) != 10:
+        print('ERROR: STRT_DT, ' + STRT_DT + ', is not in YYYYMMDDHH format.')
+        return None
+
+    if len(END_DT) != 10:
+        print('ERROR: END_DT, ' + END_DT + ', is not in YYYYMMDDHH format.')
+        return None
+
+    if len(CYC_INT) != 2:
+        print('ERROR: CYC_INT, ' + CYC_INT + ', is not in HH format.')
+        return None
+
+    if len(ANL_STRT) != 10:
+        print('ERROR: ANL_STRT, ' + ANL_STRT + ', is not in YYYYMMDDHH format.')
+        return None
+    else:
+        s_iso = ANL_STRT[:4] + '-' + ANL_STRT[4:6] + '-' + ANL_STRT[6:8] +\
+                '_' + ANL_STRT[8:]
+        anl_strt = dt.fromisoformat(s_iso)
+
+    if len(ANL_END) != 10:
+        print('ERROR: ANL_END, ' + ANL_END + ', is not in YYYYMMDDHH format.')
+        return None
+    else:
+        e_iso = ANL_END[:4] + '-' + ANL_END[4:6] + '-' + ANL_END[6:8] +\
+                '_' + ANL_END[8:]
+        anl_end = dt.fromisoformat(e_iso)
+
+    if len(ANL_INT) != 2:
+        print('ERROR: ANL_INT, ' + ANL_INT + ', is not in HH format.')
+        return None
+    else:
+        anl_int = ANL_INT + 'H'
+
+    # generate the date range for the analyses
+    anl_dates = pd.date_range(start=anl_strt, end=anl_end,
+                              freq=anl_int).to_pydatetime()
+
+    # Create a figure
+    fig = plt.figure(figsize=(12,9.6))
+
+    # Set the axes
+    ax0 = fig.add_axes([.92, .18, .03, .77])
+    ax1 = fig.add_axes([.07, .18, .84, .77])
+
+    # load the stat for the cycles of the control flow
+    stat_data = load_stats(CTR_FLW, GRD, PRFX, STRT_DT, END_DT, TYPE, [STAT])
+
+    # select specified region and level of data for the valid dates
+    if stat_data is not None:
+        stat_data = select_rows(stat_data, VX_MASK=LND_MSK, FCST_THRESH=LEV)
+
+    if stat_data is not None:
+        valid = stat_data.index.get_level_values('FCST_VALID_END')
+        stat_data = stat_data[valid.isin(anl_dates)]
+
+    if stat_data is None or stat_data.empty:
+        print('ERROR: input data for ' + CTR_FLW + ' ' + GRD + ' ' + TYPE +\
+              ' does not exist.')
+        return None
+
+    # NOTE: sorting below is designed to handle the issue of string sorting with
+    # symbols and non-left-padded decimals
+    # sorts first on length of integer expansion for hours, secondly on char
+    data_leads = sorted(level_values(stat_data, 'FCST_LEAD'),
+                        key=lambda x:(len(x), x), reverse=True)
+    data_dates = []
+    num_leads = len(data_leads)
+    num_dates = len(anl_dates)
+
+    # pack the tick labels
+    for i_nd in range(num_dates):
+        if ( i_nd % 2 ) == 0 or num_dates < 10:
+          # if 10 or more leads, only use every other as a label
+          data_dates.append(anl_dates[i_nd].strftime('%Y%m%d'))
+        else:
+            data_dates.append('')
+
+    # extract the leads x dates array of the statistic from the indexed data
+    tmp = stat_matrix(stat_data, STAT, 'FCST_LEAD', data_leads,
+                      'FCST_VALID_END', anl_dates)
+
+    if DYN_SCL:
+        # find the max / min value over the inner 100 - alpha range of the data
+        scale = tmp[~np.isnan(tmp)]
+        alpha = 1
+        max_scale, min_scale = np.percentile(scale, [100 - alpha / 2, alpha / 2])
+
+    else:
+        # min scale and max scale are set in the above
+        min_scale = MIN_SCALE
+        max_scale = MAX_SCALE
+
+    sns.heatmap(tmp[:,:], linewidth=0.5, ax=ax1, cbar_ax=ax0, vmin=min_scale,
+                vmax=max_scale, cmap=COLOR_MAP)
+
+    # define display parameters
+
+    # generate tic labels based on hour values
+    for i in range(num_leads):
+        data_leads[i] = data_leads[i][:-4]
+
+    ax0.set_yticklabels(ax0.get_yticklabels(), rotation=270, va='top')
+    ax1.set_xticklabels(data_dates, rotation=45, ha='right')
+    ax1.set_yticklabels(data_leads)
+
+    # tick parameters
+    ax0.tick_params(
+            labelsize=16
+            )
+
+    ax1.tick_params(
+            labelsize=16
+            )
+
+    lab1='Verification Valid Date'
+    lab2='Forecast Lead Hrs'
+    plt.figtext(.5, .02, lab1, horizontalalignment='center',
+                verticalalignment='center', fontsize=20)
+
+    plt.figtext(.02, .565, lab2, horizontalalignment='center',
+                verticalalignment='center', fontsize=20, rotation=90)
+
+    plt.figtext(.5, .98, TITLE, horizontalalignment='center',
+                verticalalignment='center', fontsize=20)
+
+    # save figure
+    os.system('mkdir -p ' + OUT_DIR)
+    plt.savefig(OUT_PATH)
+
+    return OUT_PATH
 
 ##################################################################################
-# define display parameters
-
-# generate tic labels based on hour values
-for i in range(num_leads):
-    data_leads[i] = data_leads[i][:-4]
-
-ax0.set_yticklabels(ax0.get_yticklabels(), rotation=270, va='top')
-ax1.set_xticklabels(data_dates, rotation=45, ha='right')
-ax1.set_yticklabels(data_leads)
-
-# tick parameters
-ax0.tick_params(
-        labelsize=16
-        )
-
-ax1.tick_params(
-        labelsize=16
-        )
-
-lab1='Verification Valid Date'
-lab2='Forecast Lead Hrs'
-plt.figtext(.5, .02, lab1, horizontalalignment='center',
-            verticalalignment='center', fontsize=20)
-
-plt.figtext(.02, .565, lab2, horizontalalignment='center',
-            verticalalignment='center', fontsize=20, rotation=90)
-
-plt.figtext(.5, .98, TITLE, horizontalalignment='center',
-            verticalalignment='center', fontsize=20)
+# Make a figure with the global parameters
+##################################################################################
+if __name__ == '__main__':
+    # use this setting on COMET / Skyriver for x forwarding
+    matplotlib.use('TkAgg')
+    if plot() is None:
+        sys.exit(1)
 
-# save figure and display
-plt.savefig(OUT_PATH)
-plt.show()
+    plt.show()
 
 ##################################################################################
 # end
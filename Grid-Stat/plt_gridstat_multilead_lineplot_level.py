@@ -11,6 +11,11 @@
 # the global parameters with heat map color bar changing scale dynamically. Here
 # the threshold level to be plotted must be specified.
 #
+# The global parameters are the default settings of the plot function, which
+# draws the figure when this script is run and which may be called with a
+# dictionary of settings to override, as in the batch renderer
+# plt_gridstat_batch.py.
+#
 ##################################################################################
 # License Statement
 ##################################################################################
@@ -33,8 +38,6 @@
 # Imports
 ##################################################################################
 import matplotlib
-# use this setting on COMET / Skyriver for x forwarding
-matplotlib.use('TkAgg')
 from datetime import datetime as dt
 import matplotlib.pyplot as plt
 from matplotlib.colors import Normalize as nrm
@@ -42,10 +45,11 @@ from matplotlib.cm import get_cmap
 from matplotlib.colorbar import Colorbar as cb
 import seaborn as sns
 import numpy as np
-import pickle
 import os
 import sys
 from proc_gridstat import OUT_ROOT
+from gridstat_loader import load_stats
+from gridstat_query import select_rows, level_values, stat_vector
 
 ##################################################################################
 # SET GLOBAL PARAMETERS 
@@ -115,295 +119,309 @@ STATS = ['FSS', 'AFSS']
 # landmask for verification region
 LND_MSK = 'All_CA'
 
-# plot title
-TITLE='24hr accumulated precip at ' + VALID_DT[:4] + '-' + VALID_DT[4:6] + '-' +\
-        VALID_DT[6:8] + '_' + VALID_DT[8:]
-
-# plot sub-title title
-SUBTITLE='Verification region - ' + LND_MSK + ' Threshold ' + LEV + ' mm'
+# global parameters above are the default settings of the figure, which may
+# be overridden by a plot spec, see plt_gridstat_batch.py
+DEFAULTS = {
+            'CTR_FLWS': CTR_FLWS,
+            'LAB_IDX': LAB_IDX,
+            'GRD_LAB': GRD_LAB,
+            'PRFXS': PRFXS,
+            'FIG_LAB': FIG_LAB,
+            'FIG_CSE': FIG_CSE,
+            'GRDS': GRDS,
+            'REF': REF,
+            'LEV': LEV,
+            'STRT_DT': STRT_DT,
+            'END_DT': END_DT,
+            'VALID_DT': VALID_DT,
+            'TYPE': TYPE,
+            'STATS': STATS,
+            'LND_MSK': LND_MSK,
+           }
 
-# fig saved automatically to OUT_PATH
-OUT_DIR = OUT_ROOT + '/figures' + FIG_CSE
-OUT_PATH = OUT_DIR + '/' + VALID_DT + '_' + LND_MSK + '_' + STATS[0] + '_' +\
-           STATS[1] + '_lev_' + LEV + '_' + FIG_LAB + '_lineplot.png'
-    
-##################################################################################
-# Begin plotting
-##################################################################################
-if len(STRT_DT) != 10:
-    print('ERROR: STRT_DT, ' + STRT_DT + ', is not in YYYYMMDDHH format.')
-    sys.exit(1)
-
-if len(END_DT) != 10:
-    print('ERROR: END_DT, ' + END_DT + ', is not in YYYYMMDDHH format.')
-    sys.exit(1)
-
-if len(VALID_DT) != 10:
-    print('ERROR: VALID_DT, ' + VALID_DT + ', is not in YYYYMMDDHH format.')
-    sys.exit(1)
-else:
-    v_iso = VALID_DT[:4] + '-' + VALID_DT[4:6] + '-' + VALID_DT[6:8] +\
-            '_' + VALID_DT[8:]
-    valid_dt = dt.fromisoformat(v_iso)
-
-fcst_leads = []
-for ctr_flw in CTR_FLWS:
-    for prfx in PRFXS:
-        if len(prfx) > 0:
-            pfx = prfx + '_'
-        else:
-            pfx = ''
-        
-        # define derived data paths 
-        data_root = OUT_ROOT + '/' + ctr_flw
-        stat0 = STATS[0]
-        stat1 = STATS[1]
-        
-        for grd in GRDS:
-            in_path = data_root + '/grid_stats_' + pfx + grd + '_' + STRT_DT +\
-                      '_to_' + END_DT + '.bin'
-            
-            try:
-                with open(in_path, 'rb') as f:
-                    data = pickle.load(f)
-
-            except:
-                print('WARNING: input data ' + in_path +\
-                        ' does not exist, skipping this configuration.')
-                continue
-
-            # load the values to be plotted along with landmask and lead
-            vals = [
-                    'VX_MASK',
-                    'FCST_LEAD',
-                    'FCST_VALID_END',
-                   ]
-            vals += STATS
-            
-            # cut down df to specified valid date / region and obtain leads of data 
-            stat_data = data[TYPE][vals]
-            stat_data = stat_data.loc[(stat_data['VX_MASK'] == LND_MSK)]
-            stat_data = stat_data.loc[(stat_data['FCST_VALID_END'] ==
-                                       valid_dt.strftime('%Y%m%d_%H%M%S'))]
-            leads = sorted(list(set(stat_data['FCST_LEAD'].values)),
-                           key=lambda x:(len(x), x))
-
-            fcst_leads += leads
-
-# find all unique values for forecast leads, sorted for plotting
-fcst_leads = sorted(list(set(fcst_leads)), key=lambda x:(len(x), x))
-num_leads = len(fcst_leads)
-            
 ##################################################################################
-# Begin plotting
+# Plotting
 ##################################################################################
-# create a figure
-fig = plt.figure(figsize=(12,9.6))
-
-# Set the axes
-ax0 = fig.add_axes([.110, .395, .85, .33])
-ax1 = fig.add_axes([.110, .065, .85, .33])
-
-line_list = []
-line_labs = []
-ax0_l = []
-ax1_l = []
-
-# increment line count whenever a configuration is plotted
-line_count = 0
+# draw the figure for the settings in DEFAULTS updated by the spec
+# dictionary, the figure is saved to OUT_PATH and left open, returning
+# OUT_PATH or None on error
+def plot(spec=None):
+    cnfg = dict(DEFAULTS, **(spec or {}))
+    CTR_FLWS = cnfg['CTR_FLWS']
+    LAB_IDX = cnfg['LAB_IDX']
+    GRD_LAB = cnfg['GRD_LAB']
+    PRFXS = cnfg['PRFXS']
+    FIG_LAB = cnfg['FIG_LAB']
+    FIG_CSE = cnfg['FIG_CSE']
+    GRDS = cnfg['GRDS']
+    REF = cnfg['REF']
+    LEV = cnfg['LEV']
+    STRT_DT = cnfg['STRT_DT']
+    END_DT = cnfg['END_DT']
+    VALID_DT = cnfg['VALID_DT']
+    TYPE = cnfg['TYPE']
+    STATS = cnfg['STATS']
+    LND_MSK = cnfg['LND_MSK']
+
+    # plot title
+    TITLE='24hr accumulated precip at ' + VALID_DT[:4] + '-' + VALID_DT[4:6] +\
+            '-' + VALID_DT[6:8] + '_' + VALID_DT[8:]
+
+    # plot sub-title title
+    SUBTITLE='Verification region - ' + LND_MSK + ' Threshold ' + LEV + ' mm'
+
+    # fig saved automatically to OUT_PATH
+    OUT_DIR = OUT_ROOT + '/figures' + FIG_CSE
+    OUT_PATH = OUT_DIR + '/' + VALID_DT + '_' + LND_MSK + '_' + STATS[0] + '_' +\
+               STATS[1] + '_lev_' + LEV + '_' + FIG_LAB + '_lineplot.png'
+
+
+    if len(STRT_DT) != 10:
+        print('ERROR: STRT_DT, ' + STRT_DT + ', is not in YYYYMMDDHH format.')
+        return None
+
+    if len(END_DT) != 10:
+        print('ERROR: END_DT, ' + END_DT + ', is not in YYYYMMDDHH format.')
+        return None
+
+    if len(VALID_DT) != 10:
+        print('ERROR: VALID_DT, ' + VALID_DT + ', is not in YYYYMMDDHH format.')
+        return None
+    else:
+        v_iso = VALID_DT[:4] + '-' + VALID_DT[4:6] + '-' + VALID_DT[6:8] +\
+                '_' + VALID_DT[8:]
+        valid_dt = dt.fromisoformat(v_iso)
+
+    fcst_leads = []
+    for ctr_flw in CTR_FLWS:
+        for prfx in PRFXS:
+            if len(prfx) > 0:
+                pfx = prfx + '_'
+            else:
+                pfx = ''
+
+            # define derived stat names
+            stat0 = STATS[0]
+            stat1 = STATS[1]
+
+            for grd in GRDS:
+                # load the stats with confidence intervals, shared with the plot
+                stat_data = load_stats(ctr_flw, grd, prfx, STRT_DT, END_DT, TYPE,
+                                       STATS, conf=True)
+
+                # select specified valid date / region and obtain leads of data 
+                if stat_data is not None:
+                    stat_data = select_rows(stat_data, VX_MASK=LND_MSK,
+                                            FCST_VALID_END=valid_dt)
+
+                if stat_data is None:
+                    print('WARNING: input data for ' + ctr_flw + ' ' + grd +\
+                            ' ' + TYPE + ' does not exist, skipping this' +\
+                            ' configuration.')
+                    continue
+
+                leads = sorted(level_values(stat_data, 'FCST_LEAD'),
+                               key=lambda x:(len(x), x))
+
+                fcst_leads += leads
+
+    # find all unique values for forecast leads, sorted for plotting
+    fcst_leads = sorted(list(set(fcst_leads)), key=lambda x:(len(x), x))
+    num_leads = len(fcst_leads)
+
+    # create a figure
+    fig = plt.figure(figsize=(12,9.6))
+
+    # Set the axes
+    ax0 = fig.add_axes([.110, .395, .85, .33])
+    ax1 = fig.add_axes([.110, .065, .85, .33])
+    axs = [ax0, ax1]
+
+    line_list = []
+    line_labs = []
+    ax0_l = []
+    ax1_l = []
+    axs_l = [ax0_l, ax1_l]
+
+    # increment line count whenever a configuration is plotted
+    line_count = 0
+
+    for ctr_flw in CTR_FLWS:
+        for prfx in PRFXS:
+            if len(prfx) > 0:
+                pfx = prfx + '_'
+            else:
+                pfx = ''
+
+            # define derived stat names
+            stat0 = STATS[0]
+            stat1 = STATS[1]
+
+            for grd in GRDS:
+                # load the stats with confidence intervals, cached from the above
+                stat_data = load_stats(ctr_flw, grd, prfx, STRT_DT, END_DT, TYPE,
+                                       STATS, conf=True)
+
+                # select specified valid date / region of data 
+                if stat_data is not None:
+                    stat_data = select_rows(stat_data, VX_MASK=LND_MSK,
+                                            FCST_VALID_END=valid_dt, FCST_THRESH=LEV)
+
+                if stat_data is None:
+                    continue
+
+                split_string = ctr_flw.split('_')
+                split_len = len(split_string)
+                idx_len = len(LAB_IDX)
+                line_lab = pfx 
+                lab_len = min(idx_len, split_len)
+                if lab_len > 1:
+                    for i_ll in range(lab_len, 1, -1):
+                        i_li = LAB_IDX[-i_ll]
+                        line_lab += split_string[i_li] + '_'
+
+                    i_li = LAB_IDX[-1]
+                    line_lab += split_string[i_li] 
 
-for ctr_flw in CTR_FLWS:
-    for prfx in PRFXS:
-        if len(prfx) > 0:
-            pfx = prfx + '_'
+                else:
+                    line_lab += split_string[0]
+
+                if GRD_LAB:
+                    line_lab += '_' + grd
+
+                line_labs.append(line_lab)
+                line_count += 1
+
+                # infer existence of confidence intervals with precedence for bootstrap
+                cnf_lvs = []
+                for i_ns in range(2):
+                    stat = STATS[i_ns]
+                    if stat + '_BCL' in stat_data and\
+                        not (stat_data[stat + '_BCL'].isnull().values.any()):
+                            cnf_lvs.append('_BC')
+
+                    elif stat + '_NCL' in stat_data and\
+                        not (stat_data[stat + '_NCL'].isnull().values.any()):
+                            cnf_lvs.append('_NC')
+
+                    else:
+                        cnf_lvs.append(False)
+
+                # create array storage for stats and plot
+                for i_ns in range(2):
+                    ax = axs[i_ns]
+                    stat = STATS[i_ns]
+                    if cnf_lvs[i_ns]:
+                        tmp = np.empty([num_leads, 3])
+                        tmp[:, 0] = stat_vector(stat_data, stat, 'FCST_LEAD',
+                                                fcst_leads)
+                        tmp[:, 1] = stat_vector(stat_data, stat + cnf_lvs[i_ns] +\
+                                                'L', 'FCST_LEAD', fcst_leads)
+                        tmp[:, 2] = stat_vector(stat_data, stat + cnf_lvs[i_ns] +\
+                                                'U', 'FCST_LEAD', fcst_leads)
+
+                        l0 = ax.fill_between(range(num_leads), tmp[:, 1], tmp[:, 2], alpha=0.5)
+                        l1, = ax.plot(range(num_leads), tmp[:, 0], linewidth=2)
+                        axs_l[i_ns].append([l1,l0])
+                        l = l1
+
+                    else:
+                        tmp = stat_vector(stat_data, stat, 'FCST_LEAD', fcst_leads)
+
+                        l, = ax.plot(range(num_leads), tmp[:], linewidth=2)
+                        axs_l[i_ns].append([l])
+
+                # add the line type to the legend
+                line_list.append(l)
+
+    # set colors and markers
+    line_colors = sns.color_palette("husl", line_count)
+    for i_lc in range(line_count):
+        for i_ns in range(2):
+            axl = axs_l[i_ns][i_lc]
+            for i_na in range(len(axl)):
+                l = axl[i_na]
+                l.set_color(line_colors[i_lc])
+                if i_na == 0:
+                  l.set_marker((i_lc + 2, 0, 0))
+                  l.set_markersize(18)
+
+    # define display parameters
+
+    # generate tic labels based on hour values
+    for i in range(num_leads):
+        fcst_leads[i] = fcst_leads[i][:-4]
+
+    ax1.set_xticks(range(num_leads))
+    ax1.set_xticklabels(fcst_leads)
+
+    # tick parameters
+    ax1.tick_params(
+            labelsize=18
+            )
+
+    ax0.tick_params(
+            labelsize=18
+            )
+
+    ax0.tick_params(
+            labelsize=18,
+            bottom=False,
+            labelbottom=False,
+            right=False,
+            labelright=False,
+            )
+
+    ax0.set_yticks(ax0.get_yticks(), ax0.get_yticklabels(), va='bottom')
+    ax1.set_yticks(ax1.get_yticks(), ax1.get_yticklabels(), va='top')
+
+    lab0=STATS[0]
+    lab1=STATS[1]
+    lab2='Forecast lead hrs'
+    plt.figtext(.5, .98, TITLE, horizontalalignment='center',
+                verticalalignment='center', fontsize=22)
+
+    plt.figtext(.5, .93, SUBTITLE, horizontalalignment='center',
+                verticalalignment='center', fontsize=22)
+
+    plt.figtext(.03, .595, lab0, horizontalalignment='right', rotation=90,
+                verticalalignment='center', fontsize=22)
+
+    plt.figtext(.03, .265, lab1, horizontalalignment='right', rotation=90,
+                verticalalignment='center', fontsize=22)
+
+    plt.figtext(.5, .01, lab2, horizontalalignment='center',
+                verticalalignment='center', fontsize=22)
+
+    if line_count <= 3:
+        ncols = line_count
+    else:
+        rmdr_3 = line_count % 3
+        rmdr_4 = line_count % 4
+        if rmdr_3 < rmdr_4:
+            ncols = 3
         else:
-            pfx = ''
-        
-        # define derived data paths 
-        data_root = OUT_ROOT + '/' + ctr_flw
-        stat0 = STATS[0]
-        stat1 = STATS[1]
-        
-        for grd in GRDS:
-            # define the input name
-            in_path = data_root + '/grid_stats_' + pfx + grd + '_' + STRT_DT +\
-                      '_to_' + END_DT + '.bin'
-            
-            try:
-                with open(in_path, 'rb') as f:
-                    data = pickle.load(f)
-
-            except:
-                continue
-
-            split_string = ctr_flw.split('_')
-            split_len = len(split_string)
-            idx_len = len(LAB_IDX)
-            line_lab = pfx 
-            lab_len = min(idx_len, split_len)
-            if lab_len > 1:
-                for i_ll in range(lab_len, 1, -1):
-                    i_li = LAB_IDX[-i_ll]
-                    line_lab += split_string[i_li] + '_'
-
-                i_li = LAB_IDX[-1]
-                line_lab += split_string[i_li] 
+            ncols = 4
 
-            else:
-                line_lab += split_string[0]
-
-            if GRD_LAB:
-                line_lab += '_' + grd
-
-            line_labs.append(line_lab)
-            line_count += 1
-            
-            # load the values to be plotted along with landmask, lead and threshold
-            vals = [
-                    'VX_MASK',
-                    'FCST_LEAD',
-                    'FCST_VALID_END',
-                    'FCST_THRESH',
-                   ]
-            vals += STATS
-    
-            # infer existence of confidence intervals with precedence for bootstrap
-            cnf_lvs = []
-            for i_ns in range(2):
-                stat = STATS[i_ns]
-                if stat + '_BCL' in data[TYPE] and\
-                    not (data[TYPE][stat + '_BCL'].isnull().values.any()):
-                        vals.append(stat + '_BCL')
-                        vals.append(stat + '_BCU')
-                        cnf_lvs.append('_BC')
-    
-                elif stat + '_NCL' in data[TYPE] and\
-                    not (data[TYPE][stat + '_NCL'].isnull().values.any()):
-                        vals.append(stat + '_NCL')
-                        vals.append(stat + '_NCU')
-                        cnf_lvs.append('_NC')
-    
-                else:
-                    cnf_lvs.append(False)
-    
-            # cut down df to specified valid date / region and obtain leads of data 
-            stat_data = data[TYPE][vals]
-            stat_data = stat_data.loc[(stat_data['VX_MASK'] == LND_MSK)]
-            stat_data = stat_data.loc[(stat_data['FCST_THRESH'] == LEV)]
-            stat_data = stat_data.loc[(stat_data['FCST_VALID_END'] ==
-                                       valid_dt.strftime('%Y%m%d_%H%M%S'))]
-            
-            # create array storage for stats and plot
-            for i_ns in range(2):
-                exec('ax = ax%s'%i_ns)
-                if cnf_lvs[i_ns]:
-                    tmp = np.empty([num_leads, 3])
-                    tmp[:] = np.nan
-            
-                    for i_nl in range(num_leads):
-                        val = stat_data.loc[(stat_data['FCST_LEAD'] == fcst_leads[i_nl])]
-                        if not val.empty:
-                            tmp[i_nl, 0] = val[STATS[i_ns]]
-                            tmp[i_nl, 1] = val[STATS[i_ns] + cnf_lvs[i_ns] + 'L']
-                            tmp[i_nl, 2] = val[STATS[i_ns] + cnf_lvs[i_ns] + 'U']
-                    
-                    l0 = ax.fill_between(range(num_leads), tmp[:, 1], tmp[:, 2], alpha=0.5)
-                    l1, = ax.plot(range(num_leads), tmp[:, 0], linewidth=2)
-                    exec('ax%s_l.append([l1,l0])'%i_ns)
-                    l = l1
+    fig.legend(line_list, line_labs, fontsize=18, ncol=ncols, loc='center',
+               bbox_to_anchor=[0.5, 0.83])
 
-                else:
-                    tmp = np.empty([num_leads])
-                    tmp[:] = np.nan
-                
-                    for i_nl in range(num_leads):
-                        val = stat_data.loc[(stat_data['FCST_LEAD'] == fcst_leads[i_nl])]
-                        if not val.empty:
-                            tmp[i_nl] = val[STATS[i_ns]]
-                    
-                    l, = ax.plot(range(num_leads), tmp[:], linewidth=2)
-                    exec('ax%s_l.append([l])'%i_ns)
-
-            # add the line type to the legend
-            line_list.append(l)
-
-# set colors and markers
-line_colors = sns.color_palette("husl", line_count)
-for i_lc in range(line_count):
-    for i_ns in range(2):
-        exec('axl = ax%s_l[i_lc]'%i_ns)
-        for i_na in range(len(axl)):
-            l = axl[i_na]
-            l.set_color(line_colors[i_lc])
-            if i_na == 0:
-              l.set_marker((i_lc + 2, 0, 0))
-              l.set_markersize(18)
+    # save figure
+    os.system('mkdir -p ' + OUT_DIR)
+    plt.savefig(OUT_PATH)
 
-##################################################################################
-# define display parameters
-
-# generate tic labels based on hour values
-for i in range(num_leads):
-    fcst_leads[i] = fcst_leads[i][:-4]
-
-ax1.set_xticks(range(num_leads))
-ax1.set_xticklabels(fcst_leads)
-
-# tick parameters
-ax1.tick_params(
-        labelsize=18
-        )
-
-ax0.tick_params(
-        labelsize=18
-        )
-
-ax0.tick_params(
-        labelsize=18,
-        bottom=False,
-        labelbottom=False,
-        right=False,
-        labelright=False,
-        )
-
-ax0.set_yticks(ax0.get_yticks(), ax0.get_yticklabels(), va='bottom')
-ax1.set_yticks(ax1.get_yticks(), ax1.get_yticklabels(), va='top')
-
-lab0=STATS[0]
-lab1=STATS[1]
-lab2='Forecast lead hrs'
-plt.figtext(.5, .98, TITLE, horizontalalignment='center',
-            verticalalignment='center', fontsize=22)
-
-plt.figtext(.5, .93, SUBTITLE, horizontalalignment='center',
-            verticalalignment='center', fontsize=22)
-
-plt.figtext(.03, .595, lab0, horizontalalignment='right', rotation=90,
-            verticalalignment='center', fontsize=22)
-
-plt.figtext(.03, .265, lab1, horizontalalignment='right', rotation=90,
-            verticalalignment='center', fontsize=22)
-
-plt.figtext(.5, .01, lab2, horizontalalignment='center',
-            verticalalignment='center', fontsize=22)
-
-if line_count <= 3:
-    ncols = line_count
-else:
-    rmdr_3 = line_count % 3
-    rmdr_4 = line_count % 4
-    if rmdr_3 < rmdr_4:
-        ncols = 3
-    else:
-        ncols = 4
+    return OUT_PATH
 
-fig.legend(line_list, line_labs, fontsize=18, ncol=ncols, loc='center',
-           bbox_to_anchor=[0.5, 0.83])
+##################################################################################
+# Make a figure with the global parameters
+##################################################################################
+if __name__ == '__main__':
+    # use this setting on COMET / Skyriver for x forwarding
+    matplotlib.use('TkAgg')
+    if plot() is None:
+        sys.exit(1)
 
-# save figure and display
-os.system('mkdir -p ' + OUT_DIR)
-plt.savefig(OUT_PATH)
-plt.show()
+    plt.show()
 
 ##################################################################################
 # end
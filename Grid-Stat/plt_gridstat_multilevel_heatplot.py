@@ -2,7 +2,7 @@
 # Description
 ##################################################################################
 # This script is designed to generate heat plots in Matplotlib from MET grid_stat
-# output files, preprocessed with the companion script proc_24hr_QPF.py.  This
+# output files, preprocessed with the companion script proc_gridstat.py.  This
 # plotting scheme is designed to plot precipitation threshold level in the
 # vertical axis and the number of lead hours to the valid time for verification
 # from the forecast initialization in the horizontal axis. The global parameters
@@ -10,6 +10,11 @@
 # as well as the valid date of the verification. Stats to compare can be reset 
 # in the global parameters with heat map color bar changing scale dynamically.
 #
+# The global parameters are the default settings of the plot function, which
+# draws the figure when this script is run and which may be called with a
+# dictionary of settings to override, as in the batch renderer
+# plt_gridstat_batch.py.
+#
 ##################################################################################
 # License Statement
 ##################################################################################
@@ -32,8 +37,6 @@
 # Imports
 ##################################################################################
 import matplotlib
-# use this setting on COMET / Skyriver for x forwarding
-matplotlib.use('TkAgg')
 from datetime import datetime as dt
 import matplotlib.pyplot as plt
 from matplotlib.colors import Normalize as nrm
@@ -41,38 +44,35 @@ from matplotlib.cm import get_cmap
 from matplotlib.colorbar import Colorbar as cb
 import seaborn as sns
 import numpy as np
-import pickle
 import os
-from py_plt_utilities import USR_HME
+import sys
+from proc_gridstat import OUT_ROOT
+from gridstat_loader import load_stats
+from gridstat_query import select_rows, level_values, stat_matrix
 
 ##################################################################################
 # SET GLOBAL PARAMETERS 
 ##################################################################################
 # define control flow to analyze 
-#CTR_FLW = 'deterministic_forecast_lag00_b0.00'
-#CTR_FLW = 'deterministic_forecast_lag06_b0.00'
-#CTR_FLW = 'deterministic_forecast_lag00_b1.00'
-CTR_FLW = 'ECMWF'
-#CTR_FLW = 'GFS'
+CTR_FLW = 'NRT_gfs'
 
-# define case-wise sub-directory
-CSE = 'VD'
+# define optional gridstat prefix 
+PRFX = ''
 
-# verification domain for the forecast data
-#GRD='d02'
-GRD='0.25'
+# fig case directory, includes leading '/', leave as empty string if not needed
+FIG_CSE = ''
 
-# starting date and zero hour of forecast cycles
-START_DT = '2019-02-11T00:00:00'
+# verification domain for the forecast data
+GRD='d01'
 
-# final date and zero hour of data of forecast cycles
-END_DT = '2019-02-14T00:00:00'
+# starting date and zero hour of forecast cycles (string YYYYMMDDHH)
+STRT_DT = '2022121400'
 
-# valid date for the verification
-VALID_DT = '2019-02-15T00:00:00'
+# final date and zero hour of data of forecast cycles (string YYYYMMDDHH)
+END_DT = '2022121800'
 
-# number of hours between zero hours for forecast data
-CYCLE_INT = 24
+# valid date for the verification (string YYYYMMDDHH)
+VALID_DT = '2022121900'
 
 # MET stat file type -- should be leveled data
 #TYPE = 'cts'
@@ -86,164 +86,211 @@ TYPE = 'nbrcnt'
 #STATS = ['FAR', 'POFD']
 STATS = ['FSS', 'AFSS']
 
-# landmask for verification region -- need to be set in earlier preprocessing
+# landmask for verification region -- needs to be set in gridstat options
 LND_MSK = 'CALatLonPoints'
-#LND_MSK = 'FULL'
+
+# global parameters above are the default settings of the figure, which may
+# be overridden by a plot spec, see plt_gridstat_batch.py
+DEFAULTS = {
+            'CTR_FLW': CTR_FLW,
+            'PRFX': PRFX,
+            'FIG_CSE': FIG_CSE,
+            'GRD': GRD,
+            'STRT_DT': STRT_DT,
+            'END_DT': END_DT,
+            'VALID_DT': VALID_DT,
+            'TYPE': TYPE,
+            'STATS': STATS,
+            'LND_MSK': LND_MSK,
+           }
 
 ##################################################################################
-# Begin plotting
+# Plotting
 ##################################################################################
-# Create a figure
-fig = plt.figure(figsize=(11.25,8.63))
-
-# Set the axes
-ax0 = fig.add_axes([.885, .10, .03, .8])
-ax1 = fig.add_axes([.085, .10, .39, .8])
-ax2 = fig.add_axes([.485, .10, .39, .8])
-
-# define derived data paths 
-param = CTR_FLW.split('_')[-1]
-cse = CSE + '/' + CTR_FLW
-data_root = USR_HME + '/data/analysis/' + cse + '/MET_analysis'
-stat1 = STATS[0]
-stat2 = STATS[1]
-
-# create date time object from string
-valid_dt = dt.fromisoformat(VALID_DT)
-
-# define the output name
-in_path = data_root + '/grid_stats_' + GRD + '_' + START_DT +\
-          '_to_' + END_DT + '.bin'
-
-out_path = data_root + '/' + VALID_DT + '_' + LND_MSK + '_' + stat1 + '_' +\
-           stat2 + '_heatplot.png'
-
-f = open(in_path, 'rb')
-data = pickle.load(f)
-f.close()
-
-# load the values for valid time with landmask, lead and threshold
-vals = [
-        'VX_MASK',
-        'FCST_LEAD',
-        'FCST_THRESH',
-        'FCST_VALID_END',
-       ]
-vals += STATS
-
-# cut down df to specified region and valid time, obtain levels of data 
-stat_data = data[TYPE][vals]
-stat_data = stat_data.loc[(stat_data['VX_MASK'] == LND_MSK)]
-stat_data = stat_data.loc[(stat_data['FCST_VALID_END'] ==
-                           valid_dt.strftime('%Y%m%d_%H%M%S'))]
-
-# NOTE: sorting below is designed to handle the issue of string sorting with
-# symbols and non-left-padded decimals
-
-# sorts first on length of integer expansion with inequalities, secondly on char
-data_levels = sorted(list(set(stat_data['FCST_THRESH'].values)),
-                     key=lambda x:(len(x.split('.')[0]), x), reverse=True)
-
-# sorts first on length of integer expansion for hours, secondly on char
-data_leads = sorted(list(set(stat_data['FCST_LEAD'].values)),
-                    key=lambda x:(len(x), x))
-num_levels = len(data_levels)
-num_leads = len(data_leads)
-
-# create array storage for probs
-tmp = np.zeros([num_levels, num_leads, 2])
-
-for k in range(2):
-    for i in range(num_levels):
-        for j in range(num_leads):
-            val = stat_data.loc[(stat_data['FCST_THRESH'] == data_levels[i]) &
-                                 (stat_data['FCST_LEAD'] == data_leads[j])]
-            
-            tmp[i, j, k] = val[STATS[k]]
-
-# define the color bar scale depending on the stat
-if (stat1 == 'GSS') or\
-   (stat1 == 'BAGSS') or\
-   (stat1 == 'HK') or\
-   (stat2 == 'GSS') or\
-   (stat2 == 'BAGSS') or\
-   (stat2 == 'HK'):
-    min_scale = -0.25
-    max_scale = 1.0
-
-elif (stat1 == 'FBIAS') or\
-     (stat2 == 'FBIAS'):
-    min_scale = 0.0
-    max_scale = 1.25
-
-else:
-    max_scale = 1.0
-    min_scale = 0.0
-
-color_map = sns.cubehelix_palette(20, start=.75, rot=1.50, as_cmap=True,
-                                  reverse=True, dark=0.25)
-sns.heatmap(tmp[:,:,0], linewidth=0.5, ax=ax1, cbar_ax=ax0, vmin=min_scale,
-            vmax=max_scale, cmap=color_map)
-sns.heatmap(tmp[:,:,1], linewidth=0.5, ax=ax2, cbar_ax=ax0, vmin=min_scale,
-            vmax=max_scale, cmap=color_map)
+# draw the figure for the settings in DEFAULTS updated by the spec
+# dictionary, the figure is saved to OUT_PATH and left open, returning
+# OUT_PATH or None on error
+def plot(spec=None):
+    cnfg = dict(DEFAULTS, **(spec or {}))
+    CTR_FLW = cnfg['CTR_FLW']
+    PRFX = cnfg['PRFX']
+    FIG_CSE = cnfg['FIG_CSE']
+    GRD = cnfg['GRD']
+    STRT_DT = cnfg['STRT_DT']
+    END_DT = cnfg['END_DT']
+    VALID_DT = cnfg['VALID_DT']
+    TYPE = cnfg['TYPE']
+    STATS = cnfg['STATS']
+    LND_MSK = cnfg['LND_MSK']
+
+    # fig saved automatically to OUT_PATH
+    OUT_DIR = OUT_ROOT + '/figures' + FIG_CSE
+    OUT_PATH = OUT_DIR + '/' + VALID_DT + '_' + LND_MSK + '_' + STATS[0] + '_' +\
+               STATS[1] + '_' + CTR_FLW + '_' + GRD
+
+    if PRFX:
+        OUT_PATH += '_' + PRFX
+
+    OUT_PATH += '_heatplot.png'
+
+    if len(STRT_DT) != 10:
+        print('ERROR: STRT_DT, ' + STRT_DT + ', is not in YYYYMMDDHH format.')
+        return None
+
+    if len(END_DT) != 10:
+        print('ERROR: END_DT, ' + END_DT + ', is not in YYYYMMDDHH format.')
+        return None
+
+    if len(VALID_DT) != 10:
+        print('ERROR: VALID_DT, ' + VALID_DT + ', is not in YYYYMMDDHH format.')
+        return None
+    else:
+        v_iso = VALID_DT[:4] + '-' + VALID_DT[4:6] + '-' + VALID_DT[6:8] +\
+                '_' + VALID_DT[8:]
+        valid_dt = dt.fromisoformat(v_iso)
+
+    # Create a figure
+    fig = plt.figure(figsize=(11.25,8.63))
+
+    # Set the axes
+    ax0 = fig.add_axes([.885, .10, .03, .8])
+    ax1 = fig.add_axes([.085, .10, .39, .8])
+    ax2 = fig.add_axes([.485, .10, .39, .8])
+
+    # define derived parameters
+    param = CTR_FLW.split('_')[-1]
+    stat1 = STATS[0]
+    stat2 = STATS[1]
+
+    # load the stats for the cycles of the control flow
+    stat_data = load_stats(CTR_FLW, GRD, PRFX, STRT_DT, END_DT, TYPE, STATS)
+
+    # select specified region and valid time, obtain levels of data 
+    if stat_data is not None:
+        stat_data = select_rows(stat_data, VX_MASK=LND_MSK,
+                                FCST_VALID_END=valid_dt)
+
+    if stat_data is None:
+        print('ERROR: input data for ' + CTR_FLW + ' ' + GRD + ' ' + TYPE +\
+              ' does not exist.')
+        return None
+
+    # NOTE: sorting below is designed to handle the issue of string sorting with
+    # symbols and non-left-padded decimals
+
+    # sorts first on length of integer expansion with inequalities, secondly on char
+    data_levels = sorted(level_values(stat_data, 'FCST_THRESH'),
+                         key=lambda x:(len(x.split('.')[0]), x), reverse=True)
+
+    # sorts first on length of integer expansion for hours, secondly on char
+    data_leads = sorted(level_values(stat_data, 'FCST_LEAD'),
+                        key=lambda x:(len(x), x))
+    num_levels = len(data_levels)
+    num_leads = len(data_leads)
+
+    # extract the levels x leads arrays of the statistics from the indexed data
+    tmp = np.zeros([num_levels, num_leads, 2])
+
+    for k in range(2):
+        tmp[:, :, k] = stat_matrix(stat_data, STATS[k], 'FCST_THRESH', data_levels,
+                                   'FCST_LEAD', data_leads)
+
+    # define the color bar scale depending on the stat
+    if (stat1 == 'GSS') or\
+       (stat1 == 'BAGSS') or\
+       (stat1 == 'HK') or\
+       (stat2 == 'GSS') or\
+       (stat2 == 'BAGSS') or\
+       (stat2 == 'HK'):
+        min_scale = -0.25
+        max_scale = 1.0
+
+    elif (stat1 == 'FBIAS') or\
+         (stat2 == 'FBIAS'):
+        min_scale = 0.0
+        max_scale = 1.25
+
+    else:
+        max_scale = 1.0
+        min_scale = 0.0
+
+    color_map = sns.cubehelix_palette(20, start=.75, rot=1.50, as_cmap=True,
+                                      reverse=True, dark=0.25)
+    sns.heatmap(tmp[:,:,0], linewidth=0.5, ax=ax1, cbar_ax=ax0, vmin=min_scale,
+                vmax=max_scale, cmap=color_map)
+    sns.heatmap(tmp[:,:,1], linewidth=0.5, ax=ax2, cbar_ax=ax0, vmin=min_scale,
+                vmax=max_scale, cmap=color_map)
+
+    # define display parameters
+
+    # generate tic labels based on hour values
+    for i in range(num_leads):
+        data_leads[i] = data_leads[i][:2]
+
+    ax0.set_yticklabels(ax0.get_yticklabels(), rotation=270, va='top')
+    ax1.set_xticklabels(data_leads)
+    ax1.set_yticklabels(data_levels)
+    ax2.set_xticklabels(data_leads)
+    ax2.set_yticklabels(data_levels)
+
+    # tick parameters
+    ax0.tick_params(
+            labelsize=18
+            )
+
+    ax1.tick_params(
+            labelsize=18
+            )
+
+    ax2.tick_params(
+            labelsize=18,
+            left=False,
+            labelleft=False,
+            right=False,
+            labelright=False,
+            )
+
+    title1='24hr accumulated precip at ' + VALID_DT[:4] + '-' +\
+           VALID_DT[4:6] + '-' + VALID_DT[6:8] + '_' + VALID_DT[8:]
+    title2='Verification region -- ' + LND_MSK + ' ' + param
+    lab1='Forecast lead hrs'
+    lab2='Precip Thresh mm'
+    lab3=STATS[0]
+    lab4=STATS[1]
+    plt.figtext(.5, .02, lab1, horizontalalignment='center',
+                verticalalignment='center', fontsize=22)
+
+    plt.figtext(.02, .5, lab2, horizontalalignment='center',
+                verticalalignment='center', fontsize=22, rotation=90)
+
+    plt.figtext(.5, .98, title1, horizontalalignment='center',
+                verticalalignment='center', fontsize=22)
+
+    plt.figtext(.5, .93, title2, horizontalalignment='center',
+                verticalalignment='center', fontsize=22)
+
+    plt.figtext(.06, .02, lab3, horizontalalignment='left',
+                verticalalignment='center', fontsize=22)
+
+    plt.figtext(.90, .02, lab4, horizontalalignment='right',
+                verticalalignment='center', fontsize=22)
+
+    # save figure
+    os.system('mkdir -p ' + OUT_DIR)
+    plt.savefig(OUT_PATH)
+
+    return OUT_PATH
 
 ##################################################################################
-# define display parameters
-
-# generate tic labels based on hour values
-for i in range(num_leads):
-    data_leads[i] = data_leads[i][:2]
-
-ax0.set_yticklabels(ax0.get_yticklabels(), rotation=270, va='top')
-ax1.set_xticklabels(data_leads)
-ax1.set_yticklabels(data_levels)
-ax2.set_xticklabels(data_leads)
-ax2.set_yticklabels(data_levels)
-
-# tick parameters
-ax0.tick_params(
-        labelsize=18
-        )
-
-ax1.tick_params(
-        labelsize=18
-        )
-
-ax2.tick_params(
-        labelsize=18,
-        left=False,
-        labelleft=False,
-        right=False,
-        labelright=False,
-        )
-
-title1='24hr accumulated precip at ' + VALID_DT
-title2='Verification region -- ' + LND_MSK + ' ' + param
-lab1='Forecast lead hrs'
-lab2='Precip Thresh mm'
-lab3=STATS[0]
-lab4=STATS[1]
-plt.figtext(.5, .02, lab1, horizontalalignment='center',
-            verticalalignment='center', fontsize=22)
-
-plt.figtext(.02, .5, lab2, horizontalalignment='center',
-            verticalalignment='center', fontsize=22, rotation=90)
-
-plt.figtext(.5, .98, title1, horizontalalignment='center',
-            verticalalignment='center', fontsize=22)
-
-plt.figtext(.5, .93, title2, horizontalalignment='center',
-            verticalalignment='center', fontsize=22)
-
-plt.figtext(.06, .02, lab3, horizontalalignment='left',
-            verticalalignment='center', fontsize=22)
-
-plt.figtext(.90, .02, lab4, horizontalalignment='right',
-            verticalalignment='center', fontsize=22)
-
-# save figure and display
-plt.savefig(out_path)
-plt.show()
+# Make a figure with the global parameters
+##################################################################################
+if __name__ == '__main__':
+    # use this setting on COMET / Skyriver for x forwarding
+    matplotlib.use('TkAgg')
+    if plot() is None:
+        sys.exit(1)
+
+    plt.show()
 
 ##################################################################################
 # end
@@ -3,9 +3,14 @@
 ##################################################################################
 # This script reads in arbitrary grid_stat_* output files from a MET analysis
 # and creates Pandas dataframes containing a time series for each file type
-# versus lead time to a verification period. The dataframes are saved into a
-# Pickled dictionary organized by MET file extension as key names, taken
-# agnostically from bash wildcard patterns.
+# versus lead time to a verification period. Inputs are either the per line
+# type grid_stat_*_${TYPE}.txt files or the combined grid_stat_*.stat files,
+# which are read once and split by LINE_TYPE into the same tables with the
+# column layouts of gridstat_schema.py. The dataframes are saved into a
+# Parquet store organized by MET file extension, taken agnostically from bash
+# wildcard patterns, with one partition per forecast cycle as defined in the
+# companion module gridstat_store.py. A Pickled dictionary of the dataframes
+# with MET file extensions as key names can optionally be exported.
 #
 # Batches of hyper-parameter-dependent data can be processed by constructing
 # lists of proc_gridstat arguments which define configurations that will be mapped
@@ -34,16 +39,23 @@
 ##################################################################################
 import sys
 import os
+import io
 import numpy as np
 import pandas as pd
-import pickle
 import copy
 import glob
+import json
+import time
+import resource
 from datetime import datetime as dt
 from datetime import timedelta
 import multiprocessing 
 from multiprocessing import Pool
 import ipdb
+from gridstat_schema import HDR_COLS, apply_schema, line_type_cols
+from gridstat_store import store_path, export_bin, file_stats
+from gridstat_store import open_cycle, append_cycle, close_cycle
+from gridstat_store import read_manifest, write_manifest, cycle_current
 
 ##################################################################################
 # SET GLOBAL PARAMETERS 
@@ -92,6 +104,33 @@ IN_ROOT = '/cw3e/mead/projects/cwp106/scratch/cgrudzien/' + CSE
 # root directory for processed pandas outputs
 OUT_ROOT = '/cw3e/mead/projects/cwp106/scratch/cgrudzien/' + CSE
 
+# input format of the grid_stat outputs, 'txt' to read one grid_stat_*.txt
+# file per line type or 'stat' to read the combined grid_stat_*.stat file of
+# each lead once, e.g., when run_gridstat.sh is run with TXT_OUT=FALSE
+IN_FMT = 'txt'
+
+# only parse cycles with grid_stat_* files that are new or have changed
+# since they were last written to the store, True / False
+INCREMENTAL = True
+
+# memory budget in bytes of the parsed rows held by each worker before these
+# are flushed to the store, the peak memory of each of the pool workers is
+# bounded by this budget and the size of the largest single grid_stat_* file
+MEM_BUDGET = 256 * 1024 ** 2
+
+# export a pickled dictionary of dataframes grid_stats_*.bin for the date range
+# in addition to the Parquet store, True / False
+BIN_EXPORT = False
+
+# number of the slowest cycles listed by the metrics summary, and the factor
+# of the median wall time of a cycle above which it is reported as a straggler
+N_SLOW = 10
+STRG_FCT = 3.0
+
+# identifier of this run in the metrics records, appended to the metrics of
+# previous runs, as the start time and process ID of the script
+RUN_ID = dt.now().strftime('%Y-%m-%d_%H_%M_%S') + '_' + str(os.getpid())
+
 ##################################################################################
 # Construct hyper-paramter array for batch processing gridstat data
 ##################################################################################
@@ -133,36 +172,158 @@ for CTR_FLW in CTR_FLWS:
 ##################################################################################
 # Process data routine
 ##################################################################################
-#  function for multiprocessing parameter map
-def proc_gridstat(cnfg):
+# read a grid_stat_*.txt file into a dataframe in a single pass, with columns
+# taken from the header line and 'NA' values replaced with NaN; rows are
+# indexed by 'line' starting at 1, returns None if the file has no rows
+def read_gridstat_txt(in_path):
+    try:
+        fname_df = pd.read_csv(in_path, sep=r'\s+', index_col=False, dtype=str,
+                               na_values=['NA'], keep_default_na=False)
+
+    except pd.errors.EmptyDataError:
+        return None
+
+    if len(fname_df) == 0:
+        return None
+
+    fname_df.index = pd.RangeIndex(1, len(fname_df) + 1, name='line')
+
+    return fname_df
+
+# read a grid_stat_*.stat file in a single pass, splitting the rows by
+# LINE_TYPE, into a dictionary of dataframes keyed by the lower case line
+# type as for the postfixes of the grid_stat_*.txt files; columns are taken
+# from the layouts of gridstat_schema.py, with the same parsing and 'line'
+# index as read_gridstat_txt, while line types without a registered layout
+# are returned as None
+def read_gridstat_stat(in_path):
+    lt_indx = HDR_COLS.index('LINE_TYPE')
+    rows = {}
+    with open(in_path) as f:
+        for row in f:
+            fields = row.split(None, lt_indx + 1)
+            if len(fields) <= lt_indx or fields[0] == 'VERSION':
+                # header and blank lines are skipped
+                continue
+
+            postfix = fields[lt_indx].lower()
+            if postfix in rows.keys():
+                rows[postfix].append(row)
+
+            else:
+                rows[postfix] = [row]
+
+    data_dict = {}
+    for postfix in rows.keys():
+        cols = line_type_cols(postfix)
+        if cols is None:
+            data_dict[postfix] = None
+            continue
+
+        fname_df = pd.read_csv(io.StringIO(''.join(rows[postfix])),
+                               sep=r'\s+', header=None, names=cols,
+                               index_col=False, dtype=str, na_values=['NA'],
+                               keep_default_na=False)
+        fname_df.index = pd.RangeIndex(1, len(fname_df) + 1, name='line')
+        data_dict[postfix] = fname_df
+
+    return data_dict
+
+# read a grid_stat_* file of the format in_fmt into a dictionary of dataframes
+# keyed by postfix, with the postfix of a .txt file cut from its name and a
+# value of None for an empty .txt file
+def read_gridstat(in_path, in_fmt=None):
+    if in_fmt is None:
+        in_fmt = IN_FMT
+
+    if in_fmt == 'stat':
+        return read_gridstat_stat(in_path)
+
+    # cut the diagnostic type from file name
+    fname = in_path.split('/')[-1]
+    split_name = fname.split('_')
+    postfix = split_name[-1].split('.')
+    postfix = postfix[0]
+
+    return {postfix: read_gridstat_txt(in_path)}
+
+# name of a configuration for status messages
+def cnfg_name(cnfg):
+    ctr_flw, prfx, grd, in_cyc_dir, in_dt_subdir, out_cyc_dir = cnfg
+    if len(prfx) > 0:
+        return prfx + '_' + ctr_flw + ' ' + grd
+
+    else:
+        return ctr_flw + ' ' + grd
+
+# derived paths of a configuration, returned as the input data root, output
+# data root, pickled output path, store path, log path and file name prefix
+def cnfg_paths(cnfg):
     # unpack argument list
     ctr_flw, prfx, grd, in_cyc_dir, in_dt_subdir, out_cyc_dir = cnfg
 
     # include underscore if prefix is of nonzero length
     if len(prfx) > 0:
-        prfx =+ '_'
+        pfx = prfx + '_'
+    else:
+        pfx = ''
 
     # define derived data paths 
     in_data_root = IN_ROOT + in_cyc_dir 
-
     out_data_root = OUT_ROOT + '/' + out_cyc_dir
-    os.system('mkdir -p ' + out_data_root)
-    out_path = out_data_root + '/grid_stats_' + prfx + grd + '_' + STRT_DT +\
+    out_path = out_data_root + '/grid_stats_' + pfx + grd + '_' + STRT_DT +\
                '_to_' + END_DT + '.bin'
-    
-    with open(out_data_root + '/proc_gridstat_' + prfx + ctr_flw + '_' + grd +\
-              '_log.txt', 'w') as log_f:
+    store = store_path(out_data_root, grd, prfx)
+    log_path = out_data_root + '/proc_gridstat_' + pfx + ctr_flw + '_' + grd +\
+               '_log.txt'
+
+    return in_data_root, out_data_root, out_path, store, log_path, pfx
+
+# path of the JSON-lines metrics of a configuration, next to its log
+def metrics_path(cnfg):
+    log_path = cnfg_paths(cnfg)[4]
+    return log_path[:-len('_log.txt')] + '_metrics.jsonl'
+
+# metrics record of a kind, 'glob', 'file', 'cycle' or 'cnfg', for a cycle of
+# a configuration in this run, with the name and process ID of the worker
+# writing it and the peak resident set size of the worker in MB so far
+def metric(cnfg, kind, cyc, **vals):
+    record = {
+              'run': RUN_ID,
+              'kind': kind,
+              'cnfg': cnfg_name(cnfg),
+              'cyc': cyc,
+              'worker': multiprocessing.current_process().name,
+              'pid': os.getpid(),
+             }
+    record.update(vals)
+    record['peak_rss_mb'] =\
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+    return record
+
+# check the configuration and date range, returning the list of cycle parsing
+# tasks for the configuration, or None if the configuration cannot be run;
+# each task is a list of the configuration, cycle directory string and the
+# sorted grid_stat_* file paths for the cycle
+def plan_gridstat(cnfg):
+    ctr_flw, prfx, grd, in_cyc_dir, in_dt_subdir, out_cyc_dir = cnfg
+    in_data_root, out_data_root, out_path, store, log_path, pfx =\
+            cnfg_paths(cnfg)
+    os.system('mkdir -p ' + out_data_root)
+
+    with open(log_path, 'w') as log_f:
         # check for input root directory
         if not os.path.isdir(in_data_root):
             print('ERROR: input data root directory ' + in_data_root +\
                     ' does not exist.', file=log_f)
-            sys.exit(1)
+            return None
         
         # convert to date times
         if len(STRT_DT) != 10:
             print('ERROR: STRT_DT, ' + STRT_DT +\
                     ', is not in YYYYMMDDHH format.', file=log_f)
-            sys.exit(1)
+            return None
         else:
             s_iso = STRT_DT[:4] + '-' + STRT_DT[4:6] + '-' + STRT_DT[6:8] +\
                     '_' + STRT_DT[8:]
@@ -171,7 +332,7 @@ def proc_gridstat(cnfg):
         if len(END_DT) != 10:
             print('ERROR: END_DT, ' + END_DT +\
                     ', is not in YYYYMMDDHH format.', file=log_f)
-            sys.exit(1)
+            return None
         else:
             e_iso = END_DT[:4] + '-' + END_DT[4:6] + '-' + END_DT[6:8] +\
                     '_' + END_DT[8:]
@@ -180,111 +341,346 @@ def proc_gridstat(cnfg):
         if len(CYC_INT) != 2:
             print('ERROR: CYC_INT, ' + CYC_INT +\
                     ', is not in HH format.', file=log_f)
-            sys.exit(1)
+            return None
         else:
             cyc_int = CYC_INT + 'H'
         
         # generate the date range for the analyses
         analyses = pd.date_range(start=strt_dt, end=end_dt,
                                  freq=cyc_int).to_pydatetime()
-        
-        # initiate empty dictionary for storage of dataframes by keyname
-        data_dict = {}
-        
+
+        # load the record of inputs previously written to the store
+        manifest = read_manifest(store)
+        met_f = open(metrics_path(cnfg), 'a')
+
         print('Processing dates ' + STRT_DT + ' to ' + END_DT, file=log_f)
+        tasks = []
         for anl_dt in analyses:
             # directory string format
             anl_strng = anl_dt.strftime('%Y%m%d%H')
             
             # define the gridstat files to open based on the analysis date
             in_paths = in_data_root + '/' + anl_strng + in_dt_subdir  +\
-                       '/grid_stat_' + prfx + '*.txt'
+                       '/grid_stat_' + pfx + '*.' + IN_FMT
         
-            # loop sorted grid_stat_prfx* files, sorting compares first on the
-            # length of lead time for non left-padded values
+            # sorted grid_stat_prfx* files, sorting compares first on the
+            # length of lead time for non left-padded values, which is
+            # followed by the line type postfix only in the .txt file names
+            strt = time.perf_counter()
+            lead_indx = -4 if IN_FMT == 'txt' else -3
             in_paths = sorted(glob.glob(in_paths),
-                              key=lambda x:(len(x.split('_')[-4]), x))
-            for in_path in in_paths:
-                print(STR_INDT + 'Opening file ' + in_path, file=log_f)
-        
-                # cut the diagnostic type from file name
-                fname = in_path.split('/')[-1]
-                split_name = fname.split('_')
-                postfix = split_name[-1].split('.')
-                postfix = postfix[0]
-        
-                # open file, load column names, then loop lines
-                with open(in_path) as f:
-                    cols = f.readline()
-                    cols = cols.split()
-                    
-                    if len(cols) > 0:
-                        fname_df = {} 
-                        tmp_dict = {}
-                        df_indx = 1
-        
-                        print(STR_INDT + 'Loading columns:', file=log_f)
-                        for col_name in cols:
-                            print(STR_INDT * 2 + col_name, file=log_f)
-                            fname_df[col_name] = [] 
-        
-                        fname_df =  pd.DataFrame.from_dict(fname_df,
-                                                           orient='columns')
-        
-                        # parse file by line, concatenating columns
-                        for line in f:
-                            split_line = line.split()
-        
-                            for i in range(len(split_line)):
-                                val = split_line[i]
-        
-                                # filter NA vals
-                                if val == 'NA':
-                                    val = np.nan
-                                tmp_dict[cols[i]] = val
-        
-                            tmp_dict['line'] = [df_indx]
-                            tmp_dict = pd.DataFrame.from_dict(tmp_dict,
-                                                              orient='columns')
-                            fname_df = pd.concat([fname_df, tmp_dict], axis=0)
-                            df_indx += 1
-        
-                        fname_df['line'] = fname_df['line'].astype(int)
-                        
-                        if postfix in data_dict.keys():
-                            last_indx = data_dict[postfix].index[-1]
-                            fname_df['line'] = fname_df['line'].add(last_indx)
-                            fname_df = fname_df.set_index('line')
-                            data_dict[postfix] = pd.concat([data_dict[postfix],
-                                                            fname_df], axis=0)
-        
-                        else:
-                            fname_df = fname_df.set_index('line')
-                            data_dict[postfix] = fname_df
-        
-                    else:
-                        print('WARNING: file ' + in_path +\
-                                ' is empty, skipping this file.', file=log_f)
-        
-                    print(STR_INDT + 'Closing file ' + in_path, file=log_f)
-        
-        print('Writing out data to ' + out_path, file=log_f)
-        with open(out_path, 'wb') as f:
-            pickle.dump(data_dict, f)
+                              key=lambda x:(len(x.split('_')[lead_indx]), x))
+            glob_s = time.perf_counter() - strt
 
-        return 'Completed: ' + prfx + ctr_flw + ' ' + grd + '\n'
+            # skip cycles whose inputs are unchanged since last written
+            strt = time.perf_counter()
+            in_stats = file_stats(in_paths)
+            skip = INCREMENTAL and cycle_current(manifest, anl_strng, in_stats)
+            print(json.dumps(metric(cnfg, 'glob', anl_strng,
+                                    n_files=len(in_paths),
+                                    bytes=sum([stat[0] for stat in
+                                               in_stats.values()]),
+                                    glob_s=glob_s,
+                                    stat_s=time.perf_counter() - strt,
+                                    skipped=skip)), file=met_f)
+            if skip:
+                print(STR_INDT + 'Inputs for cycle ' + anl_strng +\
+                        ' are unchanged in ' + store + ', skipping cycle.',
+                        file=log_f)
+
+            else:
+                tasks.append([cnfg, anl_strng, in_paths])
+
+        met_f.close()
+
+    return tasks
+
+# parse the grid_stat_* files of a single cycle and write the cycle partitions
+# to the store as the files are parsed, in chunks bounded by MEM_BUDGET,
+# replacing any previous outputs; returns the cycle directory string, the
+# fingerprint of the files parsed, the cycle's log text and its metrics
+def proc_cycle(task):
+    cnfg, anl_strng, in_paths = task
+    in_data_root, out_data_root, out_path, store, log_path, pfx =\
+            cnfg_paths(cnfg)
+    cyc_strt = time.time()
+
+    # fingerprint the inputs before parsing, so that files changing during
+    # the parse are processed again on the next run
+    in_stats = file_stats(in_paths)
+
+    # open the writer of the cycle's dataframes by keyname, logs and metrics
+    # are returned to be written in cycle order
+    writer = open_cycle(store, anl_strng, mem_bytes=MEM_BUDGET)
+    log_f = io.StringIO()
+    metrics = []
+    totals = {'rows': 0, 'parse_s': 0.0, 'schema_s': 0.0}
+
+    for in_path in in_paths:
+        print(STR_INDT + 'Opening file ' + in_path, file=log_f)
+        concat_s, write_s = writer['concat_s'], writer['write_s']
+        n_rows, schema_s = 0, 0.0
+
+        # parse the full file in one pass
+        strt = time.perf_counter()
+        file_dict = read_gridstat(in_path)
+        parse_s = time.perf_counter() - strt
+
+        if len(file_dict) == 0:
+            print('WARNING: file ' + in_path +\
+                    ' is empty, skipping this file.', file=log_f)
+
+        for postfix, fname_df in file_dict.items():
+            if fname_df is None and IN_FMT == 'stat':
+                print('WARNING: line type ' + postfix.upper() + ' of ' +\
+                        in_path + ' has no registered column layout,' +\
+                        ' skipping these lines.', file=log_f)
+                continue
+
+            elif fname_df is None:
+                print('WARNING: file ' + in_path +\
+                        ' is empty, skipping this file.', file=log_f)
+                continue
+
+            print(STR_INDT + 'Loading ' + str(len(fname_df)) + ' ' +\
+                    postfix + ' rows', file=log_f)
+            n_rows += len(fname_df)
+
+            # cast columns to the types of the MET line type and buffer in
+            # lead order, flushing to the store over the memory budget
+            strt = time.perf_counter()
+            fname_df = apply_schema(fname_df, postfix)
+            schema_s += time.perf_counter() - strt
+            append_cycle(writer, postfix, fname_df)
+
+        print(STR_INDT + 'Closing file ' + in_path, file=log_f)
+        metrics.append(metric(cnfg, 'file', anl_strng, path=in_path,
+                              line_types=sorted(file_dict.keys()),
+                              bytes=in_stats[in_path][0], rows=n_rows,
+                              parse_s=parse_s, schema_s=schema_s,
+                              concat_s=writer['concat_s'] - concat_s,
+                              write_s=writer['write_s'] - write_s))
+        totals['rows'] += n_rows
+        totals['parse_s'] += parse_s
+        totals['schema_s'] += schema_s
+
+    # write the remaining rows and replace the cycle partitions
+    close_cycle(writer)
+    print(STR_INDT + 'Wrote cycle ' + anl_strng + ' to ' + store + ' in ' +\
+            str(writer['n_flush']) + ' chunks', file=log_f)
+
+    cyc_end = time.time()
+    metrics.append(metric(cnfg, 'cycle', anl_strng, start=cyc_strt,
+                          end=cyc_end, wall_s=cyc_end - cyc_strt,
+                          n_files=len(in_paths),
+                          bytes=sum([stat[0] for stat in in_stats.values()]),
+                          concat_s=writer['concat_s'],
+                          write_s=writer['write_s'],
+                          n_flush=writer['n_flush'], **totals))
+
+    return anl_strng, in_stats, log_f.getvalue(), metrics
+
+# record the cycles parsed for a configuration in the store manifest and the
+# log, in cycle order, and export the pickled data if selected
+def finish_gridstat(cnfg, results):
+    in_data_root, out_data_root, out_path, store, log_path, pfx =\
+            cnfg_paths(cnfg)
+
+    strt = time.perf_counter()
+    manifest = read_manifest(store)
+    with open(log_path, 'a') as log_f, open(metrics_path(cnfg), 'a') as met_f:
+        for anl_strng, in_stats, log_txt, metrics in sorted(results):
+            print(log_txt, end='', file=log_f)
+            for record in metrics:
+                # records of the workers are keyed by the run that planned
+                # them, as workers may not share the module state of the run
+                record['run'] = RUN_ID
+                print(json.dumps(record), file=met_f)
+
+            # record the ingested inputs for the cycle
+            manifest[anl_strng] = in_stats
+
+        write_manifest(store, manifest)
+
+        if BIN_EXPORT:
+            print('Exporting data to ' + out_path, file=log_f)
+            export_bin(store, out_path, STRT_DT, END_DT)
+
+        cycs = [rec for result in results for rec in result[3]
+                if rec['kind'] == 'cycle']
+        totals = {}
+        for key in ['n_files', 'bytes', 'rows', 'parse_s', 'schema_s',
+                    'concat_s', 'write_s', 'wall_s']:
+            totals[key] = sum([cyc[key] for cyc in cycs])
+
+        print(json.dumps(metric(cnfg, 'cnfg', None, n_cycles=len(cycs),
+                                finish_s=time.perf_counter() - strt,
+                                **totals)), file=met_f)
+
+    return 'Completed: ' + cnfg_name(cnfg) + '\n'
+
+#  function for processing a single configuration serially
+def proc_gridstat(cnfg):
+    tasks = plan_gridstat(cnfg)
+    if tasks is None:
+        return 'Failed: ' + cnfg_name(cnfg) + '\n'
+
+    results = [proc_cycle(task) for task in tasks]
+
+    return finish_gridstat(cnfg, results)
+
+# process all configurations, fanning out the cycle parsing tasks of every
+# configuration over the pool workers so that a single configuration with
+# many cycles is not limited to one worker; results are merged by
+# configuration in cycle order
+def proc_gridstat_pool(cnfgs, pool):
+    plans = [plan_gridstat(cnfg) for cnfg in cnfgs]
+    tasks = []
+    for plan in plans:
+        if plan is not None:
+            tasks += plan
+
+    results = pool.map(proc_cycle, tasks, chunksize=1)
+
+    msgs = []
+    i_t = 0
+    for i_c in range(len(cnfgs)):
+        cnfg = cnfgs[i_c]
+        if plans[i_c] is None:
+            msgs.append('Failed: ' + cnfg_name(cnfg) + '\n')
+
+        else:
+            n_t = len(plans[i_c])
+            msgs.append(finish_gridstat(cnfg, results[i_t:i_t + n_t]))
+            i_t += n_t
+
+    return msgs
+
+##################################################################################
+# Metrics summary
+##################################################################################
+# read the records of a JSON-lines metrics file, empty if it does not exist
+def read_metrics(path):
+    records = []
+    if os.path.isfile(path):
+        with open(path) as f:
+            for line in f:
+                if len(line.strip()) > 0:
+                    records.append(json.loads(line))
+
+    return records
+
+# summary of the metrics of the last run of each configuration, with the
+# totals of each configuration, the N_SLOW slowest cycles, the cycles slower
+# than STRG_FCT times the median cycle and the load of each pool worker
+def metrics_summary(cnfgs):
+    summary = '%-40s %6s %6s %8s %10s'%('configuration', 'cycs', 'skip',
+                                       'MB', 'rows') +\
+              '%8s %8s %8s %8s %8s %8s %10s\n'%('glob_s', 'parse_s',
+                                               'schema_s', 'concat_s',
+                                               'write_s', 'wall_s', 'rows/s')
+    cycs = []
+    for cnfg in cnfgs:
+        records = read_metrics(metrics_path(cnfg))
+        if len(records) == 0:
+            summary += 'WARNING: no metrics for ' + cnfg_name(cnfg) + ' in ' +\
+                    metrics_path(cnfg) + '\n'
+            continue
+
+        # metrics of previous runs are kept in the file, the last run is
+        # the run of the last record written
+        run = records[-1].get('run')
+        records = [rec for rec in records if rec.get('run') == run]
+        globs = [rec for rec in records if rec['kind'] == 'glob']
+        cyc_recs = [rec for rec in records if rec['kind'] == 'cycle']
+        cycs += cyc_recs
+
+        tot = {}
+        for key in ['bytes', 'rows', 'parse_s', 'schema_s', 'concat_s',
+                    'write_s', 'wall_s']:
+            tot[key] = sum([rec[key] for rec in cyc_recs])
+
+        rate = tot['rows'] / tot['wall_s'] if tot['wall_s'] > 0 else 0.0
+        summary += '%-40s %6d %6d'%(cnfg_name(cnfg), len(cyc_recs),
+                                    len([rec for rec in globs
+                                         if rec['skipped']])) +\
+                   ' %8.1f %10d'%(tot['bytes'] / 1024 ** 2, tot['rows']) +\
+                   ' %8.2f'%sum([rec['glob_s'] for rec in globs]) +\
+                   ' %8.2f %8.2f %8.2f %8.2f %8.2f'%(tot['parse_s'],
+                                                   tot['schema_s'],
+                                                   tot['concat_s'],
+                                                   tot['write_s'],
+                                                   tot['wall_s']) +\
+                   ' %10.1f\n'%rate
+
+    if len(cycs) == 0:
+        return summary
+
+    # slowest cycles over all configurations
+    summary += '\nSlowest ' + str(min(N_SLOW, len(cycs))) + ' cycles:\n'
+    walls = np.array([rec['wall_s'] for rec in cycs])
+    for i_c in np.argsort(-walls)[:N_SLOW]:
+        rec = cycs[i_c]
+        summary += STR_INDT + '%-40s %s %8.2f s %10d rows %8.1f MB'%(
+                rec['cnfg'], rec['cyc'], rec['wall_s'], rec['rows'],
+                rec['bytes'] / 1024 ** 2) + ' on ' + rec['worker'] + '\n'
+
+    med = np.median(walls)
+    strgs = [rec for rec in cycs if rec['wall_s'] > STRG_FCT * med]
+    summary += '\n' + str(len(strgs)) + ' cycles slower than ' +\
+               str(STRG_FCT) + ' x the median of ' + '%.2f'%med + ' s\n'
+    for rec in strgs:
+        summary += STR_INDT + rec['cnfg'] + ' ' + rec['cyc'] + ' ' +\
+                   '%.2f'%rec['wall_s'] + ' s\n'
+
+    # busy time and finish of each worker relative to the pool start
+    pool_strt = min([rec['start'] for rec in cycs])
+    workers = {}
+    for rec in cycs:
+        key = rec['worker'] + ' ' + str(rec['pid'])
+        if key not in workers.keys():
+            workers[key] = {'cycs': 0, 'busy_s': 0.0, 'end': 0.0,
+                            'rss': 0.0}
+
+        wkr = workers[key]
+        wkr['cycs'] += 1
+        wkr['busy_s'] += rec['wall_s']
+        wkr['end'] = max(wkr['end'], rec['end'] - pool_strt)
+        wkr['rss'] = max(wkr['rss'], rec['peak_rss_mb'])
+
+    ends = sorted([wkr['end'] for wkr in workers.values()])
+    summary += '\nPool of ' + str(len(workers)) + ' workers over ' +\
+               '%.2f'%ends[-1] + ' s, the last finishing ' +\
+               '%.2f'%(ends[-1] - ends[0]) + ' s after the first:\n'
+    for key, wkr in sorted(workers.items(), key=lambda x:x[1]['end']):
+        summary += STR_INDT + '%-30s %6d cycs %10.2f s busy'%(key,
+                                                             wkr['cycs'],
+                                                             wkr['busy_s']) +\
+                   ' %10.2f s end %8.1f MB peak RSS\n'%(wkr['end'],
+                                                         wkr['rss'])
+
+    return summary
 
 ##################################################################################
 # Runs multiprocessing on parameter grid
 ##################################################################################
-# run lines if executed as a script
+# run lines if executed as a script, or summarize the metrics of the last run
+# of each configuration when run with the argument summary
 if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'summary':
+        print(metrics_summary(CNFGS), end='')
+        sys.exit(0)
+
+    elif len(sys.argv) > 1:
+        print('ERROR: argument ' + sys.argv[1] + ' is not summary.')
+        sys.exit(1)
+
     # infer available cpus for workers
-    n_workers = multiprocessing.cpu_count() - 1
+    n_workers = max(multiprocessing.cpu_count() - 1, 1)
     print('Running proc_gridstat with ' + str(n_workers) + ' total workers.')
 
     with Pool(n_workers) as pool:
-        print(*pool.map(proc_gridstat, CNFGS))
+        print(*proc_gridstat_pool(CNFGS, pool))
 
 ##################################################################################
 # end
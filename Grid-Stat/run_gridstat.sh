@@ -168,6 +168,20 @@ if [ ! -r "${MSK_ROOT}/${msk_nme}.${msk_ext}"  ]; then
   exit 1
 fi
 
+# cache of landmasks regridded to the obs grid, shared by all runs, defaults
+# to a directory of the output root if unset
+if [ ! ${MSK_CACHE} ]; then
+  MSK_CACHE=${OUT_CYC_DIR}/vx_mask_cache
+fi
+
+cmd="mkdir -p ${MSK_CACHE}"
+echo ${cmd}; eval ${cmd}
+
+if [ ! -w ${MSK_CACHE} ]; then
+  echo "ERROR: landmask cache directory, ${MSK_CACHE}, is not writable."
+  exit 1
+fi
+
 # define the interpolation method and related parameters
 if [ ! ${INT_MTHD} ]; then
   echo "ERROR: regridding interpolation method \${INT_MTHD} is not defined."
@@ -217,6 +231,48 @@ else
   prfx=""
 fi
 
+# write the grid_stat_*_${TYPE}.txt files of each line type in addition to the
+# combined grid_stat_*.stat file, TRUE or FALSE, defaults to TRUE if unset
+if [ -z ${TXT_OUT} ]; then
+  TXT_OUT="TRUE"
+elif [[ ${TXT_OUT} != "TRUE" && ${TXT_OUT} != "FALSE" ]]; then
+  echo "ERROR: \${TXT_OUT} must be set to 'TRUE' or 'FALSE', got ${TXT_OUT}."
+  exit 1
+fi
+
+# output_flag setting of the line types in the GridStatConfig
+if [[ ${TXT_OUT} = "TRUE" ]]; then
+  out_flg="BOTH"
+else
+  out_flg="STAT"
+fi
+
+# maximum number of forecast leads run in parallel, defaults to 1 for serial
+if [ -z ${MAX_PAR} ]; then
+  MAX_PAR=1
+elif [[ ! ${MAX_PAR} =~ ^[0-9]+$ || ${MAX_PAR} -lt 1 ]]; then
+  echo "ERROR: \${MAX_PAR} must be a positive integer, got ${MAX_PAR}."
+  exit 1
+fi
+
+# skip forecast leads with completion records matching their inputs, TRUE or
+# FALSE, defaults to FALSE to recompute all leads if unset
+if [ -z ${RESUME} ]; then
+  RESUME="FALSE"
+elif [[ ${RESUME} != "TRUE" && ${RESUME} != "FALSE" ]]; then
+  echo "ERROR: \${RESUME} must be set to 'TRUE' or 'FALSE', got ${RESUME}."
+  exit 1
+fi
+
+# print the task table and exit without processing, TRUE or FALSE, defaults
+# to FALSE if unset
+if [ -z ${DRY_RUN} ]; then
+  DRY_RUN="FALSE"
+elif [[ ${DRY_RUN} != "TRUE" && ${DRY_RUN} != "FALSE" ]]; then
+  echo "ERROR: \${DRY_RUN} must be set to 'TRUE' or 'FALSE', got ${DRY_RUN}."
+  exit 1
+fi
+
 # check for software and data deps.
 if [ ! -d ${DATA_ROOT} ]; then
   echo "ERROR: StageIV data directory, ${DATA_ROOT}, does not exist."
@@ -235,151 +291,497 @@ fi
 cmd="cd ${script_dir}"
 echo ${cmd}; eval ${cmd}
 
-# define the number of dates to loop
-fcst_hrs=$(( (`date +%s -d "${end_dt}"` - `date +%s -d "${strt_dt}"`) / 3600 ))
-
-for (( cyc_hr = 0; cyc_hr <= ${fcst_hrs}; cyc_hr += ${CYC_INT} )); do
-  # directory string for forecast analysis initialization time
-  dirstr=`date +%Y%m%d%H -d "${strt_dt} ${cyc_hr} hours"`
-
-  # cycle date directory of cf-compliant input files
-  in_dir=${IN_CYC_DIR}/${dirstr}${IN_DT_SUBDIR}
-
-  # set and clean working directory based on looped forecast start date
-  work_root=${OUT_CYC_DIR}/${dirstr}${OUT_DT_SUBDIR}
-  mkdir -p ${work_root}
-  rm -f ${work_root}/grid_stat_${PRFX}*.txt
-  rm -f ${work_root}/grid_stat_${PRFX}*.stat
-  rm -f ${work_root}/grid_stat_${PRFX}*.nc
-  rm -f ${work_root}/${prfx}GridStatConfig
-
-  # loop lead hours for forecast valid time for each initialization time
-  for (( lead_hr = ${ANL_MIN}; lead_hr <= ${ANL_MAX}; lead_hr += ${ANL_INT} )); do
-    # define valid times for accumulation    
-    (( anl_end_hr = lead_hr + cyc_hr ))
-    (( anl_strt_hr = anl_end_hr - ACC_INT ))
-    anl_end=`date +%Y-%m-%d_%H_%M_%S -d "${strt_dt} ${anl_end_hr} hours"`
-    anl_strt=`date +%Y-%m-%d_%H_%M_%S -d "${strt_dt} ${anl_strt_hr} hours"`
-
-    validyear=${anl_end:0:4}
-    validmon=${anl_end:5:2}
-    validday=${anl_end:8:2}
-    validhr=${anl_end:11:2}
-    
-    # forecast file name based on forecast initialization and lead
-    pdd_hr=`printf %03d $(( 10#${lead_hr} ))`
-    for_f_in=${CTR_FLW}_${ACC_INT}${VRF_FLD}_${dirstr}_F${pdd_hr}.nc
-
-    # obs file defined in terms of valid time
-    obs_f_in=StageIV_QPE_${validyear}${validmon}${validday}${validhr}.nc
-
-    # Set up singularity container with directory privileges
-    cmd="singularity instance start -B ${work_root}:/work_root:rw,"
-    cmd+="${DATA_ROOT}:/DATA_ROOT:ro,${MSK_ROOT}:/MSK_ROOT:ro,"
-    cmd+="${in_dir}:/in_dir:ro,${script_dir}:/script_dir:ro"
-    cmd+=" ${MET_SNG} met1"
+# the table of cycle / lead tasks is computed once by plan_tasks.py, written
+# to a temporary file moved into place for runs sharing the output directory
+task_f=${OUT_CYC_DIR}/${prfx}gridstat_tasks_${GRD}.txt
+cmd="python ${script_dir}/plan_tasks.py STRT_DT=${STRT_DT} END_DT=${END_DT}"
+cmd+=" CYC_INT=${CYC_INT} ANL_MIN=${ANL_MIN} ANL_MAX=${ANL_MAX}"
+cmd+=" ANL_INT=${ANL_INT} ACC_INT=${ACC_INT} CTR_FLW=${CTR_FLW} GRD=${GRD}"
+cmd+=" VRF_FLD=${VRF_FLD} > ${task_f}_$$"
+echo ${cmd}; eval ${cmd}
+
+if [ $? -ne 0 ]; then
+  cat ${task_f}_$$
+  rm -f ${task_f}_$$
+  echo "ERROR: forecast cycle / lead tasks could not be planned."
+  exit 1
+else
+  mv ${task_f}_$$ ${task_f}
+  echo "Planned `tail -n 1 ${task_f} | cut -c 3-` in ${task_f}."
+fi
+
+# print the task table without running the tasks
+if [[ ${DRY_RUN} = "TRUE" ]]; then
+  cat ${task_f}
+  exit 0
+fi
+
+# a single singularity instance is run for the job, with the cycle input and
+# output roots bound so that all cycles are accessible in the container
+sng_nme="met_$$"
+sng_on=""
+sng_cnt=0
+
+# stop the instance and log the start / stop overhead avoided by running one
+# instance per job rather than one per cycle and lead, run on exit or error
+stop_sng() {
+  if [ ${sng_on} ]; then
+    sng_on=""
+    stop_ms=`date +%s%3N`
+    cmd="singularity instance stop ${sng_nme}"
     echo ${cmd}; eval ${cmd}
+    (( sng_ms = strt_ms + `date +%s%3N` - stop_ms ))
+    if [ ${sng_cnt} -gt 1 ]; then
+      (( svd_ms = (sng_cnt - 1) * sng_ms ))
+      msg="Singularity instance start / stop took ${sng_ms} ms, saved "
+      msg+="approximately ${svd_ms} ms over ${sng_cnt} forecast cycle / lead "
+      msg+="runs versus one instance per lead."
+      echo ${msg}
+    fi
+  fi
+}
 
-    if [[ ${CMP_ACC} = "TRUE" ]]; then
-      # check for input file based on output from run_wrfout_cf.sh
-      if [ -r ${in_dir}/wrfcf_${GRD}_${anl_strt}_to_${anl_end}.nc ]; then
-        # Set accumulation initialization string
-        inityear=${dirstr:0:4}
-        initmon=${dirstr:4:2}
-        initday=${dirstr:6:2}
-        inithr=${dirstr:8:2}
-
-        # Combine precip to accumulation period 
-        cmd="singularity exec instance://met1 pcp_combine \
-        -sum ${inityear}${initmon}${initday}_${inithr}0000 ${ACC_INT} \
-        ${validyear}${validmon}${validday}_${validhr}0000 ${ACC_INT} \
-        /work_root/${prfx}${for_f_in} \
-        -field 'name=\"precip_bkt\";  level=\"(*,*,*)\";' -name \"${VRF_FLD}_${ACC_INT}hr\" \
-        -pcpdir /in_dir \
-        -pcprx \"wrfcf_${GRD}_${anl_strt}_to_${anl_end}.nc\" "
-        echo ${cmd}; eval ${cmd}
-      else
-        msg="pcp_combine input file ${in_dir}/wrfcf_${GRD}_${anl_strt}_to_${anl_end}.nc is not "
-        msg+="readable or does not exist, skipping pcp_combine for "
-        msg+="forecast initialization ${dirstr}, forecast hour ${lead_hr}." 
+trap stop_sng EXIT
+
+# on cancellation or preemption the running leads are killed with their MET
+# processes, so that these do not continue writing partial outputs
+trap 'for pid in `jobs -rp`; do kill ${pid} `pgrep -P ${pid}`; done 2> /dev/null; exit 1' INT TERM
+
+# Set up singularity container with directory privileges
+strt_ms=`date +%s%3N`
+cmd="singularity instance start -B ${OUT_CYC_DIR}:/OUT_CYC_DIR:rw,"
+cmd+="${DATA_ROOT}:/DATA_ROOT:ro,${MSK_ROOT}:/MSK_ROOT:ro,"
+cmd+="${MSK_CACHE}:/MSK_CACHE:rw,"
+cmd+="${IN_CYC_DIR}:/IN_CYC_DIR:ro,${script_dir}:/script_dir:ro"
+cmd+=" ${MET_SNG} ${sng_nme}"
+echo ${cmd}; eval ${cmd}
+
+if [ $? -ne 0 ]; then
+  echo "ERROR: singularity instance ${sng_nme} failed to start."
+  exit 1
+else
+  sng_on="TRUE"
+  (( strt_ms = `date +%s%3N` - strt_ms ))
+fi
+
+# lines of the netCDF header of an obs file defining its grid, the dimensions
+# and MET grid global attributes
+GRD_DEF="^\s*[A-Za-z_]+ = [0-9]+ ;|^\s*:(Projection|lat_ll|lon_ll|delta_lat|"
+GRD_DEF+="delta_lon|Nlat|Nlon|lat_pin|lon_pin|x_pin|y_pin|lon_orient|"
+GRD_DEF+="scale_lat|scale_lat_1|scale_lat_2|d_km|r_km|nx|ny|hemisphere) ="
+
+# name of the cached landmask for an obs file, keyed on a hash of the polygon
+# file and of the grid definition of the obs file, if the header cannot be
+# read the grid is identified by the obs data root
+msk_cache_f() {
+  local obs_grd=`singularity exec instance://${sng_nme} ncdump -h \
+    /DATA_ROOT/$1 2> /dev/null | grep -E "${GRD_DEF}"`
+  if [ ! "${obs_grd}" ]; then
+    obs_grd=${DATA_ROOT}
+  fi
+
+  local msk_key=`{ cat ${MSK_ROOT}/${msk_nme}.${msk_ext}; echo "${obs_grd}"; } \
+    | sha256sum | cut -c1-16`
+  echo ${msk_nme}_${msk_key}.nc
+}
+
+# directory of rendered configurations, named by a hash of the template and
+# the settings substituted in it
+cfg_dir=${OUT_CYC_DIR}/gridstat_configs
+cmd="mkdir -p ${cfg_dir}"
+echo ${cmd}; eval ${cmd}
+
+# placeholders of the GridStatConfigTemplate
+CFG_KEYS="INT_MTHD|INT_WDTH|RNK_CRR|VRF_FLD|CAT_THR|PLY_MSK|BTSTRP|NBRHD_WDTH|PRFX|OUT_FLG"
+
+# render the GridStatConfigTemplate with the landmask msk_f of the cache into
+# the configuration directory, once for each unique template and settings,
+# printing the name of the configuration; placeholders not substituted in the
+# rendered configuration are an error
+render_cfg() {
+  local sed_exps=(
+                  -e "s/INT_MTHD/method = ${INT_MTHD}/"
+                  -e "s/INT_WDTH/width = ${INT_WDTH}/"
+                  -e "s/RNK_CRR/rank_corr_flag      = ${RNK_CRR}/"
+                  -e "s/VRF_FLD/name       = \"${VRF_FLD}_${ACC_INT}hr\"/"
+                  -e "s/CAT_THR/cat_thresh = ${CAT_THR}/"
+                  -e "s|PLY_MSK|poly = [ \"/MSK_CACHE/$1\" ]|"
+                  -e "s/BTSTRP/n_rep    = ${BTSTRP}/"
+                  -e "s/NBRHD_WDTH/width = [ ${NBRHD_WDTH} ]/"
+                  -e "s/PRFX/output_prefix    = \"${PRFX}\"/"
+                  -e "s/OUT_FLG/${out_flg}/"
+                 )
+
+  local cfg_key=`{ cat ${script_dir}/GridStatConfigTemplate; \
+    printf "%s\n" "${sed_exps[@]}"; } | sha256sum | cut -c1-16`
+  local cfg_f=GridStatConfig_${cfg_key}
+
+  # concurrent leads render each configuration once, holding its lock
+  (
+    flock 9
+
+    if [ ! -r ${cfg_dir}/${cfg_f} ]; then
+      # render to a temporary file moved into place when validated
+      tmp_f=${cfg_dir}/tmp_${BASHPID}_${cfg_f}
+      sed "${sed_exps[@]}" ${script_dir}/GridStatConfigTemplate > ${tmp_f}
+      if [ $? -ne 0 ]; then
+        echo "ERROR: GridStatConfigTemplate substitution failed." >&2
+        rm -f ${tmp_f}
+        exit 1
+      fi
+
+      unsub=`grep -owE "${CFG_KEYS}" ${tmp_f} | sort -u`
+      if [ "${unsub}" ]; then
+        echo "ERROR: GridStatConfig placeholders not substituted:" ${unsub} >&2
+        rm -f ${tmp_f}
+        exit 1
+      fi
+
+      mv ${tmp_f} ${cfg_dir}/${cfg_f}
+      echo "Rendered GridStatConfig ${cfg_dir}/${cfg_f}." >&2
+    fi
+  ) 9> ${cfg_dir}/${cfg_f}.lock
+  [ $? -ne 0 ] && return 1
+
+  echo ${cfg_f}
+}
+
+# completion record of a forecast lead, listing the size and modification time
+# of the source file $1 and obs file $2, the rendered configuration $3, the MET
+# image, and the grid_stat outputs matching the pattern $4
+lead_record() {
+  stat -L -c "input %n %s %Y" $1 $2
+  echo "config $3"
+  stat -L -c "image %n %s %Y" ${MET_SNG}
+  local out_fs=`ls $4 2> /dev/null`
+  if [ "${out_fs}" ]; then
+    stat -c "output %n %s %Y" ${out_fs}
+  fi
+}
+
+# run the forecast lead lead_hr of the forecast cycle cyc_hr, for the cycle
+# directories defined in the cycle loop below
+run_lead() {
+  # lead hours, accumulation window, cf-compliant file, forecast file and obs
+  # file of the lead from the task table
+  local lead_hr=$1
+  local pdd_hr=$2
+  local anl_strt=$3
+  local anl_end=$4
+  local cf_f=$5
+  local for_f_in=$6
+  local obs_f_in=$7
+
+  validyear=${anl_end:0:4}
+  validmon=${anl_end:5:2}
+  validday=${anl_end:8:2}
+  validhr=${anl_end:11:2}
+
+  # source file of the lead in the cycle input directory
+  if [[ ${CMP_ACC} = "TRUE" ]]; then
+    src_f=${in_dir}/${cf_f}
+  else
+    src_f=${in_dir}/${for_f_in}
+  fi
+
+  # completion record and grid_stat outputs of the lead
+  done_f=${work_root}/${prfx}gridstat_F${pdd_hr}.done
+  printf -v lead_pd %02d ${lead_hr}
+  out_ptn=${work_root}/grid_stat_${prfx}${lead_pd}0000L_
+  out_ptn+=${validyear}${validmon}${validday}_${validhr}0000V*
+  msk_f=${job_msk_f}
+  cfg_f=""
+
+  # skip the lead if its record matches the current inputs, configuration,
+  # image and outputs, otherwise remove the record and recompute the lead
+  if [[ ${RESUME} = "TRUE" && -r ${done_f} && -r ${src_f} && \
+        -r ${DATA_ROOT}/${obs_f_in} ]]; then
+    cfg_f=`render_cfg ${msk_f}`
+    if [ $? -eq 0 ]; then
+      lead_rec=`lead_record ${src_f} ${DATA_ROOT}/${obs_f_in} ${cfg_f} "${out_ptn}"`
+      if [ "`cat ${done_f}`" = "${lead_rec}" ]; then
+        msg="Forecast initialization ${dirstr}, forecast hour ${lead_hr} is "
+        msg+="up to date with ${done_f}, skipping."
         echo ${msg}
+        return 0
       fi
-    else
-      # copy the preprocessed data to the working directory from the data root
-      in_path="${in_dir}/${for_f_in}"
-      if [ -r ${in_path} ]; then
-        cmd="cp -L ${in_path} ${work_root}/${prfx}${for_f_in}"
-        echo ${cmd}; eval ${cmd}
-      else
-        echo "Source file ${in_path} not found."
+    fi
+  fi
+  rm -f ${done_f}
+
+  if [[ ${CMP_ACC} = "TRUE" ]]; then
+    # check for input file based on output from run_wrfout_cf.sh
+    if [ -r ${src_f} ]; then
+      # Set accumulation initialization string
+      inityear=${dirstr:0:4}
+      initmon=${dirstr:4:2}
+      initday=${dirstr:6:2}
+      inithr=${dirstr:8:2}
+
+      # Combine precip to accumulation period 
+      cmd="singularity exec instance://${sng_nme} pcp_combine \
+      -sum ${inityear}${initmon}${initday}_${inithr}0000 ${ACC_INT} \
+      ${validyear}${validmon}${validday}_${validhr}0000 ${ACC_INT} \
+      ${sng_work_root}/${prfx}${for_f_in} \
+      -field 'name=\"precip_bkt\";  level=\"(*,*,*)\";' -name \"${VRF_FLD}_${ACC_INT}hr\" \
+      -pcpdir ${sng_in_dir} \
+      -pcprx \"${cf_f}\" "
+      echo ${cmd}; eval ${cmd}
+
+      if [ $? -ne 0 ]; then
+        msg="ERROR: pcp_combine failed for forecast initialization "
+        msg+="${dirstr}, forecast hour ${lead_hr}."
+        echo ${msg}
+        rm -f ${work_root}/${prfx}${for_f_in}
+        return 1
       fi
+    else
+      msg="pcp_combine input file ${src_f} is not "
+      msg+="readable or does not exist, skipping pcp_combine for "
+      msg+="forecast initialization ${dirstr}, forecast hour ${lead_hr}." 
+      echo ${msg}
+      return 2
+    fi
+  else
+    # copy the preprocessed data to the working directory from the data root
+    if [ -r ${src_f} ]; then
+      cmd="cp -L ${src_f} ${work_root}/${prfx}${for_f_in}"
+      echo ${cmd}; eval ${cmd}
+    else
+      echo "Source file ${src_f} not found."
+      return 2
     fi
-    
-    if [ -r ${work_root}/${prfx}${for_f_in} ]; then
-      if [ -r ${DATA_ROOT}/${obs_f_in} ]; then
-        # masks are recreated depending on the existence of files from previous loops
-        # NOTE: need to determine under what conditions would this file need to update
-        if [ ! -r ${work_root}/${msk_nme}_mask_regridded_with_StageIV.nc ]; then
-          cmd="singularity exec instance://met1 gen_vx_mask -v 10 \
+  fi
+  
+  # exit status of the lead, 0 if completed, 1 if a MET tool failed and 2 if
+  # inputs are missing
+  local status=0
+
+  if [ -r ${work_root}/${prfx}${for_f_in} ]; then
+    if [ -r ${DATA_ROOT}/${obs_f_in} ]; then
+      # the regridded mask is shared by all runs with the same polygon and obs
+      # grid from the cache, generated by the first run to hold its lock and
+      # written to a temporary file moved into place when complete
+      if [ ! ${msk_f} ]; then
+        msk_f=`msk_cache_f ${obs_f_in}`
+      fi
+      (
+        flock 9
+
+        if [ ! -r ${MSK_CACHE}/${msk_f} ]; then
+          tmp_f=tmp_${BASHPID}_${msk_f}
+          cmd="singularity exec instance://${sng_nme} gen_vx_mask -v 10 \
           /DATA_ROOT/${obs_f_in} \
           -type poly \
           /MSK_ROOT/${msk_nme}.${msk_ext} \
-          /work_root/${msk_nme}_mask_regridded_with_StageIV.nc"
-          echo ${cmd}
-          eval ${cmd}
+          /MSK_CACHE/${tmp_f}"
+          echo ${cmd}; eval ${cmd}
+
+          if [ $? -eq 0 ]; then
+            cmd="mv ${MSK_CACHE}/${tmp_f} ${MSK_CACHE}/${msk_f}"
+            echo ${cmd}; eval ${cmd}
+          else
+            rm -f ${MSK_CACHE}/${tmp_f}
+          fi
+        else
+          echo "Using cached landmask ${MSK_CACHE}/${msk_f}."
         fi
+      ) 9> ${MSK_CACHE}/${msk_f}.lock
 
-        # update GridStatConfigTemplate archiving file in working directory unchanged on inner loop
-        if [ ! -r ${work_root}/${prfx}GridStatConfig ]; then
-          cat ${script_dir}/GridStatConfigTemplate \
-            | sed "s/INT_MTHD/method = ${INT_MTHD}/" \
-            | sed "s/INT_WDTH/width = ${INT_WDTH}/" \
-            | sed "s/RNK_CRR/rank_corr_flag      = ${RNK_CRR}/" \
-            | sed "s/VRF_FLD/name       = \"${VRF_FLD}_${ACC_INT}hr\"/" \
-            | sed "s/CAT_THR/cat_thresh = ${CAT_THR}/" \
-            | sed "s/PLY_MSK/poly = [ \"\/work_root\/${msk_nme}_mask_regridded_with_StageIV.nc\" ]/" \
-            | sed "s/BTSTRP/n_rep    = ${BTSTRP}/" \
-            | sed "s/NBRHD_WDTH/width = [ ${NBRHD_WDTH} ]/" \
-            | sed "s/PRFX/output_prefix    = \"${PRFX}\"/" \
-            > ${work_root}/${prfx}GridStatConfig
+      if [ ! -r ${MSK_CACHE}/${msk_f} ]; then
+        echo "ERROR: landmask ${MSK_CACHE}/${msk_f} was not generated."
+        rm -f ${work_root}/${prfx}${for_f_in}
+        return 1
+      fi
+
+      # render the configuration for the parameters and mask, or reuse the
+      # configuration previously rendered for these
+      if [ ! ${cfg_f} ]; then
+        cfg_f=`render_cfg ${msk_f}`
+        if [ $? -ne 0 ]; then
+          echo "ERROR: GridStatConfig could not be rendered, skipping grid_stat."
+          rm -f ${work_root}/${prfx}${for_f_in}
+          return 1
         fi
+      fi
 
-        # Run gridstat
-        cmd="singularity exec instance://met1 grid_stat -v 10 \
-        /work_root/${prfx}${for_f_in} \
-        /DATA_ROOT/${obs_f_in} \
-        /work_root/${prfx}GridStatConfig \
-        -outdir /work_root"
-        echo ${cmd}; eval ${cmd}
-        
+      # link the cached mask and configuration into the working directory for
+      # reference, holding the lock of the cycle
+      (
+        flock 9
+
+        ln -sf ${MSK_CACHE}/${msk_f} \
+          ${work_root}/${msk_nme}_mask_regridded_with_StageIV.nc
+
+        ln -sf ${cfg_dir}/${cfg_f} ${work_root}/${prfx}GridStatConfig
+      ) 9> ${work_root}/${prfx}gridstat.lock
+
+      # Run gridstat
+      cmd="singularity exec instance://${sng_nme} grid_stat -v 10 \
+      ${sng_work_root}/${prfx}${for_f_in} \
+      /DATA_ROOT/${obs_f_in} \
+      /OUT_CYC_DIR/gridstat_configs/${cfg_f} \
+      -outdir ${sng_work_root}"
+      echo ${cmd}; eval ${cmd}
+
+      # record the completed lead for resumed runs
+      if [ $? -eq 0 ]; then
+        lead_record ${src_f} ${DATA_ROOT}/${obs_f_in} ${cfg_f} "${out_ptn}" \
+          > ${done_f}
       else
-        cmd="Observation verification file ${DATA_ROOT}/${obs_f_in} is not "
-        cmd+=" readable or does not exist, skipping grid_stat for forecast "
-        cmd+="initialization ${dirstr}, forecast hour ${lead_hr}." 
-        echo ${cmd}
+        msg="ERROR: grid_stat failed for forecast initialization "
+        msg+="${dirstr}, forecast hour ${lead_hr}."
+        echo ${msg}
+        status=1
       fi
-
+      
     else
-      cmd="gridstat input file ${work_root}/${prfx}${for_f_in} is not readable " 
-      cmd+=" or does not exist, skipping grid_stat for forecast initialization "
-      cmd+="${dirstr}, forecast hour ${lead_hr}." 
+      cmd="Observation verification file ${DATA_ROOT}/${obs_f_in} is not "
+      cmd+=" readable or does not exist, skipping grid_stat for forecast "
+      cmd+="initialization ${dirstr}, forecast hour ${lead_hr}." 
       echo ${cmd}
+      status=2
     fi
 
-    # End MET Process and singularity stop
-    cmd="singularity instance stop met1"
-    echo ${cmd}; eval ${cmd}
+  else
+    cmd="gridstat input file ${work_root}/${prfx}${for_f_in} is not readable " 
+    cmd+=" or does not exist, skipping grid_stat for forecast initialization "
+    cmd+="${dirstr}, forecast hour ${lead_hr}." 
+    echo ${cmd}
+    status=1
+  fi
 
-    # clean up working directory
-    cmd="rm -f ${work_root}/${prfx}${for_f_in}"
-    echo ${cmd}; eval ${cmd}
-  done
+  # clean up working directory
+  cmd="rm -f ${work_root}/${prfx}${for_f_in}"
+  echo ${cmd}; eval ${cmd}
+
+  return ${status}
+}
+
+# runs the lead of the task array with its exit status recorded in the report
+# file, in the background with a log in the working directory when MAX_PAR > 1
+run_task() {
+  if [ ${MAX_PAR} -gt 1 ]; then
+    # wait for a free slot and run the lead in the background, logging to
+    # a file of the lead in the working directory
+    while [ `jobs -rp | wc -l` -ge ${MAX_PAR} ]; do
+      wait -n
+    done
+
+    lead_log=${work_root}/${prfx}run_gridstat_F${pdd_hr}.log
+    lead_logs+=( ${lead_log} )
+    { run_lead "$@" > ${lead_log} 2>&1
+      echo "$? ${dirstr} F${pdd_hr}" >> ${rpt_f}; } &
+  else
+    run_lead "$@"
+    echo "$? ${dirstr} F${pdd_hr}" >> ${rpt_f}
+  fi
+}
+
+# exit status of each lead, one line per lead as "status cycle lead"
+rpt_f=${OUT_CYC_DIR}/gridstat_report_${prfx}$$.txt
+rm -f ${rpt_f}
+
+# name of the cached landmask of the obs grid, set on the first lead
+job_msk_f=""
+
+# logs of leads run in parallel, printed in order on completion
+lead_logs=()
+cyc_prv=""
+
+# loop the forecast cycles and leads of the task table
+while read -r -u 3 cyc cyc_hr lead_hr pdd_hr anl_strt anl_end cf_f for_f_in \
+    obs_f_in; do
+  # skip comment lines of the table
+  if [[ ${cyc:0:1} = "#" ]]; then
+    continue
+  fi
+
+  if [ "${cyc}" != "${cyc_prv}" ]; then
+    cyc_prv=${cyc}
+
+    # directory string for forecast analysis initialization time
+    dirstr=${cyc}
+
+    # cycle date directory of cf-compliant input files
+    in_dir=${IN_CYC_DIR}/${dirstr}${IN_DT_SUBDIR}
+    sng_in_dir=/IN_CYC_DIR/${dirstr}${IN_DT_SUBDIR}
+
+    # set and clean working directory based on looped forecast start date
+    work_root=${OUT_CYC_DIR}/${dirstr}${OUT_DT_SUBDIR}
+    sng_work_root=/OUT_CYC_DIR/${dirstr}${OUT_DT_SUBDIR}
+    mkdir -p ${work_root}
+    if [[ ${RESUME} = "FALSE" ]]; then
+      # outputs and completion records are kept when resuming, for the leads
+      # to be checked against their records
+      rm -f ${work_root}/grid_stat_${PRFX}*.txt
+      rm -f ${work_root}/grid_stat_${PRFX}*.stat
+      rm -f ${work_root}/grid_stat_${PRFX}*.nc
+      rm -f ${work_root}/${prfx}gridstat_F*.done
+    fi
+    rm -f ${work_root}/${prfx}GridStatConfig
+    rm -f ${work_root}/${prfx}run_gridstat_F*.log
+    rm -f ${work_root}/${prfx}gridstat.lock
+  fi
+
+  # count the runs using the singularity instance
+  (( sng_cnt += 1 ))
+
+  # the obs files of the data root share a grid, so the name of the cached
+  # landmask is computed once per job from the first readable obs file and
+  # inherited by the leads, rather than reading the obs header for each lead
+  if [[ ! ${job_msk_f} && -r ${DATA_ROOT}/${obs_f_in} ]]; then
+    job_msk_f=`msk_cache_f ${obs_f_in}`
+    echo "Using landmask ${job_msk_f} of the obs grid of ${obs_f_in}."
+  fi
+
+  task=( ${lead_hr} ${pdd_hr} ${anl_strt} ${anl_end} ${cf_f} ${for_f_in} \
+         ${obs_f_in} )
+
+  run_task ${task[@]}
+done 3< ${task_f}
+
+# wait for all leads to complete and print their logs in order
+wait
+for lead_log in ${lead_logs[@]}; do
+  echo "Log of ${lead_log}:"
+  cat ${lead_log}
 done
 
+# End MET Process and singularity stop
+stop_sng
+
+# report the exit status of each lead
+n_fail=0
+n_skip=0
+n_tsk=0
+if [ -r ${rpt_f} ]; then
+  while read -r status dirstr tsk_nme; do
+    (( n_tsk += 1 ))
+    if [ ${status} -eq 0 ]; then
+      echo "Completed: cycle ${dirstr} lead ${tsk_nme}."
+    elif [ ${status} -eq 2 ]; then
+      (( n_skip += 1 ))
+      echo "Skipped: cycle ${dirstr} lead ${tsk_nme}, inputs missing."
+    else
+      (( n_fail += 1 ))
+      echo "Failed: cycle ${dirstr} lead ${tsk_nme}, exit status ${status}."
+    fi
+  done < <(sort -k 2,2 -k 3,3 ${rpt_f})
+  rm -f ${rpt_f}
+fi
+msg="Completed $(( n_tsk - n_fail - n_skip )) of ${n_tsk} leads, "
+msg+="${n_fail} failed, ${n_skip} skipped."
+echo ${msg}
+
 msg="Script completed at `date +%Y-%m-%d_%H_%M_%S`, verify "
 msg+="outputs at OUT_CYC_DIR ${OUT_CYC_DIR}"
 echo ${msg}
 
+if [ ${n_fail} -gt 0 ]; then
+  exit 1
+fi
+
 #################################################################################
 # end
 
@@ -136,6 +136,57 @@ if [ -z ${OUT_DT_SUBDIR+x} ]; then
   exit 1
 fi
 
+# convert only the precipitation fields with wrfout_to_cf_precip.py rather
+# than the full conversion of wrfout_to_cf.ncl, TRUE or FALSE, defaults to
+# FALSE if unset
+if [ -z ${PRCP_ONLY} ]; then
+  PRCP_ONLY="FALSE"
+elif [[ ${PRCP_ONLY} != "TRUE" && ${PRCP_ONLY} != "FALSE" ]]; then
+  echo "ERROR: \${PRCP_ONLY} must be set to 'TRUE' or 'FALSE', got ${PRCP_ONLY}."
+  exit 1
+fi
+
+# convert all leads of a cycle in one run of wrfout_to_cf_precip.py, carrying
+# the accumulated precipitation of each lead forward to the next rather than
+# reading each wrfout file twice, TRUE or FALSE, defaults to FALSE if unset,
+# requires PRCP_ONLY=TRUE
+if [ -z ${MLT_LEAD} ]; then
+  MLT_LEAD="FALSE"
+elif [[ ${MLT_LEAD} != "TRUE" && ${MLT_LEAD} != "FALSE" ]]; then
+  echo "ERROR: \${MLT_LEAD} must be set to 'TRUE' or 'FALSE', got ${MLT_LEAD}."
+  exit 1
+elif [[ ${MLT_LEAD} = "TRUE" && ${PRCP_ONLY} != "TRUE" ]]; then
+  echo "ERROR: \${MLT_LEAD} can only be 'TRUE' with \${PRCP_ONLY} set to 'TRUE'."
+  exit 1
+fi
+
+# maximum number of conversion tasks run in parallel, defaults to 1 for serial
+if [ -z ${MAX_PAR} ]; then
+  MAX_PAR=1
+elif [[ ! ${MAX_PAR} =~ ^[0-9]+$ || ${MAX_PAR} -lt 1 ]]; then
+  echo "ERROR: \${MAX_PAR} must be a positive integer, got ${MAX_PAR}."
+  exit 1
+fi
+
+# comma separated list of the fields computed and written by wrfout_to_cf.ncl,
+# all fields of wrfout_to_cf.ncl are written if unset, not used if
+# PRCP_ONLY=TRUE
+if [ -z ${OUT_VARS} ]; then
+  OUT_VARS=""
+elif [[ ! ${OUT_VARS} =~ ^[A-Za-z0-9_]+(,[A-Za-z0-9_]+)*$ ]]; then
+  echo "ERROR: \${OUT_VARS} must be a comma separated list of field names, got ${OUT_VARS}."
+  exit 1
+fi
+
+# print the task table and exit without processing, TRUE or FALSE, defaults
+# to FALSE if unset
+if [ -z ${DRY_RUN} ]; then
+  DRY_RUN="FALSE"
+elif [[ ${DRY_RUN} != "TRUE" && ${DRY_RUN} != "FALSE" ]]; then
+  echo "ERROR: \${DRY_RUN} must be set to 'TRUE' or 'FALSE', got ${DRY_RUN}."
+  exit 1
+fi
+
 #################################################################################
 # Process data
 #################################################################################
@@ -147,6 +198,16 @@ if [ ${RGRD} = TRUE ]; then
   lat2=(65 51 40.5)
   lon1=(162 223.5 235)
   lon2=(272 253.5 240.5)
+
+  # fields of the cf-compliant files kept in the regridded outputs, the
+  # precipitation and IVT fields if all fields are written
+  if [ ${PRCP_ONLY} = TRUE ]; then
+    rgrd_flds="precip,precip_bkt"
+  elif [ ${OUT_VARS} ]; then
+    rgrd_flds=${OUT_VARS}
+  else
+    rgrd_flds="precip,precip_bkt,IVT,IVTU,IVTV,IWV"
+  fi
 elif [ ${RGRD} = FALSE ]; then
   echo "WRF outputs will be used with MET in their native grid."
 else
@@ -158,77 +219,275 @@ fi
 cmd="cd ${script_dir}"
 echo ${cmd}; eval ${cmd}
 
-# define the number of dates to loop
-fcst_hrs=$(( (`date +%s -d "${end_dt}"` - `date +%s -d "${strt_dt}"`) / 3600 ))
+# the table of cycle / lead tasks is computed once by plan_tasks.py, written
+# to a temporary file moved into place for runs sharing the output directory
+task_f=${OUT_CYC_DIR}/wrfout_cf_tasks_${GRD}.txt
+cmd="python ${script_dir}/plan_tasks.py STRT_DT=${STRT_DT} END_DT=${END_DT}"
+cmd+=" CYC_INT=${CYC_INT} ANL_MIN=${ANL_MIN} ANL_MAX=${ANL_MAX}"
+cmd+=" ANL_INT=${ANL_INT} ACC_INT=${ACC_INT} CTR_FLW=${CTR_FLW} GRD=${GRD}"
+cmd+=" > ${task_f}_$$"
+echo ${cmd}; eval ${cmd}
+
+if [ $? -ne 0 ]; then
+  cat ${task_f}_$$
+  rm -f ${task_f}_$$
+  echo "ERROR: forecast cycle / lead tasks could not be planned."
+  exit 1
+else
+  mv ${task_f}_$$ ${task_f}
+  echo "Planned `tail -n 1 ${task_f} | cut -c 3-` in ${task_f}."
+fi
+
+# print the task table without running the tasks
+if [[ ${DRY_RUN} = "TRUE" ]]; then
+  cat ${task_f}
+  exit 0
+fi
+
+# regrids a cf-compliant output to lat / lon from native grid with CDO, with a
+# temporary file of the calling task, returning non-zero if a step fails
+rgrd_out() {
+  local out_name=$1
+  local tmp_f=${out_name}_tmp_${BASHPID}
+  cmd="cdo -f nc4 sellonlatbox,${lon1},${lon2},${lat1},${lat2} "
+  cmd+="-remapbil,global_${gres} "
+  cmd+="-selname,${rgrd_flds} "
+  cmd+="${out_name} ${tmp_f}"
+  echo ${cmd}; eval ${cmd} || { rm -f ${tmp_f}; return 1; }
 
-for (( cyc_hr = 0; cyc_hr <= ${fcst_hrs}; cyc_hr += ${CYC_INT} )); do
-  # directory string for forecast analysis initialization time
-  dirstr=`date +%Y%m%d%H -d "${strt_dt} ${cyc_hr} hours"`
-  in_dir=${IN_CYC_DIR}/${dirstr}${IN_DT_SUBDIR}
+  # Adds forecast_reference_time back in from first output
+  cmd="ncks -A -v forecast_reference_time ${out_name} ${tmp_f}"
+  echo ${cmd}; eval ${cmd} || { rm -f ${tmp_f}; return 1; }
 
-  # set output path
-  work_root=${OUT_CYC_DIR}/${dirstr}${OUT_DT_SUBDIR}
-  cmd="mkdir -p ${work_root}"
+  # removes temporary data with regridded cf compliant outputs
+  cmd="mv ${tmp_f} ${out_name}"
   echo ${cmd}; eval ${cmd}
-      
-  # set input paths
-  if [ ! -d ${in_dir} ]; then
-    echo "WARNING: data input path ${in_dir} does not exist."
-    echo "Skipping analysis for ${dirstr}."
+}
+
+# converts the lead of the wrfout files file_1 to file_2 to out_name, returning
+# 0 on success, 1 on failure and 2 if the inputs are missing
+run_lead() {
+  local file_1=$1
+  local file_2=$2
+  local out_name=$3
+  local lead_hr=$4
+
+  if [[ ! -r ${file_1} || ! -r ${file_2} ]]; then
+    cmd="${file_1} or ${file_2} not readable or does not exist, "
+    cmd+="skipping forecast initialization ${dirstr}, "
+    cmd+="forecast hour ${lead_hr}."
+    echo ${cmd}
+    return 2
+  fi
+
+  # outputs of previous runs are removed, to check the output of this run
+  rm -f ${out_name}
+
+  if [ ${PRCP_ONLY} = TRUE ]; then
+    # reads only the precipitation, coordinates and times of the wrfout files
+    cmd="python wrfout_to_cf_precip.py 'file_in=\"${file_2}\"' "
+    cmd+="'file_prev=\"${file_1}\"' "
+    cmd+="'file_out=\"${out_name}\"'"
   else
-    echo "Processing forecasts in ${in_dir} directory."
-  
-    # loop lead hours for forecast valid time for each initialization time
-    for (( lead_hr = ${ANL_MIN}; lead_hr <= ${ANL_MAX}; lead_hr += ${ANL_INT} )); do
-      # define valid times for accumulation    
-      (( anl_end_hr = lead_hr + cyc_hr ))
-      (( anl_strt_hr = anl_end_hr - ACC_INT ))
-      anl_end=`date +%Y-%m-%d_%H_%M_%S -d "${strt_dt} ${anl_end_hr} hours"`
-      anl_strt=`date +%Y-%m-%d_%H_%M_%S -d "${strt_dt} ${anl_strt_hr} hours"`
-
-      # set input file names
-      file_1="${in_dir}/wrfout_${GRD}_${anl_strt}"
-      file_2="${in_dir}/wrfout_${GRD}_${anl_end}"
-      
-      # set output file name
-      output_file="wrfcf_${GRD}_${anl_strt}_to_${anl_end}.nc"
-      out_name="${work_root}/${output_file}"
-      
-      if [[ -r ${file_1} && -r ${file_2} ]]; then
-        cmd="ncl 'file_in=\"${file_2}\"' "
-        cmd+="'file_prev=\"${file_1}\"' " 
-        cmd+="'file_out=\"${out_name}\"' wrfout_to_cf.ncl "
-        echo ${cmd}; eval ${cmd}
-
-        if [ ${RGRD} = TRUE ]; then
-          # regrids to lat / lon from native grid with CDO
-          cmd="cdo -f nc4 sellonlatbox,${lon1},${lon2},${lat1},${lat2} "
-          cmd+="-remapbil,global_${gres} "
-          cmd+="-selname,precip,precip_bkt,IVT,IVTU,IVTV,IWV "
-          cmd+="${out_name} ${out_name}_tmp"
-          echo ${cmd}; eval ${cmd}
-
-          # Adds forecast_reference_time back in from first output
-          cmd="ncks -A -v forecast_reference_time ${out_name} ${out_name}_tmp"
-          echo ${cmd}; eval ${cmd}
-
-          # removes temporary data with regridded cf compliant outputs
-          cmd="mv ${out_name}_tmp ${out_name}"
-          echo ${cmd}; eval ${cmd}
-        fi
-      else
-        cmd="${file_1} or ${file_2} not readable or does not exist, "
-        cmd+="skipping forecast initialization ${loopstr}, "
-        cmd+="forecast hour ${lead_hr}."
-        echo ${cmd}
-      fi
+    cmd="ncl 'file_in=\"${file_2}\"' "
+    cmd+="'file_prev=\"${file_1}\"' " 
+    cmd+="'file_out=\"${out_name}\"' "
+    if [ ${OUT_VARS} ]; then
+      cmd+="'out_vars=\"${OUT_VARS}\"' "
+    fi
+    cmd+="wrfout_to_cf.ncl "
+  fi
+  echo ${cmd}; eval ${cmd}
+
+  if [[ $? -ne 0 && ${PRCP_ONLY} = TRUE ]]; then
+    echo "ERROR: wrfout_to_cf_precip.py failed writing ${out_name}."
+    rm -f ${out_name}
+    return 1
+  fi
+
+  # ncl does not reliably set its exit status, the output is checked instead
+  if [ ! -s ${out_name} ]; then
+    echo "ERROR: ${out_name} was not written."
+    return 1
+  fi
+
+  if [ ${RGRD} = TRUE ]; then
+    rgrd_out ${out_name} || return 1
+  fi
+}
+
+# converts the leads of a cycle listed in lead_f in one run, each line giving
+# the file_in, file_prev and file_out of a lead in lead order
+run_leads() {
+  local lead_f=$1
+  local file_in file_prev out_name
+  local status=0
+
+  # outputs of previous runs are removed, to check the outputs of this run
+  while read -r file_in file_prev out_name; do
+    rm -f ${out_name}
+  done < ${lead_f}
+
+  cmd="python wrfout_to_cf_precip.py 'file_list=\"${lead_f}\"'"
+  echo ${cmd}; eval ${cmd} || status=1
+
+  # the list is read on its own descriptor, as the regridding reads stdin
+  while read -r -u 4 file_in file_prev out_name; do
+    if [ ! -s ${out_name} ]; then
+      echo "ERROR: ${out_name} was not written."
+      status=1
+    elif [ ${RGRD} = TRUE ]; then
+      rgrd_out ${out_name} || status=1
+    fi
+  done 4< ${lead_f}
+
+  rm -f ${lead_f}
+  return ${status}
+}
+
+# runs a conversion task named tsk_nme with the remaining arguments, in the
+# background with a log in the working directory when MAX_PAR > 1, recording
+# its exit status in the report file
+run_task() {
+  local tsk_nme=$1
+  local tsk_log=${work_root}/run_wrfout_cf_${GRD}_${tsk_nme}.log
+  shift
+
+  if [ ${MAX_PAR} -gt 1 ]; then
+    # wait for a free slot and run the task in the background
+    while [ `jobs -rp | wc -l` -ge ${MAX_PAR} ]; do
+      wait -n
     done
+
+    tsk_logs+=( ${tsk_log} )
+    { "$@" > ${tsk_log} 2>&1; echo "$? ${dirstr} ${tsk_nme}" >> ${rpt_f}; } &
+  else
+    "$@"
+    echo "$? ${dirstr} ${tsk_nme}" >> ${rpt_f}
   fi
+}
+
+# converts the leads collected for the current cycle with MLT_LEAD=TRUE
+flush_leads() {
+  if [[ -n "${lead_f}" && -s ${lead_f} ]]; then
+    run_task leads run_leads ${lead_f}
+  else
+    rm -f ${lead_f}
+  fi
+  lead_f=""
+}
+
+# on cancellation or preemption the running tasks are killed with their
+# conversion processes, so that these do not continue writing partial outputs
+trap 'for pid in `jobs -rp`; do kill ${pid} `pgrep -P ${pid}`; done 2> /dev/null; exit 1' INT TERM
+
+# exit status of each task, one line per task as "status cycle task"
+rpt_f=${OUT_CYC_DIR}/wrfout_cf_report_${GRD}_$$.txt
+rm -f ${rpt_f}
+
+# logs of tasks run in parallel, printed in order on completion
+tsk_logs=()
+cyc_prv=""
+lead_f=""
+
+# loop the forecast cycles and leads of the task table
+while read -r -u 3 cyc cyc_hr lead_hr pdd_hr anl_strt anl_end cf_f for_f \
+    obs_f; do
+  # skip comment lines of the table
+  if [[ ${cyc:0:1} = "#" ]]; then
+    continue
+  fi
+
+  if [ "${cyc}" != "${cyc_prv}" ]; then
+    # convert the leads collected for the previous cycle
+    flush_leads
+    cyc_prv=${cyc}
+
+    # directory string for forecast analysis initialization time
+    dirstr=${cyc}
+    in_dir=${IN_CYC_DIR}/${dirstr}${IN_DT_SUBDIR}
+
+    # set output path
+    work_root=${OUT_CYC_DIR}/${dirstr}${OUT_DT_SUBDIR}
+    cmd="mkdir -p ${work_root}"
+    echo ${cmd}; eval ${cmd}
+    rm -f ${work_root}/run_wrfout_cf_${GRD}_*.log
+
+    if [ ${MLT_LEAD} = TRUE ]; then
+      lead_f=${work_root}/wrfout_cf_leads_${GRD}_$$.txt
+      rm -f ${lead_f}
+    fi
+
+    # set input paths
+    if [ ! -d ${in_dir} ]; then
+      echo "WARNING: data input path ${in_dir} does not exist."
+      echo "Skipping analysis for ${dirstr}."
+    else
+      echo "Processing forecasts in ${in_dir} directory."
+    fi
+  fi
+
+  # leads of a cycle without input data are skipped
+  if [ ! -d ${in_dir} ]; then
+    continue
+  fi
+
+  # set input file names
+  file_1="${in_dir}/wrfout_${GRD}_${anl_strt}"
+  file_2="${in_dir}/wrfout_${GRD}_${anl_end}"
+
+  # set output file name
+  output_file=${cf_f}
+  out_name="${work_root}/${output_file}"
+
+  if [[ -r ${file_1} && -r ${file_2} && ${MLT_LEAD} = TRUE ]]; then
+    # leads are collected and converted together at the end of the cycle
+    echo "${file_2} ${file_1} ${out_name}" >> ${lead_f}
+  else
+    run_task F${pdd_hr} run_lead ${file_1} ${file_2} ${out_name} ${lead_hr}
+  fi
+done 3< ${task_f}
+
+# convert the leads collected for the last cycle
+flush_leads
+
+# wait for all tasks to complete and print their logs in order
+wait
+for tsk_log in ${tsk_logs[@]}; do
+  echo "Log of ${tsk_log}:"
+  cat ${tsk_log}
 done
 
+# report the exit status of each task
+n_fail=0
+n_skip=0
+n_tsk=0
+if [ -r ${rpt_f} ]; then
+  while read -r status dirstr tsk_nme; do
+    (( n_tsk += 1 ))
+    if [ ${status} -eq 0 ]; then
+      echo "Completed: cycle ${dirstr} task ${tsk_nme}."
+    elif [ ${status} -eq 2 ]; then
+      (( n_skip += 1 ))
+      echo "Skipped: cycle ${dirstr} task ${tsk_nme}, inputs missing."
+    else
+      (( n_fail += 1 ))
+      echo "Failed: cycle ${dirstr} task ${tsk_nme}, exit status ${status}."
+    fi
+  done < <(sort -k 2,2 -k 3,3 ${rpt_f})
+  rm -f ${rpt_f}
+fi
+msg="Completed $(( n_tsk - n_fail - n_skip )) of ${n_tsk} tasks, "
+msg+="${n_fail} failed, ${n_skip} skipped."
+echo ${msg}
+
 echo "Script completed at `date +%Y-%m-%d_%H_%M_%S`."
 echo "Verify outputs at out_root ${OUT_CYC_DIR}."
 
+if [ ${n_fail} -gt 0 ]; then
+  exit 1
+fi
+
 #################################################################################
 # end
 
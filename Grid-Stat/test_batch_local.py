@@ -0,0 +1,127 @@
+##################################################################################
+# Description
+##################################################################################
+# Tests of the exit status of the configurations run by batch_local.py, running
+# run_gridstat.sh for a manifest of configurations with a stub singularity
+# executable in place of MET, and checking that a configuration with a failing
+# grid_stat run is summarized as failed. Run with
+#
+#     python -m pytest test_batch_local.py
+#
+##################################################################################
+# License Statement
+##################################################################################
+#
+# Copyright 2023 Colin Grudzien, cgrudzien@ucsd.edu
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+#
+##################################################################################
+# Imports
+##################################################################################
+import os
+import batch_local
+from batch_manifest import task_line
+
+##################################################################################
+# SET GLOBAL PARAMETERS
+##################################################################################
+# root of the MET-tools clone
+USR_HME = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# stub of the singularity executable, starting and stopping instances, writing
+# the landmask to the cache directory CACHE_DIR and failing grid_stat for the
+# forecast files of the control flow BAD
+SNG_STUB =\
+'#!/bin/bash\n' +\
+'if [ $1 = instance ]; then\n' +\
+'  exit 0\n' +\
+'fi\n' +\
+'case $3 in\n' +\
+'  ncdump)\n' +\
+'    exit 1;;\n' +\
+'  gen_vx_mask)\n' +\
+'    out_f=${@: -1}\n' +\
+'    touch CACHE_DIR/${out_f#/MSK_CACHE/};;\n' +\
+'  grid_stat)\n' +\
+'    [[ $6 != */BAD_* ]];;\n' +\
+'esac\n'
+
+##################################################################################
+# Tests
+##################################################################################
+# write the inputs of a cycle with a single lead for the control flows ctr_flws
+# and the stub executable to the directory root, returning the manifest path
+def write_inputs(root, ctr_flws):
+    for sub_dir in ['stub', 'in/2021012400', 'data', 'msk', 'out/cache']:
+        os.makedirs(root + '/' + sub_dir)
+
+    stub_f = root + '/stub/singularity'
+    with open(stub_f, 'w') as f:
+        f.write(SNG_STUB.replace('CACHE_DIR', root + '/out/cache'))
+
+    os.chmod(stub_f, 0o755)
+
+    met_sng = root + '/met.sif'
+    with open(met_sng, 'w') as f:
+        f.write('')
+
+    os.chmod(met_sng, 0o755)
+
+    for in_f in ['msk/CA.txt', 'data/StageIV_QPE_2021012500.nc'] +\
+            ['in/2021012400/' + ctr_flw + '_24QPF_2021012400_F024.nc'
+             for ctr_flw in ctr_flws]:
+        with open(root + '/' + in_f, 'w') as f:
+            f.write('')
+
+    man_path = root + '/manifest.jsonl'
+    with open(man_path, 'w') as f:
+        for ctr_flw in ctr_flws:
+            defs = ['USR_HME=' + USR_HME, 'CTR_FLW=' + ctr_flw, 'GRD=d02',
+                    'STRT_DT=2021012400', 'END_DT=2021012400', 'CYC_INT=24',
+                    'ANL_MIN=24', 'ANL_MAX=24', 'ANL_INT=24', 'ACC_INT=24',
+                    'IN_CYC_DIR=' + root + '/in',
+                    'OUT_CYC_DIR=' + root + '/out/' + ctr_flw,
+                    'IN_DT_SUBDIR=', 'OUT_DT_SUBDIR=', 'VRF_FLD=QPF',
+                    'CAT_THR=[ >0.0 ]', 'MSK=CA.txt',
+                    'MSK_ROOT=' + root + '/msk',
+                    'MSK_CACHE=' + root + '/out/cache', 'INT_MTHD=DW_MEAN',
+                    'INT_WDTH=3', 'NBRHD_WDTH=9', 'BTSTRP=0', 'RNK_CRR=FALSE',
+                    'CMP_ACC=FALSE', 'PRFX=', 'DATA_ROOT=' + root + '/data',
+                    'MET_SNG=' + met_sng]
+            f.write(task_line(defs) + '\n')
+
+    return man_path
+
+def test_failed_summary(tmp_path):
+    root = str(tmp_path)
+    man_path = write_inputs(root, ['CF', 'BAD'])
+    cnfg = batch_local.read_cnfg(['MANIFEST=' + man_path,
+                                  'SCRIPT=run_gridstat.sh',
+                                  'LOG_DIR=' + root + '/logs',
+                                  'LOG_NME=gridstat', 'N_WORKERS=2',
+                                  'STUB_PATH=' + root + '/stub'])
+
+    results = batch_local.run_local(cnfg)
+    assert [result[1] for result in results] == [0, 1]
+
+    with open(results[1][4]) as f:
+        assert 'Failed: cycle 2021012400 lead F024' in f.read()
+
+    summary = batch_local.run_summary(results)
+    assert 'Completed: configuration 0 exit status 0' in summary
+    assert 'Failed: configuration 1 exit status 1' in summary
+    assert 'Completed 1 of 2 configurations.' in summary
+
+##################################################################################
+# end
@@ -0,0 +1,164 @@
+##################################################################################
+# Description
+##################################################################################
+# Tests of the aggregation of partial sums by gridstat_aggregate.py, checking
+# that agg_sums and agg_scores on hand-built ctc, sl1l2 and nbrcnt frames
+# agree with a pandas groupby over the same keys, including rows with missing
+# keys and nbrcnt rows where FSS is undefined. Run with
+#
+#     python -m pytest test_gridstat_aggregate.py
+#
+##################################################################################
+# License Statement
+##################################################################################
+#
+# Copyright 2023 Colin Grudzien, cgrudzien@ucsd.edu
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+#
+##################################################################################
+# Imports
+##################################################################################
+import numpy as np
+import pandas as pd
+import pytest
+from gridstat_aggregate import SUM_COLS, agg_sums, agg_scores
+from gridstat_aggregate import cts_scores, cnt_scores, nbrcnt_scores
+
+##################################################################################
+# SET GLOBAL PARAMETERS
+##################################################################################
+# grouping keys of the frames, with a missing lead in the last rows
+KEYS = ['CTR_FLW', 'FCST_LEAD']
+CTR_FLWS = ['NRT_gfs', 'NRT_gfs', 'NRT_ecmwf', 'NRT_gfs', 'NRT_ecmwf',
+            'NRT_gfs', 'NRT_gfs']
+LEADS = ['240000', '480000', '240000', '240000', '240000', None, None]
+TOTAL = [100, 120, 90, 110, 80, 50, 60]
+
+##################################################################################
+# Tests
+##################################################################################
+# a frame of the keys and TOTAL with the partial sum columns in vals
+def frame(vals):
+    df = pd.DataFrame({'CTR_FLW': CTR_FLWS, 'FCST_LEAD': LEADS,
+                       'TOTAL': np.array(TOTAL, dtype=float)})
+    for col, val in vals.items():
+        df[col] = np.array(val, dtype=float)
+
+    return df
+
+# the partial sums of a line type by pandas groupby, summing the counts of ctc
+# and averaging the others weighted by TOTAL, with the number of rows N_ROWS
+def groupby_sums(df, line_type, keys):
+    df = df.copy()
+    cols = SUM_COLS[line_type][1:]
+    if line_type == 'nbrcnt':
+        fbs_ref = df['FBS'] / (1 - df['FSS'])
+        df['FSS'] = fbs_ref.where(np.isfinite(fbs_ref), 0.0)
+        df = df.rename(columns={'FSS': 'FBS_REF'})
+        cols = ['FBS', 'FBS_REF', 'F_RATE', 'O_RATE']
+
+    if line_type != 'ctc':
+        for col in cols:
+            df[col] = df[col] * df['TOTAL']
+
+    grps = df.groupby(keys, dropna=False, sort=True)
+    sums = grps[['TOTAL'] + cols].sum()
+    if line_type != 'ctc':
+        for col in cols:
+            sums[col] = sums[col] / sums['TOTAL']
+
+    sums.insert(0, 'N_ROWS', grps.size())
+
+    return sums
+
+# check agg_sums against the groupby sums, with groups in the same order; the
+# levels of missing keys are inferred as mixed by groupby, so only the values
+# of the index are compared
+def check_sums(df, line_type, keys):
+    sums = agg_sums(df, line_type, keys)
+    exp = groupby_sums(df, line_type, keys)
+
+    pd.testing.assert_frame_equal(sums, exp, check_dtype=False,
+                                  check_index_type=False)
+
+    return sums, exp
+
+def test_ctc():
+    df = frame({'FY_OY': [10, 12, 5, 0, 3, 4, 2],
+                'FY_ON': [5, 3, 2, 1, 0, 1, 1],
+                'FN_OY': [4, 6, 1, 2, 2, 0, 3],
+                'FN_ON': [81, 99, 82, 107, 75, 45, 54]})
+    sums, exp = check_sums(df, 'ctc', KEYS)
+
+    # the missing leads form a group of their own
+    assert len(sums) == 4
+    assert sums.index[-1][0] == 'NRT_gfs' and pd.isnull(sums.index[-1][1])
+    assert sums['N_ROWS'].iloc[-1] == 2
+
+    sums = agg_scores(sums, 'ctc')
+    scores = cts_scores(*[exp[col].to_numpy() for col in
+                          ['FY_OY', 'FY_ON', 'FN_OY', 'FN_ON']])
+    for key, val in scores.items():
+        np.testing.assert_allclose(sums[key].to_numpy(), val)
+
+def test_sl1l2():
+    df = frame({'FBAR': [1.2, 0.8, 2.1, 0.0, 1.5, 0.3, 0.6],
+                'OBAR': [1.0, 0.9, 1.7, 0.2, 1.1, 0.4, 0.5],
+                'FOBAR': [2.1, 1.3, 4.2, 0.1, 2.4, 0.2, 0.5],
+                'FFBAR': [3.0, 1.9, 5.5, 0.1, 3.1, 0.3, 0.7],
+                'OOBAR': [2.5, 2.0, 4.0, 0.3, 2.2, 0.4, 0.6],
+                'MAE': [0.5, 0.4, 0.9, 0.2, 0.6, 0.1, 0.2]})
+    sums, exp = check_sums(df, 'sl1l2', KEYS)
+
+    sums = agg_scores(sums, 'sl1l2')
+    scores = cnt_scores(*[exp[col].to_numpy() for col in SUM_COLS['sl1l2']])
+    for key, val in scores.items():
+        np.testing.assert_allclose(sums[key].to_numpy(), val)
+
+def test_nbrcnt():
+    # the rows of the missing leads have no events, with FBS zero and FSS
+    # undefined, so their reference Brier score is taken as zero
+    df = frame({'FBS': [0.04, 0.05, 0.02, 0.03, 0.01, 0.0, 0.0],
+                'FSS': [0.8, 0.75, 0.9, np.nan, 0.95, np.nan, np.nan],
+                'F_RATE': [0.1, 0.2, 0.15, 0.0, 0.05, 0.0, 0.0],
+                'O_RATE': [0.12, 0.18, 0.1, 0.03, 0.06, 0.0, 0.0]})
+    sums, exp = check_sums(df, 'nbrcnt', KEYS)
+    assert sums['FBS_REF'].iloc[-1] == 0.0
+
+    sums = agg_scores(sums, 'nbrcnt')
+    scores = nbrcnt_scores(*[exp[col].to_numpy() for col in
+                             ['FBS', 'FBS_REF', 'F_RATE', 'O_RATE']])
+    for key, val in scores.items():
+        np.testing.assert_allclose(sums[key].to_numpy(), val)
+
+    # FSS of the groups with events, undefined for the group without
+    fss = 1 - exp['FBS'] / exp['FBS_REF']
+    np.testing.assert_allclose(sums['FSS'].to_numpy()[:-1],
+                               fss.to_numpy()[:-1])
+    assert np.isnan(sums['FSS'].iloc[-1])
+
+@pytest.mark.parametrize('line_type', ['ctc', 'sl1l2', 'nbrcnt'])
+def test_no_keys(line_type):
+    cols = SUM_COLS[line_type][1:]
+    vals = {col: np.linspace(0.1, 0.7, len(TOTAL)) for col in cols}
+    df = frame(vals)
+    sums = agg_sums(df, line_type, [])
+    exp = groupby_sums(df.assign(ALL=0), line_type, ['ALL'])
+
+    assert list(sums.index) == [0]
+    pd.testing.assert_frame_equal(sums, exp.reset_index(drop=True),
+                                  check_dtype=False)
+
+##################################################################################
+# end
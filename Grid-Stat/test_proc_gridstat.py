@@ -0,0 +1,196 @@
+##################################################################################
+# Description
+##################################################################################
+# Tests of the parsing of grid_stat_*.txt files by proc_gridstat.py, checking
+# that read_gridstat_txt returns the same frames as the per-line parser that
+# it replaced, which is kept below as legacy_gridstat_txt, on sample MET files
+# written by the tests and on the output of gen_gridstat.py. Run with
+#
+#     python -m pytest test_proc_gridstat.py
+#
+##################################################################################
+# License Statement
+##################################################################################
+#
+# Copyright 2023 Colin Grudzien, cgrudzien@ucsd.edu
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+#
+##################################################################################
+# Imports
+##################################################################################
+import glob
+import numpy as np
+import pandas as pd
+import pytest
+import gen_gridstat
+from gridstat_schema import HDR_COLS, apply_schema
+from proc_gridstat import read_gridstat_txt
+
+##################################################################################
+# SET GLOBAL PARAMETERS
+##################################################################################
+# header columns of the sample files
+HDR_TXT =\
+'VERSION MODEL DESC FCST_LEAD FCST_VALID_BEG FCST_VALID_END OBS_LEAD ' +\
+'OBS_VALID_BEG OBS_VALID_END FCST_VAR FCST_UNITS FCST_LEV OBS_VAR OBS_UNITS ' +\
+'OBS_LEV OBTYPE VX_MASK INTERP_MTHD INTERP_PNTS FCST_THRESH OBS_THRESH ' +\
+'COV_THRESH ALPHA LINE_TYPE '
+
+# header values of the rows of the sample files, up to the threshold
+ROW_TXT =\
+'V10.0.1 NRT_gfs NA 240000 20221214_000000 20221215_000000 000000 ' +\
+'20221214_000000 20221215_000000 QPF_24hr mm L0 precip mm L0 ANALYS ' +\
+'CALatLonPoints NEAREST 1 '
+
+# a cts file of the first statistics with their normal and bootstrap limits,
+# the bootstrap limits NA in the first row and computed in the second
+CTS_TXT =\
+HDR_TXT + 'TOTAL BASER BASER_NCL BASER_NCU BASER_BCL BASER_BCU FMEAN ' +\
+'FMEAN_NCL FMEAN_NCU FMEAN_BCL FMEAN_BCU ACC ACC_NCL ACC_NCU ACC_BCL ' +\
+'ACC_BCU\n' +\
+ROW_TXT + '>0.0 >0.0 NA 0.05 CTS 20571 0.41612 0.40939 0.42288 NA NA ' +\
+'0.45496 0.44816 0.46178 NA NA 0.93661 0.93319 0.93989 NA NA\n' +\
+ROW_TXT + '>=25.4 >=25.4 NA 0.05 CTS 20571 0.02314 0.02119 0.02526 ' +\
+'0.02105 0.02533 0.01837 0.01664 0.02028 0.01658 0.02026 0.99271 ' +\
+'0.99149 0.99374 0.99154 0.99383\n'
+
+# a fixed nbrcnt file with NA values in the bootstrap limits and statistics
+NBRCNT_TXT =\
+'VERSION MODEL DESC FCST_LEAD FCST_VALID_BEG FCST_VALID_END OBS_LEAD ' +\
+'OBS_VALID_BEG OBS_VALID_END FCST_VAR FCST_UNITS FCST_LEV OBS_VAR OBS_UNITS ' +\
+'OBS_LEV OBTYPE VX_MASK INTERP_MTHD INTERP_PNTS FCST_THRESH OBS_THRESH ' +\
+'COV_THRESH ALPHA LINE_TYPE TOTAL FBS FBS_BCL FBS_BCU FSS FSS_BCL FSS_BCU\n' +\
+'V10.0.1 NRT_gfs NA 240000 20221214_000000 20221215_000000 000000 ' +\
+'20221214_000000 20221215_000000 QPF_24hr mm L0 precip mm L0 ANALYS ' +\
+'CALatLonPoints NBRHD_SQUARE 81 >0.0 >0.0 NA 0.05 NBRCNT 20571 0.04182 NA ' +\
+'NA 0.87554 0.86102 0.88914\n' +\
+'V10.0.1 NRT_gfs NA 240000 20221214_000000 20221215_000000 000000 ' +\
+'20221214_000000 20221215_000000 QPF_24hr mm L0 precip mm L0 ANALYS ' +\
+'CALatLonPoints NBRHD_SQUARE 81 >=101.6 >=101.6 NA 0.05 NBRCNT 20571 0.00000 ' +\
+'NA NA NA NA NA\n'
+
+##################################################################################
+# Legacy parser
+##################################################################################
+# the per-line parser of grid_stat_*.txt files before read_gridstat_txt, as a
+# dataframe of strings with 'NA' values replaced by NaN indexed by 'line'
+# starting at 1, or None if the file has no header
+def legacy_gridstat_txt(in_path):
+    with open(in_path) as f:
+        cols = f.readline()
+        cols = cols.split()
+
+        if len(cols) == 0:
+            return None
+
+        fname_df = {}
+        tmp_dict = {}
+        df_indx = 1
+        for col_name in cols:
+            fname_df[col_name] = []
+
+        fname_df = pd.DataFrame.from_dict(fname_df, orient='columns')
+
+        # parse file by line, concatenating columns
+        for line in f:
+            split_line = line.split()
+
+            for i in range(len(split_line)):
+                val = split_line[i]
+
+                # filter NA vals
+                if val == 'NA':
+                    val = np.nan
+                tmp_dict[cols[i]] = val
+
+            tmp_dict['line'] = [df_indx]
+            tmp_dict = pd.DataFrame.from_dict(tmp_dict, orient='columns')
+            fname_df = pd.concat([fname_df, tmp_dict], axis=0)
+            df_indx += 1
+
+        fname_df['line'] = fname_df['line'].astype(int)
+
+    return fname_df.set_index('line')
+
+# check the frames of both parsers of a file are equal in columns, values,
+# dtypes and the 1-based 'line' index; the legacy parser inferred float64 for
+# columns that are NA in every row, where read_gridstat_txt keeps strings, so
+# the frames are compared with those columns as object, and the statistic
+# columns of both are checked to cast equally by apply_schema
+def check_file(in_path, postfix):
+    legacy = legacy_gridstat_txt(in_path)
+    fname_df = read_gridstat_txt(in_path)
+
+    assert list(fname_df.columns) == list(legacy.columns)
+    assert (fname_df.dtypes == object).all()
+    assert fname_df.index.name == 'line'
+    assert list(fname_df.index) == list(range(1, len(legacy) + 1))
+
+    na_cols = [col for col in legacy.columns if legacy[col].isnull().all()]
+    assert (legacy.drop(columns=na_cols).dtypes == object).all()
+    pd.testing.assert_frame_equal(fname_df,
+                                  legacy.astype({col: object
+                                                 for col in na_cols}),
+                                  check_index_type=False)
+
+    typed = apply_schema(fname_df.copy(), postfix)
+    legacy = apply_schema(legacy.copy(), postfix)
+    stats = [col for col in typed.columns if col not in HDR_COLS]
+    pd.testing.assert_frame_equal(typed[stats], legacy[stats],
+                                  check_index_type=False)
+
+##################################################################################
+# Tests
+##################################################################################
+def test_fixed_nbrcnt(tmp_path):
+    in_path = tmp_path / 'grid_stat_240000L_20221215_000000V_nbrcnt.txt'
+    in_path.write_text(NBRCNT_TXT)
+    check_file(str(in_path), 'nbrcnt')
+
+    fname_df = read_gridstat_txt(str(in_path))
+    assert np.isnan(fname_df.loc[1, 'FBS_BCL'])
+    assert np.isnan(fname_df.loc[2, 'FSS'])
+    assert fname_df.loc[1, 'FSS'] == '0.87554'
+
+def test_fixed_cts(tmp_path):
+    in_path = tmp_path / 'grid_stat_240000L_20221215_000000V_cts.txt'
+    in_path.write_text(CTS_TXT)
+    check_file(str(in_path), 'cts')
+
+    fname_df = read_gridstat_txt(str(in_path))
+    assert fname_df['BASER_BCL'].isnull().tolist() == [True, False]
+    assert fname_df.loc[2, 'ACC_BCU'] == '0.99383'
+    assert fname_df.loc[2, 'FCST_THRESH'] == '>=25.4'
+
+@pytest.mark.parametrize('btstrp', ['TRUE', 'FALSE'])
+def test_generated(tmp_path, btstrp):
+    cnfg = gen_gridstat.read_cnfg(['IN_ROOT=' + str(tmp_path), 'CTR_FLW=CF',
+                                   'STRT_DT=2021012400', 'END_DT=2021012400',
+                                   'LEADS=24,120', 'NBRHD_WDTHS=3,9',
+                                   'LINE_TYPES=cnt,cts,nbrcnt,nbrcts',
+                                   'BTSTRP=' + btstrp])
+    gen_gridstat.gen_gridstat(cnfg)
+
+    in_paths = sorted(glob.glob(str(tmp_path) + '/CF/2021012400/*.txt'))
+    assert len(in_paths) == 8
+    for in_path in in_paths:
+        check_file(in_path, in_path.split('_')[-1][:-len('.txt')])
+
+def test_empty(tmp_path):
+    in_path = tmp_path / 'grid_stat_240000L_20221215_000000V_cts.txt'
+    in_path.write_text('')
+    assert read_gridstat_txt(str(in_path)) is None
+
+##################################################################################
+# end
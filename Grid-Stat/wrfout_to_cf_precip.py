@@ -0,0 +1,355 @@
+##################################################################################
+# Description
+##################################################################################
+# This script writes the precipitation fields of wrfout_to_cf.ncl for
+# precipitation-only verification, reading only RAINC, RAINNC, XLAT, XLONG
+# and Times from two wrfout files rather than converting the full set of
+# fields of the NCL script. Files are given as string definitions of the
+# same form as the NCL script,
+#
+#     python wrfout_to_cf_precip.py file_in=wrfout_d01_2021-01-25_00:00:00 \
+#         file_prev=wrfout_d01_2021-01-24_00:00:00 file_out=wrfcf.nc
+#
+# where file_in is the wrfout file at the end of the accumulation and
+# file_prev at its start. The output file contains the variables used by MET
+# with the names, dimensions and attributes of the NCL script,
+#
+#     time, forecast_reference_time, south_north, west_east,
+#     Lambert_Conformal, lat, lon, precip, precip_bkt
+#
+# where precip is the accumulated precipitation over the simulation at the
+# time of file_in, and precip_bkt the difference of the accumulated
+# precipitation of file_in and file_prev, so that the output can be read by
+# pcp_combine as with the output of wrfout_to_cf.ncl.
+#
+# The leads of a forecast cycle can be converted in one run with
+#
+#     python wrfout_to_cf_precip.py file_list=leads.txt
+#
+# where each line of file_list gives the file_in, file_prev and file_out of a
+# lead separated by whitespace, in lead order. The accumulated precipitation
+# of each file_in is carried forward to the next lead, so that when file_prev
+# of a lead is file_in of the previous one, e.g., for equal accumulation and
+# analysis intervals, each wrfout file is read only once.
+#
+##################################################################################
+# License Statement
+##################################################################################
+#
+# Copyright 2023 Colin Grudzien, cgrudzien@ucsd.edu
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+#
+##################################################################################
+# Imports
+##################################################################################
+import sys
+import os
+import numpy as np
+from datetime import datetime as dt
+from netCDF4 import Dataset
+
+##################################################################################
+# SET GLOBAL PARAMETERS
+##################################################################################
+# units of the time coordinate
+TIME_UNITS = 'hours since 1970-01-01 00:00:00'
+
+# units of the forecast reference time, as written by wrf_times_c
+REF_UNITS = 'hours since 1901-01-01 00:00:00'
+
+# fill value of the output fields
+FILL_VALUE = 1e20
+
+# degrees per radian and radius of the earth at 35N in km used for the
+# projection coordinates, as in wrfout_to_cf.ncl
+CONV = 57.29578
+RADIUS = 6371.141
+
+# date format of the wrfout Times variable
+WRF_FMT = '%Y-%m-%d_%H:%M:%S'
+
+# valid times and accumulated precipitation of the last file_in converted,
+# carried forward to the next lead
+CARRY = {}
+
+##################################################################################
+# Conversion routines
+##################################################################################
+# parse the string definitions file_in=, file_prev= and file_out=, or
+# file_list=, of the command line to a list of the files of each lead,
+# returning None with an error message printed if one is missing
+def read_args(args):
+    files = {}
+    for arg in args:
+        key, sep, val = arg.partition('=')
+        files[key] = val.strip('"')
+
+    if 'file_list' in files.keys():
+        leads = []
+        try:
+            with open(files['file_list']) as f:
+                for line in f:
+                    lead = line.split()
+                    if len(lead) == 0:
+                        continue
+
+                    elif len(lead) != 3:
+                        print('ERROR: line ' + line.strip() + ' of ' +\
+                                files['file_list'] + ' is not of the form' +\
+                                ' file_in file_prev file_out.')
+                        return None
+
+                    leads.append(lead)
+
+        except OSError as err:
+            print('ERROR: file_list could not be read, ' + repr(err))
+            return None
+
+        return leads
+
+    for key in ['file_in', 'file_prev', 'file_out']:
+        if key not in files.keys() or len(files[key]) == 0:
+            print('ERROR: ' + key + ' is not defined.')
+            return None
+
+    return [[files['file_in'], files['file_prev'], files['file_out']]]
+
+# the valid times of a wrfout file as datetimes
+def wrf_times(wrfout):
+    times = wrfout.variables['Times'][:]
+    return [dt.strptime(time.tobytes().decode('utf-8')[:19], WRF_FMT)
+            for time in times]
+
+# hours between a datetime and the reference date of units
+def hours_since(date, units):
+    ref = dt.strptime(units[len('hours since '):], '%Y-%m-%d %H:%M:%S')
+    return (date - ref).total_seconds() / 3600.
+
+# accumulated precipitation over the simulation, RAINC + RAINNC
+def precip_acc(wrfout):
+    return wrfout.variables['RAINNC'][:].astype(np.float32) +\
+           wrfout.variables['RAINC'][:].astype(np.float32)
+
+# one-dimensional Lambert conformal projection coordinates in km of the
+# mass grid, as computed in wrfout_to_cf.ncl for MET
+def proj_coords(wrfout, lat, lon):
+    truelat1 = float(wrfout.TRUELAT1)
+    truelat2 = float(wrfout.TRUELAT2)
+    moad_cen_lat = float(wrfout.MOAD_CEN_LAT)
+    stand_lon = float(wrfout.STAND_LON)
+
+    xn = np.log10(np.cos(truelat1 / CONV)) - np.log10(np.cos(truelat2 / CONV))
+    xn = xn / (np.log10(np.tan((45. - truelat1 / 2.) / CONV)) -\
+               np.log10(np.tan((45. - truelat2 / 2.) / CONV)))
+    psi1 = (90. - truelat1) / CONV
+    psi0 = (90. - moad_cen_lat) / CONV
+    xc = 0.
+    yc = (-1. * RADIUS) / xn * np.sin(psi1) *\
+         (np.tan(psi0 / 2.) / np.tan(psi1 / 2.)) ** xn
+
+    ylon = lon - stand_lon
+    ylon = np.where(ylon > 180., ylon - 360., ylon)
+    ylon = np.where(ylon < -180., ylon + 360., ylon)
+    flp = xn * ylon / CONV
+    psx = (90. - lat) / CONV
+    r = (-1. * RADIUS) / xn * np.sin(psi1) *\
+        (np.tan(psx / 2.) / np.tan(psi1 / 2.)) ** xn
+    xloc = -r * np.sin(flp) - xc
+    yloc = r * np.cos(flp) - yc
+
+    return yloc[:, 0], xloc[0, :], [truelat1, truelat2, stand_lon,
+                                    moad_cen_lat]
+
+# define a variable with attributes in the output file
+def def_var(wrfpost, name, dtype, dims, attrs, fill=False):
+    if fill:
+        var = wrfpost.createVariable(name, dtype, dims, fill_value=FILL_VALUE)
+
+    else:
+        var = wrfpost.createVariable(name, dtype, dims)
+
+    for key, val in attrs.items():
+        var.setncattr(key, val)
+
+    return var
+
+# write the precipitation of file_in accumulated since file_prev to file_out,
+# reading file_prev only if it is not the file_in carried from the last call
+def wrfout_to_cf_precip(file_in, file_prev, file_out):
+    with Dataset(file_in, 'r') as wrfout:
+        valid = wrf_times(wrfout)
+        init = dt.strptime(wrfout.SIMULATION_START_DATE[:19], WRF_FMT)
+        lat = wrfout.variables['XLAT'][0, :, :].astype(np.float32)
+        lon = wrfout.variables['XLONG'][0, :, :].astype(np.float32)
+        precip = precip_acc(wrfout)
+        south_north, west_east, proj = proj_coords(wrfout, lat, lon)
+
+        fcst_time = int(round(hours_since(valid[0], REF_UNITS) -\
+                              hours_since(init, REF_UNITS)))
+        if fcst_time == 0:
+            precip_bkt = np.zeros(precip.shape, dtype=np.float32)
+            time_diff = 0
+
+        else:
+            if file_prev in CARRY.keys():
+                prev, precip_prev = CARRY[file_prev]
+
+            else:
+                with Dataset(file_prev, 'r') as wrfout_prev:
+                    prev = wrf_times(wrfout_prev)
+                    precip_prev = precip_acc(wrfout_prev)
+
+            time_diff = int(round((valid[0] - prev[0]).total_seconds() /\
+                                  3600.))
+            precip_bkt = precip - precip_prev
+
+    CARRY.clear()
+    CARRY[file_in] = [valid, precip]
+
+    n_time, n_s_n, n_w_e = precip.shape
+    if os.path.isfile(file_out):
+        os.remove(file_out)
+
+    with Dataset(file_out, 'w', format='NETCDF3_CLASSIC') as wrfpost:
+        wrfpost.setncatts({
+                           'creation_date': dt.now().strftime('%c'),
+                           'institution': 'CW3E - Scripps Institution of ' +\
+                                          'Oceanography',
+                           'notes': 'Created with Python script: ' +\
+                                    'wrfout_to_cf_precip.py',
+                           'source': file_in,
+                           'Conventions': 'CF 1.6, Standard Name Table v19',
+                           'title': file_out,
+                          })
+
+        wrfpost.createDimension('time', None)
+        wrfpost.createDimension('south_north', n_s_n)
+        wrfpost.createDimension('west_east', n_w_e)
+        wrfpost.createDimension('projection', 1)
+
+        # time coordinates
+        var = def_var(wrfpost, 'time', 'f8', ('time',),
+                      {
+                       'long_name': 'Time',
+                       'standard_name': 'time',
+                       'units': TIME_UNITS,
+                       'calendar': 'standard',
+                      })
+        var[:] = [hours_since(time, TIME_UNITS) for time in valid]
+
+        var = def_var(wrfpost, 'forecast_reference_time', 'f4', ('time',),
+                      {
+                       'long_name': 'Forecast Reference Time',
+                       'standard_name': 'forecast_reference_time',
+                       'units': REF_UNITS,
+                       'init_time': init.strftime('%Y%m%d_%H0000'),
+                       'valid_time': valid[0].strftime('%Y%m%d_%H0000'),
+                       'fcst_time': np.int32(fcst_time),
+                      })
+        var[:] = [hours_since(init, REF_UNITS)] * n_time
+
+        # projection coordinates
+        var = def_var(wrfpost, 'south_north', 'f4', ('south_north',),
+                      {
+                       'long_name': 'y coordinate of projection',
+                       'standard_name': 'projection_y_coordinate',
+                       'axis': 'Y',
+                       'units': 'km',
+                      })
+        var[:] = south_north
+
+        var = def_var(wrfpost, 'west_east', 'f4', ('west_east',),
+                      {
+                       'long_name': 'x coordinate of projection',
+                       'standard_name': 'projection_x_coordinate',
+                       'axis': 'X',
+                       'units': 'km',
+                      })
+        var[:] = west_east
+
+        var = def_var(wrfpost, 'Lambert_Conformal', 'i4', ('projection',),
+                      {
+                       'grid_mapping_name': 'lambert_conformal_conic',
+                       'standard_parallel': np.array(proj[:2],
+                                                     dtype=np.float32),
+                       'longitude_of_central_meridian': np.float32(proj[2]),
+                       'latitude_of_projection_origin': np.float32(proj[3]),
+                      })
+        var[:] = 1
+
+        # mapping variables
+        var = def_var(wrfpost, 'lat', 'f4', ('south_north', 'west_east'),
+                      {
+                       'long_name': 'Latitude',
+                       'standard_name': 'latitude',
+                       'units': 'degrees_north',
+                      })
+        var[:] = lat
+
+        var = def_var(wrfpost, 'lon', 'f4', ('south_north', 'west_east'),
+                      {
+                       'long_name': 'Longitude',
+                       'standard_name': 'longitude',
+                       'units': 'degrees_east',
+                      })
+        var[:] = lon
+
+        # precipitation fields
+        dims = ('time', 'south_north', 'west_east')
+        var = def_var(wrfpost, 'precip', 'f4', dims,
+                      {
+                       'long_name': 'Accumulated Total Precipitation ' +\
+                                    'Over Simulation',
+                       'standard_name': 'total_precipitation_amount',
+                       'units': 'mm',
+                       'coordinates': 'lon lat',
+                       'grid_mapping': 'Lambert_Conformal',
+                      }, fill=True)
+        var[:] = precip
+
+        var = def_var(wrfpost, 'precip_bkt', 'f4', dims,
+                      {
+                       'long_name': 'Accumulated Precipitation Over Past ' +\
+                                    str(time_diff) + ' Hours',
+                       'standard_name': 'precipitation_amount_' +\
+                                        str(time_diff) + '_hours',
+                       'units': 'mm',
+                       'accum_intvl': str(time_diff) + ' hours',
+                       'coordinates': 'lon lat',
+                       'grid_mapping': 'Lambert_Conformal',
+                      }, fill=True)
+        var[:] = precip_bkt
+
+##################################################################################
+# Convert the files
+##################################################################################
+if __name__ == '__main__':
+    leads = read_args(sys.argv[1:])
+    if leads is None:
+        sys.exit(1)
+
+    status = 0
+    for file_in, file_prev, file_out in leads:
+        try:
+            wrfout_to_cf_precip(file_in, file_prev, file_out)
+
+        except (OSError, KeyError, AttributeError, ValueError) as err:
+            print('ERROR: ' + file_out + ' could not be written, ' +\
+                    repr(err))
+            status = 1
+
+    sys.exit(status)
+
+##################################################################################
+# end